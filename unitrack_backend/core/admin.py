@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase
+from .models import Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, HorarioClase, Tarea, RiesgoEstudiante, SesionArchivada
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
@@ -28,5 +28,9 @@ admin.site.register(Grupo)
 admin.site.register(Estudiante)
 admin.site.register(InscripcionEstudianteGrupo)
 admin.site.register(SesionClase)
+admin.site.register(HorarioClase)
+admin.site.register(Tarea)
+admin.site.register(RiesgoEstudiante)
+admin.site.register(SesionArchivada)
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from django.db import transaction
+from .models import SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada, EstadisticaSesion, SesionArchivada, CambioSync, Estudiante
+from .packing import asistencias_de_sesiones, codificar
+from .stats import registrar_cambios
+from . import sync
+
+# Archivo de periodos cerrados (`manage.py archivar_sesiones --hasta AAAA-MM-DD`).
+# Las sesiones anteriores a la fecha de corte salen de SesionClase y su pase de lista (filas
+# de AsistenciaEstudiante o empaquetado) sale de las tablas activas; cada sesión queda como una
+# sola fila de SesionArchivada. Así los índices y los recorridos por docente de las tablas
+# activas solo cubren el periodo en curso. El historial se lee en /api/archivo/sesiones/ y en
+# las exportaciones. Las estadísticas del grupo y de cada inscripción dejan de contar lo
+# archivado y los clientes reciben el borrado de las sesiones por /api/sync/.
+# Con --revertir las sesiones vuelven a SesionClase, con una fila de asistencia por estudiante.
+
+LOTE_ARCHIVO = 500
+
+
+def _empaquetar(asistencias):
+    """ {estudiante_id: status} -> (ids concatenados, estados de 3 bits, total). """
+    return b''.join(e.bytes for e in asistencias), codificar(list(asistencias.values())), len(asistencias)
+
+
+def _registrar_sync(operacion, modelo, pks_por_docente):
+    for docente_id, pks in pks_por_docente.items():
+        sync.registrar(modelo, pks, operacion, [docente_id])
+
+
+def _archivar_lote(sesion_ids):
+    sesiones = list(SesionClase.objects.filter(pk__in=sesion_ids).values_list('id', 'grupo_id', 'docente_id', 'fecha', 'nombre'))
+    asistencias = defaultdict(dict)
+    filas = AsistenciaEstudiante.objects.filter(sesion_clase_id__in=sesion_ids).values_list('sesion_clase_id', 'estudiante_id', 'status')
+    for sesion_id, estudiante_id, status in filas:
+        asistencias[sesion_id][estudiante_id] = status
+    for sesion_id, estados in asistencias_de_sesiones(sesion_ids).items():
+        asistencias[sesion_id].update(estados)
+
+    archivadas = []
+    cambios = []
+    grupos = {}
+    por_docente = defaultdict(list)
+    for sesion_id, grupo_id, docente_id, fecha, nombre in sesiones:
+        estudiantes, estados, total = _empaquetar(asistencias[sesion_id])
+        archivadas.append(SesionArchivada(
+            id=sesion_id, grupo_id=grupo_id, docente_id=docente_id, fecha=fecha, nombre=nombre,
+            estudiantes=estudiantes, estados=estados, total=total,
+        ))
+        grupos[sesion_id] = grupo_id
+        por_docente[docente_id].append(sesion_id)
+        cambios += [(sesion_id, estudiante_id, status, -1) for estudiante_id, status in asistencias[sesion_id].items()]
+
+    SesionArchivada.objects.bulk_create(archivadas)
+    registrar_cambios(cambios, grupos)
+    _registrar_sync(CambioSync.Operacion.ELIMINADO, SesionClase, por_docente)
+    # Sin señales: las estadísticas y el registro de cambios ya se actualizaron arriba
+    for modelo, campo in (
+        (AsistenciaEstudiante, 'sesion_clase_id'), (AsistenciaEmpaquetada, 'sesion_id'),
+        (EstadisticaSesion, 'sesion_id'), (SesionClase, 'id'),
+    ):
+        modelo.objects.filter(**{f'{campo}__in': sesion_ids})._raw_delete(modelo.objects.db)
+    return len(sesiones)
+
+
+def archivar(sesiones, tamano_lote=LOTE_ARCHIVO):
+    """ Mueve `sesiones` (queryset) al archivo, una transacción por lote. Devuelve cuántas se archivaron. """
+    archivadas = 0
+    while True:
+        with transaction.atomic():
+            sesion_ids = list(sesiones.order_by('fecha', 'id').values_list('id', flat=True)[:tamano_lote])
+            if not sesion_ids:
+                return archivadas
+            archivadas += _archivar_lote(sesion_ids)
+
+
+def _restaurar_lote(archivadas):
+    pases = {a.id: a.estados_por_estudiante() for a in archivadas}
+    existentes = set(Estudiante.objects.filter(
+        pk__in={e for pase in pases.values() for e, _ in pase},
+    ).values_list('id', flat=True))
+    sesiones = []
+    filas = []
+    grupos = {}
+    por_docente = defaultdict(list)
+    for a in archivadas:
+        sesiones.append(SesionClase(id=a.id, grupo_id=a.grupo_id, docente_id=a.docente_id, fecha=a.fecha, nombre=a.nombre))
+        grupos[a.id] = a.grupo_id
+        por_docente[a.docente_id].append(a.id)
+        # Las asistencias de estudiantes borrados después de archivar no se pueden restaurar
+        filas += [
+            AsistenciaEstudiante(sesion_clase_id=a.id, estudiante_id=estudiante_id, status=status, docente_id=a.docente_id)
+            for estudiante_id, status in pases[a.id]
+            if estudiante_id in existentes
+        ]
+    SesionClase.objects.bulk_create(sesiones)
+    AsistenciaEstudiante.objects.bulk_create(filas, batch_size=LOTE_ARCHIVO)
+    registrar_cambios([(f.sesion_clase_id, f.estudiante_id, f.status, 1) for f in filas], grupos)
+    _registrar_sync(CambioSync.Operacion.CREADO, SesionClase, por_docente)
+    asistencias_por_docente = defaultdict(list)
+    for f in filas:
+        asistencias_por_docente[f.docente_id].append(f.pk)
+    _registrar_sync(CambioSync.Operacion.CREADO, AsistenciaEstudiante, asistencias_por_docente)
+    SesionArchivada.objects.filter(pk__in=[a.id for a in archivadas])._raw_delete(SesionArchivada.objects.db)
+    return len(archivadas)
+
+
+def restaurar(archivadas, tamano_lote=LOTE_ARCHIVO):
+    """ Inverso de archivar: devuelve `archivadas` (queryset de SesionArchivada) a las tablas activas. """
+    restauradas = 0
+    while True:
+        with transaction.atomic():
+            lote = list(archivadas.order_by('fecha', 'id')[:tamano_lote])
+            if not lote:
+                return restauradas
+            restauradas += _restaurar_lote(lote)
+
@@ -0,0 +1,166 @@
+import uuid
+from collections import defaultdict
+from rest_framework import serializers
+from .models import InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada, CambioSync
+from .stats import registrar_cambios, cambios_de_asistencias
+from . import packing, sync
+
+# Tamaño de lote para los INSERT masivos de asistencias
+ASISTENCIAS_BATCH_SIZE = 500
+
+STATUS_VALIDOS = set(AsistenciaEstudiante.AttendanceStatus.values)
+
+
+def validar_asistencias(grupo, asistencias_data, permitir_borrado=False):
+    """
+    Valida la lista de asistencias [{studentId, status}, ...] contra el grupo.
+    Devuelve un dict {estudiante_id: status}. Los estudiantes se comprueban
+    contra las inscripciones del grupo en un solo query. Con `permitir_borrado`,
+    status null indica quitar la asistencia y no exige que el estudiante siga inscrito.
+    """
+    if not isinstance(asistencias_data, list):
+        raise serializers.ValidationError({'asistencias': 'Debe ser una lista.'})
+    errores = {}
+    estados = {}
+    for i, asistencia in enumerate(asistencias_data):
+        if not isinstance(asistencia, dict):
+            errores[i] = 'Formato inválido.'
+            continue
+        estudiante_id = asistencia.get('studentId')
+        status = asistencia.get('status')
+        try:
+            estudiante_id = uuid.UUID(str(estudiante_id))
+        except ValueError:
+            errores[i] = f'studentId inválido: {estudiante_id}.'
+            continue
+        if status not in STATUS_VALIDOS and not (status is None and permitir_borrado):
+            errores[i] = f'Estado inválido: {status}.'
+            continue
+        if estudiante_id in estados:
+            errores[i] = f'Estudiante repetido: {estudiante_id}.'
+            continue
+        estados[estudiante_id] = status
+    por_verificar = [e for e, status in estados.items() if status is not None]
+    if por_verificar:
+        inscritos = set(
+            InscripcionEstudianteGrupo.objects
+            .filter(grupo=grupo, estudiante_id__in=por_verificar)
+            .values_list('estudiante_id', flat=True)
+        )
+        for i, asistencia in enumerate(asistencias_data):
+            if i in errores:
+                continue
+            estudiante_id = uuid.UUID(str(asistencia['studentId']))
+            if estados[estudiante_id] is not None and estudiante_id not in inscritos:
+                errores[i] = f'El estudiante {estudiante_id} no está inscrito en el grupo.'
+    if errores:
+        raise serializers.ValidationError({'asistencias': errores})
+    return estados
+
+
+def crear_asistencias(sesion, estados):
+    """ Inserta las asistencias ya validadas en lotes. Debe llamarse dentro de una transacción. """
+    if packing.activo():
+        return crear_asistencias_empaquetadas(sesion, estados)
+    asistencias = AsistenciaEstudiante.objects.bulk_create(
+        [
+            AsistenciaEstudiante(sesion_clase=sesion, estudiante_id=estudiante_id, status=status)
+            for estudiante_id, status in estados.items()
+        ],
+        batch_size=ASISTENCIAS_BATCH_SIZE,
+    )
+    # bulk_create no emite post_save: las estadísticas se actualizan aquí en bloque
+    registrar_cambios(cambios_de_asistencias(asistencias, 1), {sesion.pk: sesion.grupo_id})
+    sync.registrar(AsistenciaEstudiante, [a.pk for a in asistencias], CambioSync.Operacion.CREADO, sync.docentes_de(SesionClase, sesion.pk))
+    return asistencias
+
+
+def crear_asistencias_empaquetadas(sesion, estados):
+    """ Igual que crear_asistencias pero guarda el pase de lista en un solo AsistenciaEmpaquetada. """
+    packing.guardar(sesion, estados)
+    registrar_cambios(
+        [(sesion.pk, estudiante_id, status, 1) for estudiante_id, status in estados.items()],
+        {sesion.pk: sesion.grupo_id},
+    )
+    # Sin filas individuales: el cambio se reporta como pase de lista de la sesión
+    sync.registrar_pase([sesion.pk], CambioSync.Operacion.CREADO, [sesion.docente_id])
+    return [
+        AsistenciaEstudiante(sesion_clase=sesion, estudiante_id=estudiante_id, status=status)
+        for estudiante_id, status in estados.items()
+    ]
+
+
+def actualizar_asistencias(sesion, estados, completo=False):
+    """
+    Aplica a una sesión existente el pase de lista validado {estudiante_id: status o None}.
+    Se compara con lo guardado (filas y pase empaquetado, en dos queries) y solo se escriben
+    las diferencias: un INSERT en lotes, un UPDATE por status distinto y un DELETE. None quita
+    la asistencia; con `completo` también se quitan las de estudiantes que no aparecen.
+    Debe llamarse dentro de una transacción. Devuelve el número de estudiantes modificados.
+    """
+    filas = {
+        estudiante_id: (pk, status)
+        for pk, estudiante_id, status in AsistenciaEstudiante.objects.filter(sesion_clase=sesion).values_list('id', 'estudiante_id', 'status')
+    }
+    empaquetada = AsistenciaEmpaquetada.objects.filter(sesion=sesion).first()
+    empaquetados = dict(empaquetada.estados_por_estudiante()) if empaquetada else {}
+    actuales = {**empaquetados, **{e: status for e, (_, status) in filas.items()}}
+
+    objetivo = {} if completo else dict(actuales)
+    for estudiante_id, status in estados.items():
+        if status is None:
+            objetivo.pop(estudiante_id, None)
+        else:
+            objetivo[estudiante_id] = status
+    cambios = []
+    for estudiante_id in actuales.keys() | objetivo.keys():
+        antes, despues = actuales.get(estudiante_id), objetivo.get(estudiante_id)
+        if antes != despues:
+            if antes is not None:
+                cambios.append((sesion.pk, estudiante_id, antes, -1))
+            if despues is not None:
+                cambios.append((sesion.pk, estudiante_id, despues, 1))
+    if not cambios:
+        return 0
+
+    if empaquetada or (not filas and packing.activo()):
+        # Pase empaquetado: las filas que conserva (estudiantes ya dados de baja) solo pueden quitarse
+        objetivo_filas = {e: status for e, status in objetivo.items() if e in filas}
+        objetivo_empaquetado = {e: status for e, status in objetivo.items() if e not in filas}
+        if objetivo_empaquetado != empaquetados:
+            packing.reemplazar(sesion, objetivo_empaquetado)
+            sync.registrar_pase([sesion.pk], CambioSync.Operacion.ACTUALIZADO, [sesion.docente_id])
+            sync.registrar_pase_eliminado(sesion.pk, empaquetados.keys() - objetivo_empaquetado.keys(), [sesion.docente_id])
+    else:
+        objetivo_filas = objetivo
+    _aplicar_filas(sesion, filas, objetivo_filas)
+    registrar_cambios(cambios, {sesion.pk: sesion.grupo_id})
+    return len({c[1] for c in cambios})
+
+
+def _aplicar_filas(sesion, filas, objetivo):
+    """ Lleva las filas {estudiante_id: (pk, status)} de la sesión a `objetivo` {estudiante_id: status}. """
+    docentes = [sesion.docente_id]
+    nuevas = AsistenciaEstudiante.objects.bulk_create(
+        [
+            AsistenciaEstudiante(sesion_clase=sesion, estudiante_id=estudiante_id, status=status, docente_id=sesion.docente_id)
+            for estudiante_id, status in objetivo.items() if estudiante_id not in filas
+        ],
+        batch_size=ASISTENCIAS_BATCH_SIZE,
+    )
+    if nuevas:
+        sync.registrar(AsistenciaEstudiante, [a.pk for a in nuevas], CambioSync.Operacion.CREADO, docentes)
+    por_status = defaultdict(list)
+    for estudiante_id, (pk, status) in filas.items():
+        if estudiante_id in objetivo and objetivo[estudiante_id] != status:
+            por_status[objetivo[estudiante_id]].append(pk)
+    for status, pks in por_status.items():
+        AsistenciaEstudiante.objects.filter(pk__in=pks).update(status=status)
+    modificadas = [pk for pks in por_status.values() for pk in pks]
+    if modificadas:
+        sync.registrar(AsistenciaEstudiante, modificadas, CambioSync.Operacion.ACTUALIZADO, docentes)
+    borradas = [pk for estudiante_id, (pk, _) in filas.items() if estudiante_id not in objetivo]
+    if borradas:
+        # Sin señales: las estadísticas se descuentan en bloque junto con el resto de cambios
+        AsistenciaEstudiante.objects.filter(pk__in=borradas)._raw_delete(AsistenciaEstudiante.objects.db)
+        sync.registrar(AsistenciaEstudiante, borradas, CambioSync.Operacion.ELIMINADO, docentes)
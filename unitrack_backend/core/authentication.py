@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Resolución del usuario del JWT sin ir a la base de datos en cada request.
+# El usuario se guarda en CACHES[USUARIOS_CACHE_ALIAS] con la clave del claim (el email) y una
+# vigencia acotada; en memoria local el número de entradas también está acotado. Las señales de
+# core.signals borran la entrada al guardar o borrar el usuario (desactivarlo, cambiar la
+# contraseña en PasswordResetConfirmView, etc.). En memoria local el borrado solo alcanza al
+# proceso que hizo el cambio: los demás lo ven al vencer la entrada; con REDIS_URL es inmediato.
+
+
+def backend():
+    return caches[settings.USUARIOS_CACHE_ALIAS]
+
+
+def clave(user_id):
+    return f'usuario:{user_id}'
+
+
+def invalidar(*user_ids):
+    backend().delete_many([clave(u) for u in user_ids if u])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """ JWTAuthentication con el usuario en caché; en un acierto no hay queries. """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = backend().get(clave(user_id)) if user_id is not None else None
+        if user is None:
+            # Sin caché: la búsqueda y validaciones de simplejwt; solo se guardan usuarios activos
+            user = super().get_user(validated_token)
+            backend().set(clave(user_id), user)
+            return user
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed('La contraseña del usuario cambió.', code='password_changed')
+        return user
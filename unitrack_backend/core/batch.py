@@ -0,0 +1,119 @@
+import json
+import re
+from io import BytesIO
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+
+# Varias escrituras en una sola petición (POST /api/batch/), en una transacción.
+# Cada operación se despacha a la vista real de su ruta, con el usuario ya autenticado de la
+# petición externa, así que pasa por las mismas validaciones, permisos y señales que una
+# petición suelta. Una operación con "ref" guarda el id del objeto creado; las siguientes lo
+# usan escribiendo "$ref" como valor (o como segmento de la ruta). Si una operación falla,
+# se revierte todo y se responde con su error.
+# Solo se admiten escrituras: una lectura dentro de un lote revertido podría dejar en la caché
+# del árbol un contenido que nunca llegó a existir.
+
+MAXIMO_OPERACIONES = 200
+METODOS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+RUTAS = {
+    'materia-list', 'materia-detail',
+    'grupo-list', 'grupo-detail', 'grupo-roster',
+    'estudiante-list', 'estudiante-detail',
+    'sesionclase-list', 'sesionclase-detail',
+    'horarioclase-list', 'horarioclase-detail',
+}
+_REFERENCIA = re.compile(r'^\$([A-Za-z_][\w-]*)$')
+
+
+class OperacionInvalida(Exception):
+    pass
+
+
+def sustituir(valor, refs):
+    """ Reemplaza "$ref" por el id correspondiente en cadenas, listas y dicts anidados. """
+    if isinstance(valor, str):
+        coincidencia = _REFERENCIA.match(valor)
+        if coincidencia is None:
+            return valor
+        if coincidencia.group(1) not in refs:
+            raise OperacionInvalida(f'Referencia desconocida: {valor}.')
+        return refs[coincidencia.group(1)]
+    if isinstance(valor, list):
+        return [sustituir(v, refs) for v in valor]
+    if isinstance(valor, dict):
+        return {k: sustituir(v, refs) for k, v in valor.items()}
+    return valor
+
+
+def leer_operacion(operacion, refs):
+    """ (método, ruta, cuerpo, ref) de una operación, con las referencias ya sustituidas. """
+    if not isinstance(operacion, dict):
+        raise OperacionInvalida('Formato inválido.')
+    metodo = str(operacion.get('method', '')).upper()
+    if metodo not in METODOS:
+        raise OperacionInvalida(f'Método no permitido: {metodo or "(vacío)"}.')
+    ruta = operacion.get('path')
+    if not isinstance(ruta, str) or not ruta.startswith('/'):
+        raise OperacionInvalida('La ruta debe empezar con /.')
+    ruta = '/'.join(sustituir(segmento, refs) for segmento in ruta.split('/'))
+    ref = operacion.get('ref')
+    if ref is not None and (not isinstance(ref, str) or not _REFERENCIA.match(f'${ref}')):
+        raise OperacionInvalida(f'ref inválido: {ref}.')
+    return metodo, ruta, sustituir(operacion.get('body'), refs), ref
+
+
+def despachar(request, metodo, ruta, cuerpo):
+    """ Ejecuta una operación sobre la vista de `ruta`. Devuelve (status, datos de la respuesta). """
+    try:
+        coincidencia = resolve(ruta)
+    except Resolver404:
+        coincidencia = None
+    if coincidencia is None or coincidencia.url_name not in RUTAS:
+        raise OperacionInvalida(f'Ruta no admitida en un lote: {ruta}.')
+    contenido = json.dumps(cuerpo).encode() if cuerpo is not None else b''
+    entorno = {
+        **{k: v for k, v in request.META.items() if not k.startswith('wsgi.')},
+        'REQUEST_METHOD': metodo, 'PATH_INFO': ruta, 'QUERY_STRING': '',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(contenido)),
+        'HTTP_ACCEPT': 'application/json', 'wsgi.input': BytesIO(contenido),
+    }
+    subpeticion = WSGIRequest(entorno)
+    # DRF usa este usuario en lugar de volver a autenticar el token
+    subpeticion._force_auth_user = request.user
+    subpeticion._force_auth_token = request.auth
+    respuesta = coincidencia.func(subpeticion, *coincidencia.args, **coincidencia.kwargs)
+    if hasattr(respuesta, 'render'):
+        respuesta.render()
+    return respuesta.status_code, json.loads(respuesta.content) if respuesta.content else None
+
+
+def ejecutar(request, operaciones):
+    """
+    Ejecuta las operaciones en orden dentro de una transacción. Devuelve (status, cuerpo): 200 con
+    {'results': [{'status', 'body'}], 'refs': {ref: id}} o 400 con el error de la primera que falló.
+    """
+    if not isinstance(operaciones, list) or not operaciones:
+        return 400, {'error': 'operations debe ser una lista no vacía.'}
+    if len(operaciones) > MAXIMO_OPERACIONES:
+        return 400, {'error': f'Máximo {MAXIMO_OPERACIONES} operaciones por lote.'}
+    refs = {}
+    resultados = []
+    with transaction.atomic():
+        for indice, operacion in enumerate(operaciones):
+            try:
+                metodo, ruta, cuerpo, ref = leer_operacion(operacion, refs)
+                status, datos = despachar(request, metodo, ruta, cuerpo)
+            except OperacionInvalida as e:
+                transaction.set_rollback(True)
+                return 400, {'error': str(e), 'index': indice}
+            if status >= 400:
+                transaction.set_rollback(True)
+                return 400, {'error': 'Operación fallida; no se aplicó ningún cambio.', 'index': indice, 'status': status, 'body': datos}
+            if ref is not None:
+                if not isinstance(datos, dict) or 'id' not in datos:
+                    transaction.set_rollback(True)
+                    return 400, {'error': f'La operación no devolvió un id para ref {ref}.', 'index': indice}
+                refs[ref] = datos['id']
+            resultados.append({'status': status, 'body': datos})
+    return 200, {'results': resultados, 'refs': refs}
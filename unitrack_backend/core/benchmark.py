@@ -0,0 +1,317 @@
+import json
+import math
+import platform
+import time
+import django
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from .attendance import crear_asistencias
+from .models import Materia, Grupo, Estudiante, SesionClase, SesionArchivada, AsistenciaEstudiante, AsistenciaEmpaquetada, HorarioClase
+from .synthetic import generar_datos, PASSWORD_SINTETICO
+from . import archivo, cache, fastpath, packing, urls
+
+# Benchmark de las rutas de core/urls.py (comando `medir_endpoints`).
+# Por cada escala se generan datos sintéticos dentro de una transacción que se revierte al
+# final, se llama cada ruta varias veces y se registran percentiles de latencia, queries y
+# tamaño de respuesta. El resultado es JSON para comparar una corrida contra otra.
+# La caché de respuestas se mide en un alias propio en memoria local que se vacía entre
+# llamadas con `sin_cache`: con REDIS_URL, clear() sobre 'arboles' es un FLUSHDB que también
+# borraría la caché 'usuarios' (usuarios autenticados y marcas de escritura de core.replicas).
+
+ESCALAS = {
+    'pequena': {'docentes': 1, 'materias': 2, 'grupos': 2, 'estudiantes': 20, 'sesiones': 10},
+    'mediana': {'docentes': 2, 'materias': 4, 'grupos': 3, 'estudiantes': 40, 'sesiones': 30},
+    'grande': {'docentes': 3, 'materias': 6, 'grupos': 4, 'estudiantes': 60, 'sesiones': 60},
+}
+PERCENTILES = (50, 90, 99)
+BENCHMARK_CACHE_ALIAS = 'benchmark'
+
+
+def percentil(valores, p):
+    """ Percentil por rango más cercano sobre una lista ordenada. """
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def escenarios(docente):
+    """
+    Peticiones a medir: (nombre de la ruta, método, url, cuerpo). Los escenarios de escritura
+    usan datos del propio docente; todo se revierte al terminar la escala. La url puede ser
+    una función que se evalúa antes de cada llamada, fuera de la medición.
+    """
+    materia = Materia.objects.filter(docente=docente).first()
+    grupo = Grupo.objects.filter(docente=docente).first()
+    sesion = SesionClase.objects.filter(docente=docente).first()
+    horario = HorarioClase.objects.filter(docente=docente).first()
+    estudiante = Estudiante.objects.filter(inscripcionestudiantegrupo__grupo=grupo).first()
+    alumnos = list(grupo.inscripciones.values_list('estudiante_id', flat=True))
+    # La sesión más antigua (distinta de la que se modifica) pasa al archivo para medir su lectura
+    antigua = SesionClase.objects.filter(docente=docente).exclude(pk=sesion.pk).order_by('fecha').values_list('pk', flat=True)[:1]
+    archivo.archivar(SesionClase.objects.filter(pk__in=list(antigua)))
+    archivada = SesionArchivada.objects.filter(docente=docente).first()
+
+    def url_confirmacion():
+        # El token caduca al cambiar la contraseña: se genera uno nuevo en cada llamada
+        usuario = type(docente).objects.get(pk=docente.pk)
+        return f'/api/auth/password_reset/confirm/{usuario.pk}/{default_token_generator.make_token(usuario)}/'
+
+    return [
+        ('api-root', 'get', '/api/', None),
+        ('materia-list', 'get', '/api/materias/', None),
+        ('materia-detail', 'get', f'/api/materias/{materia.pk}/', None),
+        ('materia-export', 'get', f'/api/materias/{materia.pk}/export/', None),
+        ('grupo-list', 'get', '/api/grupos/', None),
+        ('grupo-detail', 'get', f'/api/grupos/{grupo.pk}/', None),
+        ('grupo-summary', 'get', f'/api/grupos/{grupo.pk}/summary/', None),
+        ('grupo-export', 'get', f'/api/grupos/{grupo.pk}/export/?formato=xlsx', None),
+        ('grupo-roster', 'post', f'/api/grupos/{grupo.pk}/roster/', [
+            {'nombre': f'Alumno bench {n}', 'matricula': f'BENCH{n:05d}'} for n in range(50)
+        ]),
+        ('estudiante-list', 'get', '/api/estudiantes/', None),
+        ('estudiante-at-risk', 'get', '/api/estudiantes/at_risk/', None),
+        ('estudiante-detail', 'get', f'/api/estudiantes/{estudiante.pk}/', None),
+        ('sesionclase-list', 'get', '/api/sesiones/', None),
+        ('sesionclase-detail', 'get', f'/api/sesiones/{sesion.pk}/', None),
+        ('sesionclase-list', 'post', '/api/sesiones/', {
+            'grupo': str(grupo.pk), 'fecha': timezone.now().isoformat(),
+            'asistencias': [{'studentId': str(pk), 'status': 'Presente'} for pk in alumnos],
+        }),
+        ('sesionclase-detail', 'patch', f'/api/sesiones/{sesion.pk}/', {
+            'asistencias': [
+                {'studentId': str(pk), 'status': 'Ausente'}
+                for pk in sesion.grupo.inscripciones.values_list('estudiante_id', flat=True)[:2]
+            ],
+        }),
+        ('sesionarchivada-list', 'get', f'/api/archivo/sesiones/?grupo={archivada.grupo_id}', None),
+        ('sesionarchivada-detail', 'get', f'/api/archivo/sesiones/{archivada.pk}/', None),
+        ('horarioclase-list', 'get', '/api/horarios/', None),
+        ('horarioclase-detail', 'get', f'/api/horarios/{horario.pk}/', None),
+        ('today_classes', 'get', '/api/dashboard/today_classes/', None),
+        ('batch', 'post', '/api/batch/', {'operations': [
+            {'method': 'POST', 'path': '/api/materias/', 'body': {'nombre': 'Materia bench', 'codigo': 'BENCH'}, 'ref': 'm'},
+            {'method': 'POST', 'path': '/api/grupos/', 'body': {'nombre': 'Grupo bench', 'materia': '$m'}, 'ref': 'g'},
+        ] + [
+            {'method': 'POST', 'path': '/api/estudiantes/', 'body': {'nombre': f'Alumno bench {n}', 'studentId': f'BATCH{n:03d}', 'grupo': '$g'}}
+            for n in range(10)
+        ]}),
+        ('sync', 'get', '/api/sync/?since=0', None),
+        ('cache_stats', 'get', '/api/cache/stats/', None),
+        ('logout', 'post', '/api/auth/logout/', None),
+        ('password_reset', 'post', '/api/auth/password_reset/', {'email': docente.email}),
+        ('password_reset_confirm', 'post', url_confirmacion, {'password': PASSWORD_SINTETICO}),
+        ('token_obtain_pair', 'post', '/api/auth/login/', {'email': docente.email, 'password': PASSWORD_SINTETICO}),
+        ('token_refresh', 'post', '/api/auth/refresh/', {'refresh': str(RefreshToken.for_user(docente))}),
+    ]
+
+
+def rutas_sin_escenario(lista):
+    """ Nombres de ruta de core/urls.py sin escenario en `lista`; debe quedar vacío. """
+    return sorted({p.name for p in urls.urlpatterns if p.name} - {e[0] for e in lista})
+
+
+def _cache_propia():
+    return override_settings(
+        CACHES={**settings.CACHES, BENCHMARK_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unitrack-benchmark',
+            'TIMEOUT': 60 * 60,
+        }},
+        ARBOL_CACHE_ALIAS=BENCHMARK_CACHE_ALIAS,
+    )
+
+
+def _medir(cliente, metodo, url, cuerpo, sin_cache):
+    if callable(url):
+        url = url()
+    if sin_cache:
+        cache.backend().clear()
+    with CaptureQueriesContext(connection) as queries:
+        inicio = time.perf_counter()
+        response = getattr(cliente, metodo)(url, cuerpo, format='json') if cuerpo is not None else getattr(cliente, metodo)(url)
+        tamano = len(b''.join(response.streaming_content)) if response.streaming else len(response.content)
+        duracion = (time.perf_counter() - inicio) * 1000
+    sql_ms = sum(float(q['time']) for q in queries.captured_queries) * 1000
+    return response, duracion, len(queries), sql_ms, tamano
+
+
+def medir_escala(nombre, tamano, repeticiones=20, calentamiento=2, sin_cache=False, semilla=0):
+    """ Genera la escala, mide todas las rutas y revierte los datos. """
+    with _cache_propia():
+        with transaction.atomic():
+            docentes, filas = generar_datos(semilla=semilla, prefijo=f'bench-{nombre}', **tamano)
+            docente = docentes[0]
+            docente.is_staff = True  # /api/cache/stats/ es solo para staff
+            docente.save(update_fields=['is_staff'])
+            cliente = APIClient()
+            cache.backend().clear()
+            rutas = []
+            lista = escenarios(docente)
+            for ruta, metodo, url, cuerpo in lista:
+                muestras = []
+                for i in range(calentamiento + repeticiones):
+                    cliente.force_authenticate(docente)
+                    response, duracion, n_queries, sql_ms, bytes_ = _medir(cliente, metodo, url, cuerpo, sin_cache)
+                    if i >= calentamiento:
+                        muestras.append((duracion, n_queries, sql_ms, bytes_, response.status_code, response.get('X-Cache')))
+                latencias = sorted(m[0] for m in muestras)
+                queries = [m[1] for m in muestras]
+                cache_hits = [m[5] for m in muestras if m[5]]
+                rutas.append({
+                    'ruta': ruta,
+                    'metodo': metodo.upper(),
+                    'url': url if isinstance(url, str) else None,
+                    'status': sorted({m[4] for m in muestras}),
+                    **{f'p{p}_ms': round(percentil(latencias, p), 3) for p in PERCENTILES},
+                    'media_ms': round(sum(latencias) / len(latencias), 3),
+                    'max_ms': round(latencias[-1], 3),
+                    'queries': sorted(queries)[len(queries) // 2],
+                    'queries_max': max(queries),
+                    'sql_ms': round(sum(m[2] for m in muestras) / len(muestras), 3),
+                    'bytes': muestras[-1][3],
+                    'cache_hits': cache_hits.count('HIT') if cache_hits else None,
+                })
+            resultado = {
+                'nombre': nombre, 'tamano': tamano, 'filas': filas, 'rutas': rutas,
+                'rutas_sin_medir': rutas_sin_escenario(lista),
+            }
+            transaction.set_rollback(True)
+        cache.backend().clear()
+        return resultado
+
+
+def tamano_tabla(modelo):
+    """ Bytes que ocupan la tabla del modelo y sus índices, o None si el backend no lo expone. """
+    tabla = modelo._meta.db_table
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # Requiere SQLite compilado con SQLITE_ENABLE_DBSTAT_VTAB (el de CPython lo está)
+                cursor.execute(
+                    'SELECT SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name WHERE m.tbl_name = %s',
+                    [tabla],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [tabla])
+            else:
+                return None
+            return cursor.fetchone()[0] or 0
+    except DatabaseError:
+        return None
+
+
+def _mediana_ms(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return round(sorted(tiempos)[len(tiempos) // 2], 3)
+
+
+def _medir_modo(sesion_ids, grupo, repeticiones):
+    alumnos = list(grupo.inscripciones.values_list('estudiante_id', flat=True))
+    estados = {pk: AsistenciaEstudiante.AttendanceStatus.PRESENTE for pk in alumnos}
+
+    def escribir():
+        sesion = SesionClase.objects.create(grupo=grupo, fecha=timezone.now())
+        crear_asistencias(sesion, estados)
+
+    return {
+        'bytes': sum(tamano_tabla(m) or 0 for m in (AsistenciaEstudiante, AsistenciaEmpaquetada)),
+        'lectura_ms': _mediana_ms(lambda: fastpath._asistencias_por_sesion(sesion_ids), repeticiones),
+        # La escritura se mide al final para no inflar el tamaño medido
+        'escritura_ms': _mediana_ms(escribir, repeticiones),
+    }
+
+
+def medir_almacenamiento(nombre, tamano, repeticiones=5, semilla=0):
+    """
+    Compara el pase de lista en filas (una AsistenciaEstudiante por estudiante) contra el
+    empaquetado de core.packing: bytes en disco, lectura de todas las asistencias de la escala y
+    escritura de una sesión nueva. Los datos se revierten al terminar.
+    """
+    with transaction.atomic():
+        docentes, filas = generar_datos(semilla=semilla, prefijo=f'bench-almacen-{nombre}', **tamano)
+        sesiones = SesionClase.objects.filter(docente__in=docentes)
+        sesion_ids = list(sesiones.values_list('id', flat=True))
+        grupo = Grupo.objects.filter(docente=docentes[0]).first()
+        with override_settings(ASISTENCIA_EMPAQUETADA=False):
+            en_filas = _medir_modo(sesion_ids, grupo, repeticiones)
+        packing.empaquetar(sesiones)
+        with override_settings(ASISTENCIA_EMPAQUETADA=True):
+            empaquetado = _medir_modo(sesion_ids, grupo, repeticiones)
+        transaction.set_rollback(True)
+    return {
+        'nombre': nombre,
+        'asistencias': filas['asistencias'],
+        'filas': en_filas,
+        'empaquetado': empaquetado,
+        'proporcion_bytes': round(empaquetado['bytes'] / en_filas['bytes'], 4) if en_filas['bytes'] else None,
+    }
+
+
+def ejecutar(escalas, repeticiones=20, calentamiento=2, sin_cache=False, semilla=0, almacenamiento=False):
+    """
+    escalas: lista de (nombre, tamaño). Devuelve el reporte completo; con `almacenamiento`
+    incluye además la comparación de medir_almacenamiento por escala.
+    """
+    # El cliente de pruebas usa el host 'testserver' y el reset de contraseña envía correo
+    with override_settings(
+        ALLOWED_HOSTS=['testserver'], EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    ):
+        medidas = [
+            medir_escala(nombre, tamano, repeticiones, calentamiento, sin_cache, semilla)
+            for nombre, tamano in escalas
+        ]
+    reporte = {
+        'fecha': timezone.now().isoformat(),
+        'entorno': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_de_datos': connection.vendor,
+        },
+        'repeticiones': repeticiones,
+        'sin_cache': sin_cache,
+        'escalas': medidas,
+    }
+    if almacenamiento:
+        reporte['almacenamiento'] = [
+            medir_almacenamiento(nombre, tamano, semilla=semilla) for nombre, tamano in escalas
+        ]
+    return reporte
+
+
+def comparar(anterior, actual, umbral=1.2):
+    """
+    Compara dos reportes por escala, ruta y método. Devuelve las regresiones: p50 más lento
+    que `umbral` veces el anterior o más queries que antes.
+    """
+    def indice(reporte):
+        return {
+            (escala['nombre'], r['ruta'], r['metodo']): r
+            for escala in reporte['escalas'] for r in escala['rutas']
+        }
+    previas = indice(anterior)
+    regresiones = []
+    for clave, ruta in indice(actual).items():
+        previa = previas.get(clave)
+        if previa is None:
+            continue
+        if ruta['queries_max'] > previa['queries_max'] or ruta['p50_ms'] > previa['p50_ms'] * umbral:
+            regresiones.append({
+                'escala': clave[0], 'ruta': clave[1], 'metodo': clave[2],
+                'p50_ms': [previa['p50_ms'], ruta['p50_ms']],
+                'queries_max': [previa['queries_max'], ruta['queries_max']],
+            })
+    return regresiones
+
+
+def guardar(reporte, ruta):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(reporte, archivo, ensure_ascii=False, indent=2)
@@ -0,0 +1,247 @@
+from django.db import connection
+from django.db.models import F, Lookup, Q
+from rest_framework.utils.urls import replace_query_param
+from .models import Estudiante, Materia
+
+# Búsqueda por texto (?q=) de estudiantes y materias con índice real en la base de datos.
+# Los resultados se ordenan en dos bloques: primero los que empiezan por la clave
+# (matrícula o código; índice B-tree por rango), después las coincidencias de texto en
+# cualquier parte del nombre o la clave, ordenadas por relevancia.
+#   - SQLite: tabla FTS5 con tokenizador trigram (subcadenas de 3 o más caracteres, sin
+#     distinguir mayúsculas), mantenida por triggers sobre la tabla del modelo y ligada a
+#     ella por la pk.
+#   - PostgreSQL: pg_trgm con índice GIN sobre cada columna, consultado con ILIKE (icontains
+#     genera UPPER(col::text) LIKE, que ese índice no sirve); la relevancia es TrigramSimilarity.
+#   - Otros backends: icontains sin índice.
+# Django recrea la tabla completa en algunas migraciones de SQLite y con ella se pierden los
+# triggers; en post_migrate se restauran y el índice se reconstruye (ver core.signals).
+
+# (modelo, campo clave con búsqueda por prefijo, campos de texto)
+INDICES = [
+    (Estudiante, 'matricula', ('nombre_completo', 'matricula')),
+    (Materia, 'codigo', ('nombre', 'codigo')),
+]
+LIMITE_PAGINA = 20
+LIMITE_PAGINA_MAXIMO = 100
+MINIMO_TRIGRAMA = 3
+
+
+def _tabla_fts(modelo):
+    return f'{modelo._meta.db_table}_fts'
+
+
+def _tabla_filas(modelo):
+    return f'{modelo._meta.db_table}_fts_filas'
+
+
+def _sql_sqlite(modelo, campos):
+    tabla = modelo._meta.db_table
+    fts = _tabla_fts(modelo)
+    filas = _tabla_filas(modelo)
+    pk = modelo._meta.pk.column
+    columnas = ', '.join(campos)
+    nuevos = ', '.join(f'new.{c}' for c in campos)
+    viejos = ', '.join(f'old.{c}' for c in campos)
+    # Tabla FTS5 sin contenido (solo el índice de trigramas) con rowid propio y estable: el
+    # rowid implícito de una tabla con pk UUID cambia con VACUUM o al recrearla. `filas` asigna
+    # ese rowid a cada pk y los triggers lo buscan por pk.
+    alta = (
+        f"INSERT INTO {filas}({pk}) VALUES (new.{pk}); "
+        f"INSERT INTO {fts}(rowid, {columnas}) SELECT fila, {nuevos} FROM {filas} WHERE {pk} = new.{pk};"
+    )
+    baja = (
+        f"INSERT INTO {fts}({fts}, rowid, {columnas}) SELECT 'delete', fila, {viejos} FROM {filas} WHERE {pk} = old.{pk}; "
+        f"DELETE FROM {filas} WHERE {pk} = old.{pk};"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columnas}, content='', tokenize='trigram')",
+        f"CREATE TABLE IF NOT EXISTS {filas} (fila INTEGER PRIMARY KEY, {pk} TEXT NOT NULL UNIQUE)",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN {alta} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN {baja} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabla} BEGIN {baja} {alta} END",
+    ]
+
+
+def _reindexar_sqlite(cursor, modelo, campos):
+    """ Vuelve a llenar el índice desde la tabla (sin contenido no hay 'rebuild'). """
+    tabla = modelo._meta.db_table
+    fts = _tabla_fts(modelo)
+    filas = _tabla_filas(modelo)
+    pk = modelo._meta.pk.column
+    cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')")
+    cursor.execute(f'DELETE FROM {filas}')
+    cursor.execute(f'INSERT INTO {filas}({pk}) SELECT {pk} FROM {tabla}')
+    cursor.execute(
+        f"INSERT INTO {fts}(rowid, {', '.join(campos)}) "
+        f"SELECT f.fila, {', '.join(f't.{c}' for c in campos)} FROM {tabla} t JOIN {filas} f ON f.{pk} = t.{pk}"
+    )
+
+
+def instalar(conexion=connection, solo_reparar=False):
+    """
+    Crea los índices de búsqueda que falten en la base de datos de `conexion`. Con
+    `solo_reparar` únicamente restaura los triggers de tablas FTS5 que ya existen.
+    """
+    with conexion.cursor() as cursor:
+        for modelo, clave, campos in INDICES:
+            tabla = modelo._meta.db_table
+            columnas = [modelo._meta.get_field(c).column for c in campos]
+            if conexion.vendor == 'sqlite':
+                fts = _tabla_fts(modelo)
+                cursor.execute(
+                    "SELECT type, COUNT(*) FROM sqlite_master WHERE name = %s OR (type = 'trigger' AND name LIKE %s) GROUP BY type",
+                    [fts, f'{fts}_a_'],
+                )
+                existentes = dict(cursor.fetchall())
+                if existentes.get('trigger') == 3 or (solo_reparar and 'table' not in existentes):
+                    continue
+                for sql in _sql_sqlite(modelo, columnas):
+                    cursor.execute(sql)
+                # Sin triggers la tabla pudo cambiar (p. ej. al recrearla en una migración)
+                _reindexar_sqlite(cursor, modelo, columnas)
+            elif conexion.vendor == 'postgresql' and not solo_reparar:
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                trigramas = ', '.join(f'{c} gin_trgm_ops' for c in columnas)
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {tabla}_busqueda_trgm ON {tabla} USING gin ({trigramas})')
+                columna_clave = modelo._meta.get_field(clave).column
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {tabla}_busqueda_prefijo ON {tabla} ({columna_clave} varchar_pattern_ops)'
+                )
+
+
+def desinstalar(conexion=connection):
+    with conexion.cursor() as cursor:
+        for modelo, _, _ in INDICES:
+            tabla = modelo._meta.db_table
+            if conexion.vendor == 'sqlite':
+                fts = _tabla_fts(modelo)
+                for sufijo in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{sufijo}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+                cursor.execute(f'DROP TABLE IF EXISTS {_tabla_filas(modelo)}')
+            elif conexion.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_trgm')
+                cursor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_prefijo')
+
+
+def _por_prefijo(ambito, clave, q, limite):
+    # Matrículas y códigos suelen ir en mayúsculas: se prueba también el prefijo en mayúsculas
+    condicion = Q()
+    for prefijo in {q, q.upper()}:
+        if connection.vendor == 'sqlite':
+            # LIKE con ESCAPE no usa el índice en SQLite; el rango sí
+            condicion |= Q(**{f'{clave}__gte': prefijo, f'{clave}__lt': prefijo + '\U0010ffff'})
+        else:
+            condicion |= Q(**{f'{clave}__startswith': prefijo})
+    return list(ambito.filter(condicion).order_by(clave).values_list('pk', flat=True)[:limite])
+
+
+def _por_texto_sqlite(modelo, ambito, campos, terminos, limite):
+    largos = [t for t in terminos if len(t) >= MINIMO_TRIGRAMA]
+    if not largos:
+        return []
+    fts = _tabla_fts(modelo)
+    filas = _tabla_filas(modelo)
+    tabla = modelo._meta.db_table
+    pk = modelo._meta.pk.column
+    # Cada término como frase entre comillas (sin sintaxis FTS5); todos deben aparecer
+    consulta = ' '.join('"%s"' % t.replace('"', '""') for t in largos)
+    # extra() mantiene el MATCH en el mismo query que las condiciones de `ambito`: SQLite
+    # parte del índice FTS5 y verifica el ámbito solo sobre las coincidencias
+    resultados = ambito.extra(
+        tables=[fts, filas], where=[f'{fts}.rowid = {filas}.fila', f'{filas}.{pk} = {tabla}.{pk}', f'{fts} MATCH %s'],
+        params=[consulta],
+        order_by=[f'{fts}.rank'],
+    )
+    for termino in terminos:
+        if len(termino) < MINIMO_TRIGRAMA:
+            # Demasiado corto para el trigrama: se filtra sobre las coincidencias del índice
+            resultados = resultados.filter(_coincide(campos, termino))
+    return list(resultados.values_list('pk', flat=True)[:limite])
+
+
+class _ContieneIlike(Lookup):
+    """ `col ILIKE '%termino%'` de PostgreSQL, que el índice gin_trgm_ops de la columna resuelve. """
+    lookup_name = 'contiene_ilike'
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', ['%%%s%%' % connection.ops.prep_for_like_query(value)]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', [*lhs_params, *rhs_params]
+
+
+def _coincide(campos, termino):
+    condicion = Q()
+    for campo in campos:
+        if connection.vendor == 'postgresql':
+            condicion |= Q(_ContieneIlike(F(campo), termino))
+        else:
+            condicion |= Q(**{f'{campo}__icontains': termino})
+    return condicion
+
+
+def _por_texto(modelo, ambito, campos, terminos, q, limite):
+    if connection.vendor == 'sqlite':
+        return _por_texto_sqlite(modelo, ambito, campos, terminos, limite)
+    resultados = ambito
+    for termino in terminos:
+        resultados = resultados.filter(_coincide(campos, termino))
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        resultados = resultados.annotate(similitud=TrigramSimilarity(campos[0], q)).order_by('-similitud', 'pk')
+    else:
+        resultados = resultados.order_by(campos[0], 'pk')
+    return list(resultados.values_list('pk', flat=True)[:limite])
+
+
+def buscar(ambito, q, limite=LIMITE_PAGINA, desplazamiento=0):
+    """
+    Pks de `ambito` (queryset ya acotado al docente) que coinciden con `q`, en orden de
+    relevancia. Devuelve hasta `limite` a partir de `desplazamiento`. El ámbito se evalúa por
+    fila candidata, así que conviene expresarlo con Exists() y no con pk__in=subquery.
+    """
+    modelo = ambito.model
+    _, clave, campos = next(indice for indice in INDICES if indice[0] is modelo)
+    q = ' '.join(q.split())
+    if not q:
+        return []
+    necesarios = desplazamiento + limite
+    pks = _por_prefijo(ambito, clave, q, necesarios)
+    if len(pks) >= necesarios:
+        # La página se llena con el prefijo: no hace falta ordenar todas las coincidencias de texto
+        return pks[desplazamiento:necesarios]
+    vistos = set(pks)
+    for pk in _por_texto(modelo, ambito, campos, q.split(), q, necesarios + len(pks)):
+        if pk not in vistos:
+            vistos.add(pk)
+            pks.append(pk)
+    return pks[desplazamiento:necesarios]
+
+
+def pagina(request):
+    """ (limite, desplazamiento) de ?limit= y ?offset=, acotados. """
+    def entero(nombre, defecto, maximo=None):
+        try:
+            valor = max(0, int(request.query_params.get(nombre, defecto)))
+        except ValueError:
+            valor = defecto
+        return min(valor, maximo) if maximo else valor
+    return entero('limit', LIMITE_PAGINA, LIMITE_PAGINA_MAXIMO) or LIMITE_PAGINA, entero('offset', 0)
+
+
+def resultados(request, ambito, serializar):
+    """
+    Respuesta paginada de la búsqueda ?q=: {'results': [...], 'next': url o None}.
+    `serializar` recibe la lista de objetos ya en orden de relevancia.
+    """
+    limite, desplazamiento = pagina(request)
+    pks = buscar(ambito, request.query_params['q'], limite + 1, desplazamiento)
+    objetos = ambito.in_bulk(pks[:limite])
+    siguiente = None
+    if len(pks) > limite:
+        siguiente = replace_query_param(request.build_absolute_uri(), 'offset', desplazamiento + limite)
+    return {'results': serializar([objetos[pk] for pk in pks[:limite] if pk in objetos]), 'next': siguiente}
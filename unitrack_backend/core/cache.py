@@ -0,0 +1,56 @@
+import threading
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+
+# Caché de respuestas renderizadas del árbol de cada docente.
+# Cada entrada guarda (versión, contenido); la versión es el cursor de CambioSync del docente,
+# así que cualquier escritura sobre sus objetos invalida exactamente sus entradas y las de
+# otros docentes siguen siendo válidas. El backend (memoria local o compartido) y el límite
+# de entradas se configuran en CACHES[ARBOL_CACHE_ALIAS].
+
+_contadores = Counter()
+_lock = threading.Lock()
+
+
+def _contar(evento):
+    with _lock:
+        _contadores[evento] += 1
+
+
+def backend():
+    return caches[settings.ARBOL_CACHE_ALIAS]
+
+
+def clave(docente_id, variante):
+    return f'arbol:{docente_id}:{variante}'
+
+
+def obtener(docente_id, variante, version):
+    entrada = backend().get(clave(docente_id, variante))
+    if entrada is not None and entrada[0] == version:
+        _contar('hits')
+        return entrada[1]
+    _contar('misses')
+    return None
+
+
+def guardar(docente_id, variante, version, contenido):
+    if len(contenido) > settings.ARBOL_CACHE_MAX_BYTES:
+        _contar('omitidos')
+        return
+    backend().set(clave(docente_id, variante), (version, contenido))
+    _contar('guardados')
+
+
+def estadisticas():
+    with _lock:
+        datos = {k: _contadores[k] for k in ('hits', 'misses', 'guardados', 'omitidos')}
+    consultas = datos['hits'] + datos['misses']
+    datos['hitRate'] = round(datos['hits'] / consultas, 4) if consultas else 0.0
+    return datos
+
+
+def reiniciar_estadisticas():
+    with _lock:
+        _contadores.clear()
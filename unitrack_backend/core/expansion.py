@@ -0,0 +1,54 @@
+# Selección de campos (?fields=) y de relaciones anidadas (?expand=) en los endpoints de lectura.
+#
+#   ?fields=id,nombre,codigo            solo esos campos en el nivel raíz
+#   ?fields=id,grupos.id,grupos.nombre  también se pueden seleccionar campos anidados
+#   ?expand=                            ninguna relación anidada
+#   ?expand=grupos.sesiones             grupos y sus sesiones, sin estudiantes ni asistencias
+#
+# Sin parámetros se conserva la respuesta completa. Las relaciones que no se piden no se
+# serializan ni se precargan (ver core.loaders).
+
+
+def _lista(valor):
+    return {parte.strip() for parte in valor.split(',') if parte.strip()}
+
+
+class Expansion:
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = None
+        if expand is not None:
+            # 'grupos.sesiones' implica 'grupos'
+            self.expand = set()
+            for ruta in expand:
+                partes = ruta.split('.')
+                self.expand.update('.'.join(partes[:i]) for i in range(1, len(partes) + 1))
+
+    @classmethod
+    def desde_request(cls, request):
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return cls()
+        params = request.query_params
+        fields = _lista(params['fields']) if 'fields' in params else None
+        expand = _lista(params['expand']) if 'expand' in params else None
+        return cls(fields, expand)
+
+    def campos(self, ruta, nombres):
+        """ Filtra los nombres de campo disponibles en el nivel `ruta` ('' es la raíz). """
+        if self.fields is None:
+            return list(nombres)
+        prefijo = f'{ruta}.' if ruta else ''
+        elegidos = {f[len(prefijo):].split('.')[0] for f in self.fields if f.startswith(prefijo)}
+        if ruta and not elegidos:
+            # Una relación pedida sin subcampos se devuelve completa
+            return list(nombres)
+        return [n for n in nombres if n in elegidos]
+
+    def incluye(self, ruta):
+        """ Indica si la relación anidada `ruta` (p. ej. 'grupos.sesiones') se debe devolver. """
+        if self.expand is not None and ruta not in self.expand:
+            return False
+        padre, _, nombre = ruta.rpartition('.')
+        if padre and not self.incluye(padre):
+            return False
+        return nombre in self.campos(padre, [nombre])
@@ -0,0 +1,195 @@
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape
+from .models import InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada, SesionArchivada
+from .packing import decodificar
+
+# Exportación de la matriz de asistencia (estudiantes x sesiones) en CSV o XLSX.
+# Las filas se generan mientras se leen de la base de datos con iterator() (cursores del lado
+# del servidor en PostgreSQL) y se envían por trozos, así que la memoria usada no depende del
+# tamaño total: solo se mantienen las sesiones del grupo, un lote de estudiantes y un trozo
+# de pases de lista a la vez.
+# Las sesiones archivadas (core.archivo) se incluyen como columnas junto a las activas.
+
+CHUNK_EXPORTACION = 2000
+# Pases de lista (empaquetados o archivados) leídos por viaje a la base de datos
+CHUNK_PASES = 100
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def matriz_grupo(grupo, tamano_lote=None):
+    """
+    Genera la cabecera y luego una fila por estudiante inscrito en el grupo.
+    Los estudiantes se recorren por lotes y, por cada lote, se leen solo sus asistencias.
+    """
+    tamano_lote = tamano_lote or CHUNK_EXPORTACION
+    sesiones = sorted(
+        list(SesionClase.objects.filter(grupo=grupo).values_list('fecha', 'id', 'nombre'))
+        + list(SesionArchivada.objects.filter(grupo=grupo).values_list('fecha', 'id', 'nombre'))
+    )
+    columna = {sesion_id: i for i, (_, sesion_id, _) in enumerate(sesiones)}
+    # Los pases de lista empaquetados y archivados no se cargan todos: se recorren con
+    # iterator() por cada lote de estudiantes y se decodifica una sesión a la vez
+    empaquetadas = AsistenciaEmpaquetada.objects.filter(sesion__grupo=grupo).values_list('sesion_id', 'estados', 'total')
+    # Archivadas: ids de estudiante concatenados (16 bytes cada uno) y estados en el mismo orden
+    archivadas = SesionArchivada.objects.filter(grupo=grupo).values_list('id', 'estudiantes', 'estados', 'total')
+    yield ['Matrícula', 'Nombre'] + [f"{nombre} ({fecha.strftime('%Y-%m-%d')})" for fecha, _, nombre in sesiones]
+
+    alumnos = (
+        InscripcionEstudianteGrupo.objects.filter(grupo=grupo)
+        .order_by('estudiante__nombre_completo', 'estudiante_id')
+        .values_list('estudiante_id', 'estudiante__matricula', 'estudiante__nombre_completo', 'indice')
+        .iterator(chunk_size=tamano_lote)
+    )
+    for lote in _lotes(alumnos, tamano_lote):
+        estados = {estudiante_id: [''] * len(sesiones) for estudiante_id, _, _, _ in lote}
+        asistencias = AsistenciaEstudiante.objects.filter(
+            sesion_clase__grupo=grupo, estudiante_id__in=list(estados),
+        ).values_list('estudiante_id', 'sesion_clase_id', 'status')
+        for estudiante_id, sesion_id, status in asistencias.iterator(chunk_size=tamano_lote):
+            estados[estudiante_id][columna[sesion_id]] = status
+        for sesion_id, datos, total in empaquetadas.iterator(chunk_size=CHUNK_PASES):
+            i = columna[sesion_id]
+            pase = decodificar(datos, total)
+            for estudiante_id, _, _, indice in lote:
+                if indice < total and pase[indice]:
+                    estados[estudiante_id][i] = pase[indice]
+        claves = {estudiante_id.bytes: estudiante_id for estudiante_id in estados}
+        for sesion_id, ids, datos, total in archivadas.iterator(chunk_size=CHUNK_PASES):
+            i = columna[sesion_id]
+            ids = bytes(ids)
+            for posicion, status in enumerate(decodificar(datos, total)):
+                estudiante_id = claves.get(ids[posicion * 16:(posicion + 1) * 16])
+                if estudiante_id is not None:
+                    estados[estudiante_id][i] = status or ''
+        for estudiante_id, matricula, nombre, _ in lote:
+            yield [matricula, nombre] + estados[estudiante_id]
+
+
+class _Salida:
+    """ Archivo de solo escritura cuyo contenido se vacía en cada trozo de la respuesta. """
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+def exportar_csv(hojas, filas_por_trozo=200):
+    """ hojas: iterable de (titulo, filas). Con varias hojas se agrega una columna 'Grupo'. """
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    salida.write('\ufeff')  # BOM para que Excel detecte UTF-8
+    hojas = list(hojas)
+    varias = len(hojas) > 1
+    for n, (titulo, filas) in enumerate(hojas):
+        if n:
+            escritor.writerow([])
+        for i, fila in enumerate(filas):
+            escritor.writerow(([titulo if i else 'Grupo'] + fila) if varias else fila)
+            if i % filas_por_trozo == 0:
+                yield salida.getvalue().encode()
+                salida.seek(0)
+                salida.truncate()
+    yield salida.getvalue().encode()
+
+
+def _nombre_hoja(titulo, usados):
+    limpio = ''.join('_' if c in '[]:*?/\\' else c for c in titulo)[:31] or 'Hoja'
+    nombre, n = limpio, 1
+    while nombre.lower() in usados:
+        n += 1
+        nombre = f'{limpio[:28]}~{n}'
+    usados.add(nombre.lower())
+    return nombre
+
+
+def _celda(valor):
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(valor))}</t></is></c>'
+
+
+def exportar_xlsx(hojas, filas_por_trozo=200):
+    """ Escribe un XLSX mínimo (una hoja por título) en streaming, sin cargar la matriz en memoria. """
+    salida = _Salida()
+    usados = set()
+    nombres = []
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as libro:
+        for n, (titulo, filas) in enumerate(hojas, start=1):
+            nombres.append(_nombre_hoja(titulo, usados))
+            with libro.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as hoja:
+                hoja.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+                for i, fila in enumerate(filas, start=1):
+                    hoja.write(f'<row r="{i}">{"".join(_celda(v) for v in fila)}</row>'.encode())
+                    if i % filas_por_trozo == 0:
+                        yield salida.vaciar()
+                hoja.write(b'</sheetData></worksheet>')
+            yield salida.vaciar()
+
+        tipos = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for n in range(1, len(nombres) + 1)
+        )
+        libro.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f'{tipos}</Types>'
+        ))
+        libro.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ))
+        hojas_xml = ''.join(
+            f'<sheet name="{escape(nombre, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, nombre in enumerate(nombres, start=1)
+        )
+        libro.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{hojas_xml}</sheets></workbook>'
+        ))
+        relaciones = ''.join(
+            f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>'
+            for n in range(1, len(nombres) + 1)
+        )
+        libro.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relaciones}</Relationships>'
+        ))
+    yield salida.vaciar()
+
+
+FORMATOS = {
+    'csv': (exportar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (exportar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
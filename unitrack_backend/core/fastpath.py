@@ -0,0 +1,128 @@
+import json
+from collections import defaultdict
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.http import parse_header_parameters
+from rest_framework import serializers
+from .models import Materia, Grupo, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante
+from .packing import asistencias_de_sesiones
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa json de la biblioteca estándar
+    orjson = None
+
+# Lectura rápida para los listados de materias y sesiones (settings.LECTURA_RAPIDA).
+# Construye la misma estructura que MateriaSerializer / SesionClaseSerializer directamente
+# desde tuplas de values_list() y la codifica con orjson, sin pasar por los campos de DRF.
+# Los queries replican los del prefetch de core.loaders para devolver los mismos datos en
+# el mismo orden; las pruebas de paridad verifican que la salida sea idéntica byte a byte.
+
+_fecha = serializers.DateTimeField()
+_U2028 = '\u2028'.encode()
+_U2029 = '\u2029'.encode()
+
+
+def activa(request):
+    """
+    El modo rápido solo aplica a JSON compacto (sin `Accept: application/json; indent=N`), sin
+    selección de campos (?fields= / ?expand=) ni búsqueda (?q=).
+    """
+    return (
+        getattr(settings, 'LECTURA_RAPIDA', False)
+        and request.accepted_renderer.format == 'json'
+        and 'indent' not in parse_header_parameters(request.accepted_media_type or '')[1]
+        and 'fields' not in request.query_params
+        and 'expand' not in request.query_params
+        and 'q' not in request.query_params
+    )
+
+
+def renderizar(data):
+    """
+    Mismos bytes que JSONRenderer de DRF: compacto, UTF-8 sin escapar salvo U+2028 y U+2029,
+    que DRF escapa porque son saltos de línea en JavaScript anterior a ES2019.
+    """
+    if orjson is not None:
+        contenido = orjson.dumps(data)
+    else:
+        contenido = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    return contenido.replace(_U2028, b'\\u2028').replace(_U2029, b'\\u2029')
+
+
+def respuesta(data):
+    return respuesta_renderizada(renderizar(data))
+
+
+def respuesta_renderizada(contenido):
+    return HttpResponse(contenido, content_type='application/json')
+
+
+def _asistencias_por_sesion(sesion_ids):
+    por_sesion = defaultdict(list)
+    if sesion_ids:
+        filas = AsistenciaEstudiante.objects.filter(sesion_clase_id__in=sesion_ids).values_list(
+            'sesion_clase_id', 'estudiante_id', 'status',
+        )
+        for sesion_id, estudiante_id, status in filas:
+            por_sesion[sesion_id].append({'studentId': str(estudiante_id), 'status': status})
+        for sesion_id, asistencias in asistencias_de_sesiones(sesion_ids).items():
+            por_sesion[sesion_id].extend({'studentId': str(e), 'status': status} for e, status in asistencias)
+    return por_sesion
+
+
+def _sesiones(filas):
+    """ filas: (id, fecha, nombre, grupo_id). Devuelve dicts en el formato de SesionClaseSerializer. """
+    asistencias = _asistencias_por_sesion([f[0] for f in filas])
+    return [
+        {
+            'id': str(pk),
+            'fecha': _fecha.to_representation(fecha),
+            'nombre': nombre,
+            'asistencias': asistencias.get(pk, []),
+            'grupo': str(grupo_id),
+        }
+        for pk, fecha, nombre, grupo_id in filas
+    ]
+
+
+def sesiones(docente):
+    filas = list(
+        SesionClase.objects.filter(docente=docente).exclude(grupo_id__in=Grupo.eliminados())
+        .values_list('id', 'fecha', 'nombre', 'grupo_id')
+    )
+    return _sesiones(filas)
+
+
+def materias(docente):
+    materias = list(Materia.objects.filter(docente=docente).values_list('id', 'nombre', 'codigo'))
+    grupos = list(
+        Grupo.objects.filter(materia_id__in=[m[0] for m in materias]).values_list('id', 'nombre', 'materia_id')
+    ) if materias else []
+    grupo_ids = [g[0] for g in grupos]
+
+    estudiantes = defaultdict(list)
+    sesiones_por_grupo = defaultdict(list)
+    if grupo_ids:
+        inscripciones = InscripcionEstudianteGrupo.objects.filter(grupo_id__in=grupo_ids).values_list(
+            'grupo_id', 'estudiante_id', 'estudiante__nombre_completo', 'estudiante__matricula',
+        )
+        for grupo_id, estudiante_id, nombre, matricula in inscripciones:
+            estudiantes[grupo_id].append({'id': str(estudiante_id), 'nombre': nombre, 'studentId': matricula})
+        filas = list(SesionClase.objects.filter(grupo_id__in=grupo_ids).values_list('id', 'fecha', 'nombre', 'grupo_id'))
+        for sesion in _sesiones(filas):
+            sesiones_por_grupo[sesion['grupo']].append(sesion)
+
+    grupos_por_materia = defaultdict(list)
+    for pk, nombre, materia_id in grupos:
+        grupos_por_materia[materia_id].append({
+            'id': str(pk),
+            'nombre': nombre,
+            'materia': str(materia_id),
+            'estudiantes': estudiantes.get(pk, []),
+            'sesiones': sesiones_por_grupo.get(str(pk), []),
+        })
+    return [
+        {'id': str(pk), 'nombre': nombre, 'codigo': codigo, 'grupos': grupos_por_materia.get(pk, [])}
+        for pk, nombre, codigo in materias
+    ]
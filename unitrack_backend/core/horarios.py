@@ -0,0 +1,49 @@
+from django.utils import timezone
+from .models import Grupo, HorarioClase
+from .sync import cursor_actual
+from . import cache, fastpath
+
+# Clases de hoy del docente (GET /api/dashboard/today_classes/).
+# Sale de un solo query sobre el índice (docente, dia_semana, hora_inicio) de HorarioClase y
+# la respuesta renderizada se guarda por docente junto con la fecha y la versión de datos
+# del docente (cursor de CambioSync, como en core.cache). La entrada sirve hasta que cambia
+# el día o hasta cualquier escritura del docente, en todos los procesos aunque la caché sea
+# local a cada uno.
+
+
+def clave(docente_id):
+    return f'hoy:{docente_id}'
+
+
+def _hora(valor):
+    return f"{valor.hour % 12 or 12}:{valor.minute:02d} {'AM' if valor.hour < 12 else 'PM'}"
+
+
+def clases_de_hoy(docente, fecha):
+    """ Lista de TodayClass (types.ts) del docente para `fecha`, por hora de inicio. """
+    filas = (
+        HorarioClase.objects.filter(docente=docente, dia_semana=fecha.weekday()).exclude(grupo_id__in=Grupo.eliminados())
+        .order_by('hora_inicio', 'hora_fin')
+        .values_list('grupo__materia_id', 'grupo_id', 'grupo__materia__nombre', 'grupo__nombre', 'hora_inicio', 'hora_fin')
+    )
+    return [
+        {
+            'subjectId': str(materia_id), 'groupId': str(grupo_id),
+            'subjectName': materia, 'groupName': grupo, 'time': f'{_hora(inicio)} - {_hora(fin)}',
+        }
+        for materia_id, grupo_id, materia, grupo, inicio, fin in filas
+    ]
+
+
+def respuesta(docente):
+    fecha = timezone.localdate()
+    version = cursor_actual(docente)
+    entrada = cache.backend().get(clave(docente.pk))
+    if entrada is not None and entrada[:2] == (fecha, version):
+        contenido, estado = entrada[2], 'HIT'
+    else:
+        contenido, estado = fastpath.renderizar(clases_de_hoy(docente, fecha)), 'MISS'
+        cache.backend().set(clave(docente.pk), (fecha, version, contenido))
+    response = fastpath.respuesta_renderizada(contenido)
+    response['X-Cache'] = estado
+    return response
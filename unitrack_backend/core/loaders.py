@@ -0,0 +1,72 @@
+from django.db.models import Prefetch
+from .models import Materia, Grupo, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada
+from .expansion import Expansion
+
+# Cargadores del árbol docente -> materias -> grupos -> (estudiantes, sesiones -> asistencias).
+# Cada nivel se resuelve con un único query (prefetch), por lo que el número total de
+# consultas es constante sin importar cuántos grupos, estudiantes o sesiones haya.
+# Con una Expansion (?fields= / ?expand=) solo se precargan las relaciones pedidas.
+
+
+def _ruta(prefix, nombre):
+    return f'{prefix}.{nombre}' if prefix else nombre
+
+
+def inscripciones_prefetch(prefix=''):
+    # Las inscripciones traen al estudiante con un JOIN para evitar un query por inscripción
+    return Prefetch(
+        f'{prefix}inscripciones',
+        queryset=InscripcionEstudianteGrupo.objects.select_related('estudiante'),
+    )
+
+
+def sesiones_prefetch(prefix='', expansion=None, ruta='sesiones'):
+    queryset = SesionClase.objects.all()
+    if (expansion or Expansion()).incluye(_ruta(ruta, 'asistencias')):
+        queryset = queryset.prefetch_related(asistencias_prefetch(), empaquetada_prefetch())
+    return Prefetch(f'{prefix}sesiones', queryset=queryset)
+
+
+def asistencias_prefetch(prefix=''):
+    # El serializador solo necesita estudiante_id y status
+    return Prefetch(
+        f'{prefix}asistencias_detalle',
+        queryset=AsistenciaEstudiante.objects.only('id', 'sesion_clase_id', 'estudiante_id', 'status'),
+    )
+
+
+def empaquetada_prefetch(prefix=''):
+    # Pases de lista empaquetados (core.packing); la lista del grupo se carga con ellos en un query más
+    return Prefetch(f'{prefix}empaquetada', queryset=AsistenciaEmpaquetada.objects.all())
+
+
+def materias_tree_queryset(docente, expansion=None):
+    """ Materias del docente con todo el árbol anidado precargado (6 queries en total). """
+    expansion = expansion or Expansion()
+    queryset = Materia.objects.filter(docente=docente)
+    if expansion.incluye('grupos'):
+        queryset = queryset.prefetch_related(
+            Prefetch('grupos', queryset=grupos_tree_queryset(expansion=expansion, ruta='grupos')),
+        )
+    return queryset
+
+
+def grupos_tree_queryset(docente=None, expansion=None, ruta=''):
+    """ Grupos con estudiantes, sesiones y asistencias precargados (5 queries en total). """
+    expansion = expansion or Expansion()
+    queryset = Grupo.objects.all()
+    if expansion.incluye(_ruta(ruta, 'estudiantes')):
+        queryset = queryset.prefetch_related(inscripciones_prefetch())
+    if expansion.incluye(_ruta(ruta, 'sesiones')):
+        queryset = queryset.prefetch_related(sesiones_prefetch(expansion=expansion, ruta=_ruta(ruta, 'sesiones')))
+    if docente is not None:
+        queryset = queryset.filter(docente=docente)
+    return queryset
+
+
+def sesiones_tree_queryset(docente, expansion=None):
+    """ Sesiones del docente con sus asistencias precargadas (3 queries en total). """
+    queryset = SesionClase.objects.filter(docente=docente).exclude(grupo_id__in=Grupo.eliminados())
+    if (expansion or Expansion()).incluye('asistencias'):
+        queryset = queryset.prefetch_related(asistencias_prefetch(), empaquetada_prefetch())
+    return queryset
@@ -0,0 +1,33 @@
+from datetime import datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import SesionClase, SesionArchivada
+from core.archivo import archivar, restaurar
+
+
+class Command(BaseCommand):
+    help = 'Mueve las sesiones de periodos cerrados (anteriores a --hasta) al archivo, o las devuelve con --revertir.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', required=True, help='Fecha de corte AAAA-MM-DD: se archivan las sesiones anteriores a ese día.')
+        parser.add_argument('--docente', action='append', dest='docentes', type=int, help='Limitar a un docente por id (se puede repetir).')
+        parser.add_argument('--grupo', action='append', dest='grupos', help='Limitar a un grupo (se puede repetir).')
+        parser.add_argument('--revertir', action='store_true', help='Devolver las sesiones archivadas anteriores a la fecha a las tablas activas.')
+
+    def handle(self, *args, **options):
+        try:
+            dia = datetime.strptime(options['hasta'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('--hasta debe tener el formato AAAA-MM-DD.')
+        corte = timezone.make_aware(datetime.combine(dia, time.min))
+        sesiones = (SesionArchivada if options['revertir'] else SesionClase).objects.filter(fecha__lt=corte)
+        if options['docentes']:
+            sesiones = sesiones.filter(docente_id__in=options['docentes'])
+        if options['grupos']:
+            sesiones = sesiones.filter(grupo_id__in=options['grupos'])
+        if options['revertir']:
+            total = restaurar(sesiones)
+            self.stdout.write(self.style.SUCCESS(f'{total} sesiones restauradas.'))
+        else:
+            total = archivar(sesiones)
+            self.stdout.write(self.style.SUCCESS(f'{total} sesiones archivadas.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core.riesgo import actualizar
+from core.tasks import encolar, calcular_riesgo
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los estudiantes en riesgo (tasa de ausencias, rachas y tendencia) de todos los docentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docente', action='append', dest='docentes', type=int, help='Limitar a un docente por id (se puede repetir).')
+        parser.add_argument('--en-segundo-plano', action='store_true', help='Encolar el cálculo para el worker de tareas.')
+
+    def handle(self, *args, **options):
+        if options['en_segundo_plano']:
+            tarea = encolar(calcular_riesgo, docentes=options['docentes'])
+            self.stdout.write(self.style.SUCCESS(f'Cálculo encolado como tarea {tarea.pk}.'))
+            return
+        total = actualizar(options['docentes'])
+        self.stdout.write(self.style.SUCCESS(f'{total} estudiantes en riesgo.'))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from core.tasks import ejecutar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de tareas en segundo plano: ejecuta las pendientes y espera nuevas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Vaciar la cola y terminar.')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre revisiones de la cola vacía.')
+        parser.add_argument('--limite', type=int, help='Terminar tras ejecutar este número de tareas.')
+
+    def handle(self, *args, **options):
+        restantes = options['limite']
+        try:
+            while restantes is None or restantes > 0:
+                exitosas, fallidas = ejecutar_pendientes(restantes)
+                if exitosas or fallidas:
+                    self.stdout.write(f'{exitosas} tareas completadas, {fallidas} con error.')
+                if restantes is not None:
+                    restantes -= exitosas + fallidas
+                if options['una_vez']:
+                    break
+                if not (exitosas or fallidas):
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
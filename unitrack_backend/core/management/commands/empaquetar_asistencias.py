@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.models import SesionClase
+from core.packing import empaquetar, desempaquetar
+
+
+class Command(BaseCommand):
+    help = 'Convierte el pase de lista de sesiones existentes a almacenamiento empaquetado (o de vuelta a filas).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grupo', action='append', dest='grupos', help='Limitar a un grupo (se puede repetir).')
+        parser.add_argument('--revertir', action='store_true', help='Volver a una fila de AsistenciaEstudiante por estudiante.')
+
+    def handle(self, *args, **options):
+        sesiones = SesionClase.objects.all()
+        if options['grupos']:
+            sesiones = sesiones.filter(grupo_id__in=options['grupos'])
+        if options['revertir']:
+            convertidas = desempaquetar(sesiones)
+            self.stdout.write(self.style.SUCCESS(f'{convertidas} sesiones desempaquetadas.'))
+        else:
+            convertidas = empaquetar(sesiones)
+            self.stdout.write(self.style.SUCCESS(f'{convertidas} sesiones empaquetadas.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from core.synthetic import generar_datos, PASSWORD_SINTETICO
+
+
+class Command(BaseCommand):
+    help = 'Genera docentes, materias, grupos, estudiantes, sesiones y asistencias sintéticos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docentes', type=int, default=1)
+        parser.add_argument('--materias', type=int, default=3, help='Materias por docente.')
+        parser.add_argument('--grupos', type=int, default=2, help='Grupos por materia.')
+        parser.add_argument('--estudiantes', type=int, default=30, help='Estudiantes por grupo.')
+        parser.add_argument('--sesiones', type=int, default=20, help='Sesiones por grupo.')
+        parser.add_argument('--semilla', type=int, help='Semilla para generar el mismo contenido.')
+        parser.add_argument('--prefijo', default='sintetico', help='Prefijo de usuario y correo de los docentes.')
+
+    def handle(self, *args, **options):
+        docentes, filas = generar_datos(
+            docentes=options['docentes'], materias=options['materias'], grupos=options['grupos'],
+            estudiantes=options['estudiantes'], sesiones=options['sesiones'],
+            semilla=options['semilla'], prefijo=options['prefijo'],
+        )
+        for modelo, total in filas.items():
+            self.stdout.write(f'{modelo}: {total}')
+        for docente in docentes:
+            self.stdout.write(f'  {docente.email}')
+        self.stdout.write(self.style.SUCCESS(f'Datos generados. Contraseña de los docentes: {PASSWORD_SINTETICO}'))
@@ -0,0 +1,74 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmark import ESCALAS, ejecutar, comparar, guardar
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia (p50/p90/p99), queries y tamaño de respuesta de cada ruta de la API con datos sintéticos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', action='append', dest='escalas', choices=sorted(ESCALAS),
+                            help='Escala a medir (se puede repetir). Por defecto: pequena.')
+        parser.add_argument('--tamano', help='Escala personalizada: docentes,materias,grupos,estudiantes,sesiones.')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2, help='Llamadas previas que no se miden.')
+        parser.add_argument('--sin-cache', action='store_true', help='Vaciar la caché de árboles antes de cada llamada.')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--almacenamiento', action='store_true',
+                            help='Comparar también tamaño y velocidad del pase de lista en filas contra empaquetado.')
+        parser.add_argument('--salida', help='Archivo JSON donde guardar el reporte.')
+        parser.add_argument('--comparar', help='Reporte JSON anterior contra el cual buscar regresiones.')
+        parser.add_argument('--umbral', type=float, default=1.2, help='Factor de p50 a partir del cual hay regresión.')
+
+    def handle(self, *args, **options):
+        escalas = [(nombre, ESCALAS[nombre]) for nombre in options['escalas'] or []]
+        if options['tamano']:
+            try:
+                valores = [int(v) for v in options['tamano'].split(',')]
+            except ValueError:
+                valores = []
+            if len(valores) != 5:
+                raise CommandError('--tamano espera cinco enteros: docentes,materias,grupos,estudiantes,sesiones.')
+            escalas.append(('personalizada', dict(zip(('docentes', 'materias', 'grupos', 'estudiantes', 'sesiones'), valores))))
+        if not escalas:
+            escalas = [('pequena', ESCALAS['pequena'])]
+
+        reporte = ejecutar(
+            escalas, repeticiones=options['repeticiones'], calentamiento=options['calentamiento'],
+            sin_cache=options['sin_cache'], semilla=options['semilla'], almacenamiento=options['almacenamiento'],
+        )
+        for escala in reporte['escalas']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{escala['nombre']} {escala['filas']}"))
+            for r in escala['rutas']:
+                self.stdout.write(
+                    f"  {r['metodo']:<5} {r['ruta']:<24} p50 {r['p50_ms']:>9.2f} ms  p90 {r['p90_ms']:>9.2f} ms  "
+                    f"p99 {r['p99_ms']:>9.2f} ms  {r['queries']:>3} queries  {r['bytes']:>9} B  {r['status']}"
+                )
+            if escala['rutas_sin_medir']:
+                self.stdout.write(self.style.WARNING(f"  Rutas sin escenario: {', '.join(escala['rutas_sin_medir'])}"))
+
+        for medida in reporte.get('almacenamiento', []):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Almacenamiento {medida['nombre']} ({medida['asistencias']} asistencias)"))
+            for modo in ('filas', 'empaquetado'):
+                m = medida[modo]
+                self.stdout.write(
+                    f"  {modo:<12} {m['bytes']:>12} B  lectura {m['lectura_ms']:>9.2f} ms  escritura {m['escritura_ms']:>9.2f} ms"
+                )
+            if medida['proporcion_bytes'] is not None:
+                self.stdout.write(f"  empaquetado / filas: {medida['proporcion_bytes']:.2%}")
+
+        if options['salida']:
+            guardar(reporte, options['salida'])
+            self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['salida']}"))
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+            regresiones = comparar(anterior, reporte, options['umbral'])
+            for r in regresiones:
+                self.stdout.write(self.style.WARNING(
+                    f"  Regresión {r['escala']} {r['metodo']} {r['ruta']}: p50 {r['p50_ms'][0]} -> {r['p50_ms'][1]} ms, "
+                    f"queries {r['queries_max'][0]} -> {r['queries_max'][1]}"
+                ))
+            if regresiones:
+                raise CommandError(f'{len(regresiones)} regresiones respecto a {options["comparar"]}.')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core.purga import purgar, LOTE_PURGA
+
+
+class Command(BaseCommand):
+    help = 'Borra por lotes las materias y grupos eliminados desde la API junto con todo lo que cuelga de ellos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_PURGA, help='Filas por DELETE.')
+
+    def handle(self, *args, **options):
+        def progreso(modelo, filas):
+            self.stdout.write(f'{modelo.__name__}: {filas} filas borradas')
+        borradas, _ = purgar(tamano_lote=options['lote'], progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(f'{sum(borradas.values())} filas borradas en total.'))
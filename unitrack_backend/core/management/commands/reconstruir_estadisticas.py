@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from core.stats import reconstruir_estadisticas
+from core.tasks import encolar, reconstruir_estadisticas_grupos
+
+
+class Command(BaseCommand):
+    help = 'Verifica y repara las estadísticas de asistencia recalculándolas desde AsistenciaEstudiante.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grupo', action='append', dest='grupos', help='Limitar a un grupo (se puede repetir).')
+        parser.add_argument('--verificar', action='store_true', help='Solo reportar diferencias, sin reparar.')
+        parser.add_argument('--en-segundo-plano', action='store_true', help='Encolar la reparación para el worker de tareas.')
+
+    def handle(self, *args, **options):
+        if options['en_segundo_plano'] and not options['verificar']:
+            tarea = encolar(reconstruir_estadisticas_grupos, grupos=options['grupos'])
+            self.stdout.write(self.style.SUCCESS(f'Reconstrucción encolada como tarea {tarea.pk}.'))
+            return
+        diferencias = reconstruir_estadisticas(options['grupos'], verificar=options['verificar'])
+        total = 0
+        for modelo, pks in diferencias.items():
+            total += len(pks)
+            self.stdout.write(f'{modelo}: {len(pks)} con diferencias')
+        if options['verificar']:
+            mensaje = 'Sin diferencias.' if not total else f'{total} contadores desviados.'
+            self.stdout.write(self.style.SUCCESS(mensaje) if not total else self.style.WARNING(mensaje))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{total} contadores reparados.'))
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from . import cache
+
+# Métricas por ruta en formato de texto de Prometheus (GET /metrics).
+# El middleware mide cada request: latencia (histograma), queries SQL y su tiempo, bytes de la
+# respuesta y resultado de la caché de árboles (cabecera X-Cache). Las etiquetas son el nombre
+# de la ruta de Django ('materia-list', 'grupo-summary', ...) y el método, así que la
+# cardinalidad es fija. Los valores viven en memoria del proceso: con varios workers cada uno
+# expone los suyos. El costo por request es un par de lecturas de reloj y un lock.
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIN_RUTA = 'sin_ruta'
+
+
+class Registro:
+    def __init__(self, buckets=BUCKETS_LATENCIA):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.requests = defaultdict(int)       # (ruta, metodo, status)
+            self.histograma = {}                   # (ruta, metodo) -> [conteos por bucket..., suma, total]
+            self.sql_queries = defaultdict(int)    # (ruta, metodo)
+            self.sql_segundos = defaultdict(float)
+            self.bytes = defaultdict(int)
+            self.cache = defaultdict(int)          # (ruta, metodo, resultado)
+
+    def observar(self, ruta, metodo, status, segundos, queries, sql_segundos, tamano, resultado_cache):
+        clave = (ruta, metodo)
+        with self._lock:
+            self.requests[(ruta, metodo, status)] += 1
+            fila = self.histograma.get(clave)
+            if fila is None:
+                fila = self.histograma[clave] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    fila[i] += 1
+                    break
+            fila[-2] += segundos
+            fila[-1] += 1
+            self.sql_queries[clave] += queries
+            self.sql_segundos[clave] += sql_segundos
+            self.bytes[clave] += tamano
+            if resultado_cache:
+                self.cache[(ruta, metodo, resultado_cache.lower())] += 1
+
+    def exportar(self):
+        """ Texto en el formato de exposición 0.0.4 de Prometheus. """
+        with self._lock:
+            lineas = []
+            _metrica(lineas, 'unitrack_http_requests_total', 'counter', 'Requests atendidos.',
+                     [((('ruta', r), ('metodo', m), ('status', s)), v) for (r, m, s), v in sorted(self.requests.items())])
+
+            lineas.append('# HELP unitrack_http_request_duration_seconds Latencia de cada request.')
+            lineas.append('# TYPE unitrack_http_request_duration_seconds histogram')
+            for (ruta, metodo), fila in sorted(self.histograma.items()):
+                etiquetas = (('ruta', ruta), ('metodo', metodo))
+                acumulado = 0
+                for limite, conteo in zip(self.buckets, fila):
+                    acumulado += conteo
+                    lineas.append(_linea('unitrack_http_request_duration_seconds_bucket', etiquetas + (('le', _numero(limite)),), acumulado))
+                lineas.append(_linea('unitrack_http_request_duration_seconds_bucket', etiquetas + (('le', '+Inf'),), fila[-1]))
+                lineas.append(_linea('unitrack_http_request_duration_seconds_sum', etiquetas, fila[-2]))
+                lineas.append(_linea('unitrack_http_request_duration_seconds_count', etiquetas, fila[-1]))
+
+            for nombre, ayuda, datos in (
+                ('unitrack_http_sql_queries_total', 'Queries SQL ejecutados.', self.sql_queries),
+                ('unitrack_http_sql_duration_seconds_total', 'Tiempo total en queries SQL.', self.sql_segundos),
+                ('unitrack_http_response_bytes_total', 'Bytes enviados en el cuerpo de la respuesta.', self.bytes),
+            ):
+                _metrica(lineas, nombre, 'counter', ayuda,
+                         [((('ruta', r), ('metodo', m)), v) for (r, m), v in sorted(datos.items())])
+            _metrica(lineas, 'unitrack_http_cache_total', 'counter', 'Resultado de la caché de árboles por ruta.',
+                     [((('ruta', r), ('metodo', m), ('resultado', c)), v) for (r, m, c), v in sorted(self.cache.items())])
+
+        estadisticas = cache.estadisticas()
+        _metrica(lineas, 'unitrack_cache_arbol_eventos_total', 'counter', 'Eventos de la caché de árboles del proceso.',
+                 [((('evento', evento),), estadisticas[evento]) for evento in ('hits', 'misses', 'guardados', 'omitidos')])
+        _metrica(lineas, 'unitrack_cache_arbol_hit_ratio', 'gauge', 'Proporción de aciertos de la caché de árboles.',
+                 [((), estadisticas['hitRate'])])
+        return '\n'.join(lineas) + '\n'
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _linea(nombre, etiquetas, valor):
+    if etiquetas:
+        nombre += '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in etiquetas) + '}'
+    return f'{nombre} {_numero(valor)}'
+
+
+def _metrica(lineas, nombre, tipo, ayuda, muestras):
+    lineas.append(f'# HELP {nombre} {ayuda}')
+    lineas.append(f'# TYPE {nombre} {tipo}')
+    lineas.extend(_linea(nombre, etiquetas, valor) for etiquetas, valor in muestras)
+
+
+registro = Registro()
+
+
+class _Medicion:
+    """ Acumula queries y tiempo SQL de un request mediante execute_wrapper. """
+    __slots__ = ('queries', 'segundos')
+
+    def __init__(self):
+        self.queries = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.queries += 1
+
+    def instalar(self):
+        pila = ExitStack()
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(self))
+        return pila
+
+
+class MetricasMiddleware:
+    """ Registra las métricas de cada request en `registro`. Se desactiva con METRICAS_ACTIVAS=False. """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_ACTIVAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion = _Medicion()
+        inicio = time.perf_counter()
+        with medicion.instalar():
+            response = self.get_response(request)
+        if response.streaming:
+            # Las exportaciones consultan la base de datos mientras se envían: se mide hasta el último byte
+            response.streaming_content = self._medir_stream(request, response, response.streaming_content, medicion, inicio)
+        else:
+            self._observar(request, response, medicion, time.perf_counter() - inicio, len(response.content))
+        return response
+
+    def _medir_stream(self, request, response, contenido, medicion, inicio):
+        tamano = 0
+        try:
+            with medicion.instalar():
+                for trozo in contenido:
+                    tamano += len(trozo)
+                    yield trozo
+        finally:
+            self._observar(request, response, medicion, time.perf_counter() - inicio, tamano)
+
+    def _observar(self, request, response, medicion, segundos, tamano):
+        coincidencia = getattr(request, 'resolver_match', None)
+        ruta = (coincidencia.view_name or coincidencia.route) if coincidencia else SIN_RUTA
+        registro.observar(
+            ruta, request.method, response.status_code, segundos,
+            medicion.queries, medicion.segundos, tamano, response.get('X-Cache'),
+        )
+
+
+def vista_metricas(request):
+    # Solo desde las IPs configuradas (por defecto, la propia máquina)
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICAS_IPS_PERMITIDAS', ('127.0.0.1', '::1')):
+        raise Http404
+    return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
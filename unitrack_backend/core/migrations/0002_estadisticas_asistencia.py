@@ -0,0 +1,59 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_estadisticas(apps, schema_editor):
+    from core.stats import reconstruir_estadisticas
+    reconstruir_estadisticas(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaGrupo',
+            fields=[
+                ('presentes', models.IntegerField(default=0)),
+                ('ausentes', models.IntegerField(default=0)),
+                ('justificados', models.IntegerField(default=0)),
+                ('tardes', models.IntegerField(default=0)),
+                ('grupo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadistica', serialize=False, to='core.grupo')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadisticaInscripcion',
+            fields=[
+                ('presentes', models.IntegerField(default=0)),
+                ('ausentes', models.IntegerField(default=0)),
+                ('justificados', models.IntegerField(default=0)),
+                ('tardes', models.IntegerField(default=0)),
+                ('inscripcion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadistica', serialize=False, to='core.inscripcionestudiantegrupo')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadisticaSesion',
+            fields=[
+                ('presentes', models.IntegerField(default=0)),
+                ('ausentes', models.IntegerField(default=0)),
+                ('justificados', models.IntegerField(default=0)),
+                ('tardes', models.IntegerField(default=0)),
+                ('sesion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadistica', serialize=False, to='core.sesionclase')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_estadisticas_asistencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioSync',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('modelo', models.CharField(max_length=20)),
+                ('objeto_id', models.UUIDField()),
+                ('operacion', models.CharField(choices=[('creado', 'Creado'), ('actualizado', 'Actualizado'), ('eliminado', 'Eliminado')], max_length=12)),
+                ('docente', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['docente', 'id'], name='core_cambio_docente_19b991_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:45
+
+import re
+from collections import defaultdict
+
+from django.db import migrations, models
+
+NOMBRE_AUTOMATICO = re.compile(r'^Sesión (\d+)$')
+
+
+def inicializar_contadores(apps, schema_editor):
+    # Continúa la numeración anterior (COUNT de sesiones del grupo + 1). Si ya se borraron
+    # sesiones, el COUNT quedó por debajo de algún "Sesión N" existente: se toma el mayor
+    Grupo = apps.get_model('core', 'Grupo')
+    SesionClase = apps.get_model('core', 'SesionClase')
+    contadores = defaultdict(int)
+    maximos = defaultdict(int)
+    for grupo_id, nombre in SesionClase.objects.values_list('grupo_id', 'nombre').iterator(chunk_size=2000):
+        contadores[grupo_id] += 1
+        coincidencia = NOMBRE_AUTOMATICO.match(nombre or '')
+        if coincidencia:
+            maximos[grupo_id] = max(maximos[grupo_id], int(coincidencia.group(1)))
+    por_valor = defaultdict(list)
+    for grupo_id, total in contadores.items():
+        por_valor[max(total, maximos[grupo_id])].append(grupo_id)
+    for valor, grupo_ids in por_valor.items():
+        for i in range(0, len(grupo_ids), 500):
+            Grupo.objects.filter(pk__in=grupo_ids[i:i + 500]).update(sesiones_creadas=valor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_registro_cambios_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='sesiones_creadas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(inicializar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_docente(apps, schema_editor):
+    # En orden: materia -> grupo -> sesión -> asistencia
+    Materia = apps.get_model('core', 'Materia')
+    Grupo = apps.get_model('core', 'Grupo')
+    SesionClase = apps.get_model('core', 'SesionClase')
+    AsistenciaEstudiante = apps.get_model('core', 'AsistenciaEstudiante')
+    Grupo.objects.update(docente_id=Subquery(
+        Materia.objects.filter(pk=OuterRef('materia_id')).values('docente_id')[:1]
+    ))
+    SesionClase.objects.update(docente_id=Subquery(
+        Grupo.objects.filter(pk=OuterRef('grupo_id')).values('docente_id')[:1]
+    ))
+    AsistenciaEstudiante.objects.update(docente_id=Subquery(
+        SesionClase.objects.filter(pk=OuterRef('sesion_clase_id')).values('docente_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+    # Las columnas se crean nulas y se rellenan aquí; 0006 las vuelve obligatorias e indexa
+
+    dependencies = [
+        ('core', '0004_contador_sesiones_grupo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='docente',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='sesionclase',
+            name='docente',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='asistenciaestudiante',
+            name='docente',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copiar_docente, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_docente_denormalizado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='grupo',
+            name='docente',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='sesionclase',
+            name='docente',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='asistenciaestudiante',
+            name='docente',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='grupo',
+            index=models.Index(fields=['docente', 'materia'], name='core_grupo_docente_5cdf20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sesionclase',
+            index=models.Index(fields=['docente', 'grupo'], name='core_sesion_docente_2b8bcb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistenciaestudiante',
+            index=models.Index(fields=['docente', 'estudiante'], name='core_asiste_docente_425035_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def numerar_inscripciones(apps, schema_editor):
+    # Posiciones 0..n-1 dentro de cada grupo; el contador del grupo continúa desde n
+    Grupo = apps.get_model('core', 'Grupo')
+    Inscripcion = apps.get_model('core', 'InscripcionEstudianteGrupo')
+    pendientes = []
+    grupo_actual, siguiente = None, 0
+    for inscripcion in Inscripcion.objects.order_by('grupo_id', 'id').only('id', 'grupo_id').iterator():
+        if inscripcion.grupo_id != grupo_actual:
+            grupo_actual, siguiente = inscripcion.grupo_id, 0
+        inscripcion.indice = siguiente
+        siguiente += 1
+        pendientes.append(inscripcion)
+        if len(pendientes) >= 1000:
+            Inscripcion.objects.bulk_update(pendientes, ['indice'])
+            pendientes = []
+    Inscripcion.objects.bulk_update(pendientes, ['indice'])
+    total = (
+        Inscripcion.objects.filter(grupo=OuterRef('pk'))
+        .order_by().values('grupo').annotate(n=Count('id')).values('n')
+    )
+    Grupo.objects.update(inscripciones_creadas=Coalesce(Subquery(total), Value(0)))
+
+
+class Migration(migrations.Migration):
+    # El índice se crea nulo y se numera aquí; 0008 lo vuelve obligatorio y único por grupo
+
+    dependencies = [
+        ('core', '0006_docente_obligatorio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='inscripciones_creadas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='inscripcionestudiantegrupo',
+            name='indice',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(numerar_inscripciones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_indice_inscripcion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inscripcionestudiantegrupo',
+            name='indice',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='inscripcionestudiantegrupo',
+            constraint=models.UniqueConstraint(fields=('grupo', 'indice'), name='inscripcion_indice_unico'),
+        ),
+        migrations.CreateModel(
+            name='AsistenciaEmpaquetada',
+            fields=[
+                ('sesion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='empaquetada', serialize=False, to='core.sesionclase')),
+                ('estados', models.BinaryField()),
+                ('total', models.PositiveIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # auth_user.email no tiene índice en django.contrib.auth y es el USER_ID_FIELD de SIMPLE_JWT:
+    # login, reset de contraseña y los fallos de la caché de usuarios buscan por él
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0008_asistencia_empaquetada'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS core_auth_user_email_idx ON auth_user (email);',
+            'DROP INDEX IF EXISTS core_auth_user_email_idx;',
+        ),
+    ]
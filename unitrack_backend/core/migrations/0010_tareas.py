@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indice_email_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('fallida', 'Fallida')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('max_intentos', models.PositiveIntegerField(default=5)),
+                ('ejecutar_despues', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bloqueada_hasta', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'ejecutar_despues'], name='core_tarea_estado_f7f6c6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:02
+
+from django.db import migrations
+
+# SQL propio de cada backend (FTS5 en SQLite, pg_trgm en PostgreSQL), fijo tal como era al
+# crear esta migración; core.busqueda mantiene la versión vigente.
+# (tabla, columna clave con búsqueda por prefijo, columnas de texto)
+INDICES = [
+    ('core_estudiante', 'matricula', ('nombre_completo', 'matricula')),
+    ('core_materia', 'codigo', ('nombre', 'codigo')),
+]
+
+
+def _sql_sqlite(tabla, campos):
+    fts = f'{tabla}_fts'
+    columnas = ', '.join(campos)
+    nuevos = ', '.join(f'new.{c}' for c in campos)
+    viejos = ', '.join(f'old.{c}' for c in campos)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columnas}, content='{tabla}', content_rowid='rowid', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.rowid, {nuevos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.rowid, {viejos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.rowid, {viejos}); "
+        f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.rowid, {nuevos}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _sql_postgresql(tabla, clave, campos):
+    trigramas = ', '.join(f'{c} gin_trgm_ops' for c in campos)
+    return [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f'CREATE INDEX IF NOT EXISTS {tabla}_busqueda_trgm ON {tabla} USING gin ({trigramas})',
+        f'CREATE INDEX IF NOT EXISTS {tabla}_busqueda_prefijo ON {tabla} ({clave} varchar_pattern_ops)',
+    ]
+
+
+def instalar(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, clave, campos in INDICES:
+        if vendor == 'sqlite':
+            sentencias = _sql_sqlite(tabla, campos)
+        elif vendor == 'postgresql':
+            sentencias = _sql_postgresql(tabla, clave, campos)
+        else:
+            continue
+        for sql in sentencias:
+            schema_editor.execute(sql, params=None)
+
+
+def desinstalar(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, _, _ in INDICES:
+        if vendor == 'sqlite':
+            fts = f'{tabla}_fts'
+            for sufijo in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{sufijo}', params=None)
+            schema_editor.execute(f'DROP TABLE IF EXISTS {fts}', params=None)
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_trgm', params=None)
+            schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_prefijo', params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_horario_clases'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_indices_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiesgoEstudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sesiones', models.PositiveIntegerField()),
+                ('ausencias', models.PositiveIntegerField()),
+                ('tasa_ausencias', models.FloatField()),
+                ('racha_actual', models.PositiveIntegerField()),
+                ('racha_maxima', models.PositiveIntegerField()),
+                ('tendencia', models.FloatField()),
+                ('calculado', models.DateTimeField()),
+                ('docente', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.estudiante')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('docente', 'estudiante'), name='riesgo_docente_estudiante_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_riesgo_estudiantes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionArchivada',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('nombre', models.CharField(max_length=100)),
+                ('estudiantes', models.BinaryField()),
+                ('estados', models.BinaryField()),
+                ('total', models.PositiveIntegerField()),
+                ('archivada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('docente', models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones_archivadas', to='core.grupo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['docente', 'grupo', 'fecha'], name='core_sesion_docente_7b2be2_idx')],
+            },
+        ),
+    ]
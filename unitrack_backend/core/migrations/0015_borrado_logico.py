@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_sesiones_archivadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='eliminacion',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materia',
+            name='eliminacion',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='grupo',
+            index=models.Index(condition=models.Q(('eliminacion__isnull', False)), fields=['eliminacion'], name='grupo_eliminacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materia',
+            index=models.Index(condition=models.Q(('eliminacion__isnull', False)), fields=['eliminacion'], name='materia_eliminacion_idx'),
+        ),
+    ]
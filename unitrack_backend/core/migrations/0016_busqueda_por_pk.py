@@ -0,0 +1,84 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:15
+
+from django.db import migrations
+
+# SQLite: el índice FTS5 de 0012 usaba contenido externo ligado por el rowid implícito de la
+# tabla, que cambia con VACUUM o al recrearla. Se reemplaza por un índice sin contenido con
+# rowid propio, ligado a la pk (ver core.busqueda). PostgreSQL no cambia.
+# (tabla, columnas de texto)
+INDICES = [
+    ('core_estudiante', ('nombre_completo', 'matricula')),
+    ('core_materia', ('nombre', 'codigo')),
+]
+
+
+def _borrar(schema_editor, fts):
+    for sufijo in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{sufijo}', params=None)
+    schema_editor.execute(f'DROP TABLE IF EXISTS {fts}', params=None)
+    schema_editor.execute(f'DROP TABLE IF EXISTS {fts}_filas', params=None)
+
+
+def por_pk(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabla, campos in INDICES:
+        fts = f'{tabla}_fts'
+        filas = f'{fts}_filas'
+        columnas = ', '.join(campos)
+        nuevos = ', '.join(f'new.{c}' for c in campos)
+        viejos = ', '.join(f'old.{c}' for c in campos)
+        alta = (
+            f"INSERT INTO {filas}(id) VALUES (new.id); "
+            f"INSERT INTO {fts}(rowid, {columnas}) SELECT fila, {nuevos} FROM {filas} WHERE id = new.id;"
+        )
+        baja = (
+            f"INSERT INTO {fts}({fts}, rowid, {columnas}) SELECT 'delete', fila, {viejos} FROM {filas} WHERE id = old.id; "
+            f"DELETE FROM {filas} WHERE id = old.id;"
+        )
+        _borrar(schema_editor, fts)
+        for sql in [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columnas}, content='', tokenize='trigram')",
+            f"CREATE TABLE {filas} (fila INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)",
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN {alta} END",
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN {baja} END",
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {tabla} BEGIN {baja} {alta} END",
+            f"INSERT INTO {filas}(id) SELECT id FROM {tabla}",
+            f"INSERT INTO {fts}(rowid, {columnas}) SELECT f.fila, {', '.join(f't.{c}' for c in campos)} "
+            f"FROM {tabla} t JOIN {filas} f ON f.id = t.id",
+        ]:
+            schema_editor.execute(sql, params=None)
+
+
+def por_rowid(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabla, campos in INDICES:
+        fts = f'{tabla}_fts'
+        columnas = ', '.join(campos)
+        nuevos = ', '.join(f'new.{c}' for c in campos)
+        viejos = ', '.join(f'old.{c}' for c in campos)
+        _borrar(schema_editor, fts)
+        for sql in [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columnas}, content='{tabla}', content_rowid='rowid', tokenize='trigram')",
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+            f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.rowid, {nuevos}); END",
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.rowid, {viejos}); END",
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {tabla} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.rowid, {viejos}); "
+            f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.rowid, {nuevos}); END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]:
+            schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_borrado_logico'),
+    ]
+
+    operations = [
+        migrations.RunPython(por_pk, por_rowid),
+    ]
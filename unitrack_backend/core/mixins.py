@@ -0,0 +1,93 @@
+import hashlib
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .sync import cursor_actual
+from . import cache
+
+
+def version_docente(request):
+    """ Versión de datos del docente autenticado, consultada una sola vez por request. """
+    if not hasattr(request, '_version_docente'):
+        request._version_docente = cursor_actual(request.user)
+    return request._version_docente
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag / If-None-Match) para endpoints acotados al docente.
+
+    La versión de datos del docente es el último cursor de su registro de cambios
+    (CambioSync), que avanza con cualquier escritura sobre sus objetos. El ETag se
+    calcula con un solo query indexado y, si coincide, se responde 304 sin ejecutar
+    el queryset ni el serializador.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def get_etag(self, request):
+        version = version_docente(request)
+        base = f'{request.user.pk}:{version}:{request.accepted_renderer.format}:{request.get_full_path()}'
+        return '"%s"' % hashlib.sha256(base.encode()).hexdigest()[:32]
+
+    def dispatch_conditional(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Se envuelve el handler después de autenticar y negociar el formato;
+        # dispatch() lo busca por el nombre del método HTTP justo después de initial()
+        metodo = request.method.lower()
+        if metodo in ('get', 'head') and self.action in self.conditional_actions:
+            handler = getattr(self, metodo)
+            setattr(self, metodo, lambda req, *a, **kw: self.dispatch_conditional(handler, req, *a, **kw))
+
+
+class CachedResponseMixin:
+    """
+    Guarda la respuesta JSON ya renderizada por docente, versión y URL.
+    Debe ir después de ConditionalGetMixin en las bases para que el 304 se resuelva primero.
+    """
+    cached_actions = ('list',)
+
+    def dispatch_cached(self, handler, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        version = version_docente(request)
+        variante = hashlib.sha256(request.get_full_path().encode()).hexdigest()[:32]
+        contenido = cache.obtener(request.user.pk, variante, version)
+        if contenido is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            if isinstance(response, Response):
+                contenido = renderer.render(response.data, request.accepted_media_type, {'request': request, 'view': self})
+            else:
+                # Respuesta ya renderizada (p. ej. core.fastpath)
+                contenido = response.content
+            cache.guardar(request.user.pk, variante, version, contenido)
+            estado = 'MISS'
+        else:
+            estado = 'HIT'
+        response = HttpResponse(contenido, content_type=request.accepted_media_type)
+        response['X-Cache'] = estado
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metodo = request.method.lower()
+        if metodo in ('get', 'head') and self.action in self.cached_actions:
+            handler = getattr(self, metodo)
+            setattr(self, metodo, lambda req, *a, **kw: self.dispatch_cached(handler, req, *a, **kw))
@@ -2,26 +2,163 @@ from django.db import models
 
 # Create your models here.
 
-from django.db import models
+from django.db import models, connections, router, transaction
 from django.contrib.auth.models import User # o un AbstractUser personalizado
+from django.utils import timezone
 import uuid # Para IDs únicos si no se usan los auto-incrementales por defecto
 
+class VigentesManager(models.Manager):
+    """ Excluye los objetos eliminados que esperan la purga en segundo plano (core.purga). """
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminacion__isnull=True)
+
+
+def _pks_dependientes(*querysets):
+    """ {modelo: pks} de los querysets, leídos antes de mover las filas a otro docente. """
+    return {queryset.model: list(queryset.values_list('pk', flat=True)) for queryset in querysets}
+
+
 class Materia(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='materias')
     nombre = models.CharField(max_length=255)
     codigo = models.CharField(max_length=50)
+    # Borrado lógico desde la API; core.purga borra después la materia y todo lo que cuelga de ella
+    eliminacion = models.DateTimeField(null=True, blank=True, editable=False)
     # created_at, updated_at (opcional, con auto_now_add y auto_now)
 
+    objects = VigentesManager()
+    todos = models.Manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['eliminacion'], condition=models.Q(eliminacion__isnull=False), name='materia_eliminacion_idx')]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._docente_original = instance.__dict__.get('docente_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        original = getattr(self, '_docente_original', self.docente_id)
+        if original != self.docente_id:
+            # La materia cambió de docente: se mueve todo lo que cuelga de ella
+            from .sync import registrar_traspaso
+            dependientes = _pks_dependientes(
+                Grupo.objects.filter(materia=self),
+                SesionClase.objects.filter(grupo__materia=self),
+                AsistenciaEstudiante.objects.filter(sesion_clase__grupo__materia=self),
+                HorarioClase.objects.filter(grupo__materia=self),
+                InscripcionEstudianteGrupo.objects.filter(grupo__materia=self),
+            )
+            Grupo.objects.filter(materia=self).update(docente_id=self.docente_id)
+            SesionClase.objects.filter(grupo__materia=self).update(docente_id=self.docente_id)
+            AsistenciaEstudiante.objects.filter(sesion_clase__grupo__materia=self).update(docente_id=self.docente_id)
+            HorarioClase.objects.filter(grupo__materia=self).update(docente_id=self.docente_id)
+            SesionArchivada.objects.filter(grupo__materia=self).update(docente_id=self.docente_id)
+            if original is not None:
+                registrar_traspaso(self, original, dependientes)
+        self._docente_original = self.docente_id
+
     def __str__(self):
         return f"{self.nombre} ({self.codigo})"
 
 class Grupo(models.Model):
+    # Solo los cambia _incrementar; un save() con la instancia desactualizada no debe pisarlos
+    CONTADORES = ('sesiones_creadas', 'inscripciones_creadas')
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     materia = models.ForeignKey(Materia, on_delete=models.CASCADE, related_name='grupos')
     nombre = models.CharField(max_length=100)
+    sesiones_creadas = models.PositiveIntegerField(default=0, editable=False) # Contador para numerar "Sesión N"
+    inscripciones_creadas = models.PositiveIntegerField(default=0, editable=False) # Siguiente índice de la lista
+    # Copia de materia.docente para acotar por docente sin JOINs; se mantiene en save()
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
+    # Borrado lógico del grupo o de su materia (ver Materia.eliminacion)
+    eliminacion = models.DateTimeField(null=True, blank=True, editable=False)
     # created_at, updated_at
 
+    objects = VigentesManager()
+    todos = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['docente', 'materia']),
+            models.Index(fields=['eliminacion'], condition=models.Q(eliminacion__isnull=False), name='grupo_eliminacion_idx'),
+        ]
+
+    @staticmethod
+    def eliminados():
+        """ Subquery con los ids de grupos eliminados pendientes de purga (casi siempre vacía). """
+        return Grupo.todos.filter(eliminacion__isnull=False).values('id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._docente_original = instance.__dict__.get('docente_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.docente_id = self.materia.docente_id
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.CONTADORES
+            ]
+        super().save(*args, **kwargs)
+        original = getattr(self, '_docente_original', self.docente_id)
+        if original != self.docente_id:
+            # El grupo se movió a una materia de otro docente
+            from .sync import registrar_traspaso
+            dependientes = _pks_dependientes(
+                SesionClase.objects.filter(grupo=self),
+                AsistenciaEstudiante.objects.filter(sesion_clase__grupo=self),
+                HorarioClase.objects.filter(grupo=self),
+                InscripcionEstudianteGrupo.objects.filter(grupo=self),
+            )
+            SesionClase.objects.filter(grupo=self).update(docente_id=self.docente_id)
+            AsistenciaEstudiante.objects.filter(sesion_clase__grupo=self).update(docente_id=self.docente_id)
+            HorarioClase.objects.filter(grupo=self).update(docente_id=self.docente_id)
+            SesionArchivada.objects.filter(grupo=self).update(docente_id=self.docente_id)
+            if original is not None:
+                registrar_traspaso(self, original, dependientes)
+        self._docente_original = self.docente_id
+
+    @classmethod
+    def _incrementar(cls, grupo_id, campo, cantidad=1):
+        """
+        Suma `cantidad` al contador `campo` del grupo con un UPDATE atómico sobre su fila y
+        devuelve el nuevo valor. Dos reservas simultáneas nunca obtienen el mismo número.
+        """
+        alias = router.db_for_write(cls)
+        connection = connections[alias]
+        tabla = connection.ops.quote_name(cls._meta.db_table)
+        columna = connection.ops.quote_name(campo)
+        pk = cls._meta.pk.get_db_prep_value(grupo_id, connection)
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {tabla} SET {columna} = {columna} + %s WHERE id = %s RETURNING {columna}', [cantidad, pk],
+                )
+                fila = cursor.fetchone()
+            return fila[0] if fila else None
+        # Sin RETURNING: el UPDATE bloquea la fila hasta el fin de la transacción
+        with transaction.atomic(using=alias):
+            grupos = cls.objects.using(alias).filter(pk=grupo_id)
+            if not grupos.update(**{campo: models.F(campo) + cantidad}):
+                return None
+            return grupos.values_list(campo, flat=True).get()
+
+    @classmethod
+    def siguiente_numero_sesion(cls, grupo_id):
+        """ Reserva el siguiente número de sesión del grupo, sin contar sesiones. """
+        return cls._incrementar(grupo_id, 'sesiones_creadas')
+
+    @classmethod
+    def reservar_indices(cls, grupo_id, cantidad):
+        """ Reserva `cantidad` posiciones consecutivas en la lista del grupo; devuelve la primera. """
+        return cls._incrementar(grupo_id, 'inscripciones_creadas', cantidad) - cantidad
+
     def __str__(self):
         return f"{self.nombre} - {self.materia.nombre}"
 
@@ -39,36 +176,134 @@ class Estudiante(models.Model):
     def __str__(self):
         return f"{self.nombre_completo} ({self.matricula})"
 
+class InscripcionQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no llama a save(): los índices se reservan aquí, un UPDATE por grupo
+        objs = list(objs)
+        por_grupo = {}
+        for o in objs:
+            if o.indice is None:
+                por_grupo.setdefault(o.grupo_id, []).append(o)
+        for grupo_id, pendientes in por_grupo.items():
+            inicio = Grupo.reservar_indices(grupo_id, len(pendientes))
+            for n, o in enumerate(pendientes):
+                o.indice = inicio + n
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class InscripcionEstudianteGrupo(models.Model):
     """ Modelo intermedio para la relación ManyToMany entre Estudiante y Grupo """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE)
     grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='inscripciones')
+    # Posición estable del estudiante en la lista del grupo (nunca se reutiliza); la usa core.packing
+    indice = models.PositiveIntegerField(editable=False)
     # fecha_inscripcion = models.DateField(auto_now_add=True)
 
+    objects = InscripcionQuerySet.as_manager()
+
     class Meta:
         unique_together = ('estudiante', 'grupo') # Un estudiante solo puede estar una vez en el mismo grupo
+        constraints = [models.UniqueConstraint(fields=['grupo', 'indice'], name='inscripcion_indice_unico')]
+
+    def save(self, *args, **kwargs):
+        if self.indice is None:
+            self.indice = Grupo.reservar_indices(self.grupo_id, 1)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.estudiante.nombre_completo} en {self.grupo.nombre}"
 
 
+class HorarioClase(models.Model):
+    """ Bloque semanal de clase de un grupo (p. ej. lunes de 10:00 a 11:30). """
+    class DiaSemana(models.IntegerChoices):
+        # Mismo número que date.weekday()
+        LUNES = 0, 'Lunes'
+        MARTES = 1, 'Martes'
+        MIERCOLES = 2, 'Miércoles'
+        JUEVES = 3, 'Jueves'
+        VIERNES = 4, 'Viernes'
+        SABADO = 5, 'Sábado'
+        DOMINGO = 6, 'Domingo'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='horarios')
+    dia_semana = models.PositiveSmallIntegerField(choices=DiaSemana.choices)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    # Copia de grupo.docente; se mantiene en save()
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
+
+    class Meta:
+        # Las clases de un docente en un día, ya ordenadas por hora
+        indexes = [models.Index(fields=['docente', 'dia_semana', 'hora_inicio'])]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(hora_fin__gt=models.F('hora_inicio')), name='horario_fin_despues_de_inicio'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.docente_id = self.grupo.docente_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.grupo} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+
 class SesionClase(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='sesiones')
     fecha = models.DateTimeField() # O DateField si la hora no es crucial para la sesión en sí
     nombre = models.CharField(max_length=100, blank=True) # Ej: "Sesión 1", autogenerado si es blank
+    # Copia de grupo.docente; se mantiene en save()
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
     # created_at, updated_at
 
+    class Meta:
+        indexes = [models.Index(fields=['docente', 'grupo'])]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._docente_original = instance.__dict__.get('docente_id')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.nombre:
-            count = SesionClase.objects.filter(grupo=self.grupo).count()
-            self.nombre = f"Sesión {count + 1}"
+            numero = Grupo.siguiente_numero_sesion(self.grupo_id)
+            self.nombre = f"Sesión {numero}"
+        self.docente_id = self.grupo.docente_id
         super().save(*args, **kwargs)
+        original = getattr(self, '_docente_original', self.docente_id)
+        if original != self.docente_id:
+            AsistenciaEstudiante.objects.filter(sesion_clase=self).update(docente_id=self.docente_id)
+        self._docente_original = self.docente_id
+
+    @property
+    def registro_asistencias(self):
+        """ Filas de AsistenciaEstudiante más el pase de lista empaquetado, si la sesión lo tiene. """
+        asistencias = list(self.asistencias_detalle.all())
+        try:
+            asistencias += self.empaquetada.asistencias()
+        except AsistenciaEmpaquetada.DoesNotExist:
+            pass
+        return asistencias
 
     def __str__(self):
         return f"{self.nombre} - {self.grupo.nombre} ({self.fecha.strftime('%Y-%m-%d')})"
 
+class AsistenciaQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no llama a save(): el docente se copia aquí de la sesión, con un query como máximo
+        objs = list(objs)
+        en_cache = self.model.sesion_clase.is_cached
+        faltantes = {o.sesion_clase_id for o in objs if o.docente_id is None and not en_cache(o)}
+        docentes = dict(SesionClase.objects.filter(pk__in=faltantes).values_list('id', 'docente_id')) if faltantes else {}
+        for o in objs:
+            if o.docente_id is None:
+                o.docente_id = o.sesion_clase.docente_id if en_cache(o) else docentes.get(o.sesion_clase_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class AsistenciaEstudiante(models.Model):
     class AttendanceStatus(models.TextChoices):
         PRESENTE = 'Presente', 'Presente'
@@ -80,10 +315,252 @@ class AsistenciaEstudiante(models.Model):
     sesion_clase = models.ForeignKey(SesionClase, on_delete=models.CASCADE, related_name='asistencias_detalle')
     estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE) # Referencia al Estudiante global
     status = models.CharField(max_length=20, choices=AttendanceStatus.choices)
+    # Copia de sesion_clase.docente; se mantiene en save() y en bulk_create()
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
     # created_at, updated_at
 
+    objects = AsistenciaQuerySet.as_manager()
+
     class Meta:
         unique_together = ('sesion_clase', 'estudiante') # Un estudiante solo tiene un estado de asistencia por sesión
+        indexes = [models.Index(fields=['docente', 'estudiante'])]
+
+    def save(self, *args, **kwargs):
+        original = getattr(self, '_original', None)
+        if self.docente_id is None or (original and original[0] != self.sesion_clase_id):
+            self.docente_id = self.sesion_clase.docente_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores cargados, para poder descontar el estado anterior de las estadísticas al modificar la fila
+        instance._original = (
+            instance.__dict__.get('sesion_clase_id'),
+            instance.__dict__.get('estudiante_id'),
+            instance.__dict__.get('status'),
+        )
+        return instance
+
+    def __str__(self):
+        return f"{self.estudiante.nombre_completo} - {self.sesion_clase.nombre}: {self.status}"
+
+
+class EmpaquetadaQuerySet(models.QuerySet):
+    """ Junto con cada pase de lista carga la lista de su grupo (índice -> estudiante) en un query. """
+
+    def _fetch_all(self):
+        super()._fetch_all()
+        sin_lista = [
+            o for o in self._result_cache
+            if isinstance(o, AsistenciaEmpaquetada) and o._lista is None and getattr(o, 'grupo_sesion', None)
+        ]
+        if sin_lista:
+            listas = AsistenciaEmpaquetada.listas_de_grupos({o.grupo_sesion for o in sin_lista})
+            for o in sin_lista:
+                o._lista = listas.get(o.grupo_sesion, {})
+
+
+class EmpaquetadaManager(models.Manager.from_queryset(EmpaquetadaQuerySet)):
+    def get_queryset(self):
+        # El grupo de la sesión viene en el mismo query, sin cargar la sesión
+        return super().get_queryset().annotate(grupo_sesion=models.F('sesion__grupo_id'))
+
+
+class AsistenciaEmpaquetada(models.Model):
+    """
+    Pase de lista completo de una sesión guardado como arreglo de 3 bits por estudiante,
+    ordenado por InscripcionEstudianteGrupo.indice. Alternativa compacta a una fila de
+    AsistenciaEstudiante por estudiante (ver core.packing).
+    """
+    sesion = models.OneToOneField(SesionClase, on_delete=models.CASCADE, primary_key=True, related_name='empaquetada')
+    estados = models.BinaryField()
+    total = models.PositiveIntegerField() # Posiciones codificadas
+
+    objects = EmpaquetadaManager()
+
+    _lista = None
+
+    @staticmethod
+    def listas_de_grupos(grupo_ids):
+        """ {grupo_id: {indice: estudiante_id}} en un solo query. """
+        listas = {}
+        filas = InscripcionEstudianteGrupo.objects.filter(grupo_id__in=list(grupo_ids)).values_list('grupo_id', 'indice', 'estudiante_id')
+        for grupo_id, indice, estudiante_id in filas:
+            listas.setdefault(grupo_id, {})[indice] = estudiante_id
+        return listas
+
+    def lista(self):
+        if self._lista is None:
+            grupo_id = getattr(self, 'grupo_sesion', None) or self.sesion.grupo_id
+            self._lista = self.listas_de_grupos([grupo_id]).get(grupo_id, {})
+        return self._lista
+
+    def estados_por_estudiante(self):
+        """ [(estudiante_id, status)] en orden de la lista; omite posiciones sin estado o sin inscripción. """
+        from .packing import decodificar
+        lista = self.lista()
+        return [
+            (lista[indice], status)
+            for indice, status in enumerate(decodificar(self.estados, self.total))
+            if status is not None and indice in lista
+        ]
+
+    @staticmethod
+    def id_asistencia(sesion_id, estudiante_id):
+        """
+        Id estable de la asistencia de un estudiante en un pase empaquetado, que no tiene fila
+        propia. Es el que usa /api/sync/ y el de la fila que crea core.packing.desempaquetar.
+        """
+        return uuid.uuid5(uuid.UUID(str(sesion_id)), str(uuid.UUID(str(estudiante_id))))
+
+    def asistencias(self):
+        """ Filas equivalentes (sin guardar) para los serializadores de AsistenciaEstudiante. """
+        return [
+            AsistenciaEstudiante(
+                id=self.id_asistencia(self.sesion_id, estudiante_id),
+                sesion_clase_id=self.sesion_id, estudiante_id=estudiante_id, status=status,
+            )
+            for estudiante_id, status in self.estados_por_estudiante()
+        ]
+
+
+class SesionArchivada(models.Model):
+    """
+    Sesión de un periodo cerrado movida fuera de SesionClase por core.archivo
+    (`manage.py archivar_sesiones`), con su pase de lista completo en una sola fila:
+    los ids de los estudiantes concatenados (16 bytes cada uno) y sus estados en el mismo
+    orden, 3 bits por estudiante (ver core.packing). Es de solo lectura.
+    """
+    id = models.UUIDField(primary_key=True, editable=False) # El de la sesión original
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='sesiones_archivadas')
+    fecha = models.DateTimeField()
+    nombre = models.CharField(max_length=100)
+    # Copia de grupo.docente; se mantiene con los cambios de docente de la materia o del grupo
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
+    estudiantes = models.BinaryField()
+    estados = models.BinaryField()
+    total = models.PositiveIntegerField() # Estudiantes con estado registrado
+    archivada = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['docente', 'grupo', 'fecha'])]
+
+    def estados_por_estudiante(self):
+        """ [(estudiante_id, status)] en el orden guardado. """
+        from .packing import decodificar
+        datos = bytes(self.estudiantes)
+        return [
+            (uuid.UUID(bytes=datos[i * 16:(i + 1) * 16]), status)
+            for i, status in enumerate(decodificar(self.estados, self.total))
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} - archivada ({self.fecha.strftime('%Y-%m-%d')})"
+
+
+class ContadoresAsistencia(models.Model):
+    """ Contadores por cada AttendanceStatus, mantenidos incrementalmente por core.stats """
+    presentes = models.IntegerField(default=0)
+    ausentes = models.IntegerField(default=0)
+    justificados = models.IntegerField(default=0)
+    tardes = models.IntegerField(default=0)
+
+    CAMPOS_POR_STATUS = {
+        AsistenciaEstudiante.AttendanceStatus.PRESENTE.value: 'presentes',
+        AsistenciaEstudiante.AttendanceStatus.AUSENTE.value: 'ausentes',
+        AsistenciaEstudiante.AttendanceStatus.JUSTIFICADO.value: 'justificados',
+        AsistenciaEstudiante.AttendanceStatus.TARDE.value: 'tardes',
+    }
+
+    class Meta:
+        abstract = True
+
+    def contadores(self):
+        return {status: getattr(self, campo) for status, campo in self.CAMPOS_POR_STATUS.items()}
+
+
+class EstadisticaSesion(ContadoresAsistencia):
+    sesion = models.OneToOneField(SesionClase, on_delete=models.CASCADE, primary_key=True, related_name='estadistica')
+
+
+class EstadisticaInscripcion(ContadoresAsistencia):
+    inscripcion = models.OneToOneField(InscripcionEstudianteGrupo, on_delete=models.CASCADE, primary_key=True, related_name='estadistica')
+
+
+class EstadisticaGrupo(ContadoresAsistencia):
+    grupo = models.OneToOneField(Grupo, on_delete=models.CASCADE, primary_key=True, related_name='estadistica')
+
+class RiesgoEstudiante(models.Model):
+    """
+    Estudiante en riesgo según el último cálculo de core.riesgo (`manage.py calcular_riesgo`),
+    con sus asistencias en todos los grupos del docente. Solo se guardan los que cumplen algún criterio.
+    """
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False) # Cubierto por la restricción única
+    estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE, related_name='+')
+    sesiones = models.PositiveIntegerField() # Sesiones con estado registrado
+    ausencias = models.PositiveIntegerField()
+    tasa_ausencias = models.FloatField()
+    racha_actual = models.PositiveIntegerField() # Ausencias consecutivas hasta la última sesión
+    racha_maxima = models.PositiveIntegerField()
+    # Tasa de ausencias de las sesiones recientes menos la de las anteriores (positiva: empeora)
+    tendencia = models.FloatField()
+    calculado = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['docente', 'estudiante'], name='riesgo_docente_estudiante_unico')]
+
+    def __str__(self):
+        return f"{self.estudiante_id}: {self.ausencias}/{self.sesiones} (racha {self.racha_actual})"
+
+
+class CambioSync(models.Model):
+    """
+    Registro de cambios por docente para la sincronización incremental (/api/sync/).
+    El id autoincremental funciona como cursor monótono.
+    """
+    class Operacion(models.TextChoices):
+        CREADO = 'creado', 'Creado'
+        ACTUALIZADO = 'actualizado', 'Actualizado'
+        ELIMINADO = 'eliminado', 'Eliminado'
+
+    id = models.BigAutoField(primary_key=True)
+    docente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False) # Cubierto por el índice (docente, id)
+    modelo = models.CharField(max_length=20)
+    objeto_id = models.UUIDField()
+    operacion = models.CharField(max_length=12, choices=Operacion.choices)
+
+    class Meta:
+        indexes = [models.Index(fields=['docente', 'id'])]
+
+    def __str__(self):
+        return f"{self.id}: {self.modelo} {self.objeto_id} {self.operacion}"
+
+
+class Tarea(models.Model):
+    """
+    Trabajo en segundo plano (core.tasks). Se ejecuta con `manage.py ejecutar_tareas`;
+    las completadas se borran y las que agotan sus intentos quedan como fallidas.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Pendiente'
+        EN_CURSO = 'en_curso', 'En curso'
+        FALLIDA = 'fallida', 'Fallida'
+
+    id = models.BigAutoField(primary_key=True)
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    ejecutar_despues = models.DateTimeField(default=timezone.now)
+    # Mientras un worker la ejecuta; si el worker muere, otro la retoma al vencer
+    bloqueada_hasta = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['estado', 'ejecutar_despues'])]
 
     def __str__(self):
-        return f"{self.estudiante.nombre_completo} - {self.sesion_clase.nombre}: {self.status}"
\ No newline at end of file
+        return f"{self.id}: {self.nombre} ({self.estado}, {self.intentos}/{self.max_intentos})"
@@ -0,0 +1,179 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from .models import InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada, CambioSync
+from . import sync
+
+# Almacenamiento empaquetado del pase de lista (settings.ASISTENCIA_EMPAQUETADA).
+# En lugar de una fila de AsistenciaEstudiante por estudiante, la sesión guarda un solo
+# AsistenciaEmpaquetada con 3 bits por estudiante, en el orden estable de la lista del grupo
+# (InscripcionEstudianteGrupo.indice). Ocho estudiantes caben en tres bytes.
+# Los endpoints devuelven la misma forma en ambos modos; el comando `empaquetar_asistencias`
+# convierte sesiones existentes en uno u otro sentido. /api/sync/ entrega el pase empaquetado
+# como asistencias con id estable (ver sync.PASE_DE_LISTA).
+
+BITS_POR_ESTADO = 3
+ESTADOS = [
+    None,  # sin registro
+    AsistenciaEstudiante.AttendanceStatus.PRESENTE.value,
+    AsistenciaEstudiante.AttendanceStatus.AUSENTE.value,
+    AsistenciaEstudiante.AttendanceStatus.JUSTIFICADO.value,
+    AsistenciaEstudiante.AttendanceStatus.TARDE.value,
+]
+CODIGOS = {status: codigo for codigo, status in enumerate(ESTADOS)}
+_MASCARA = (1 << BITS_POR_ESTADO) - 1
+
+
+def activo():
+    return getattr(settings, 'ASISTENCIA_EMPAQUETADA', False)
+
+
+def codificar(estados):
+    """ Lista de status (o None) por índice de la lista -> bytes, 3 bits por posición. """
+    salida = bytearray()
+    for inicio in range(0, len(estados), 8):
+        bloque = 0
+        for desplazamiento, status in enumerate(estados[inicio:inicio + 8]):
+            bloque |= CODIGOS[status] << (desplazamiento * BITS_POR_ESTADO)
+        salida += bloque.to_bytes(BITS_POR_ESTADO, 'little')
+    return bytes(salida)
+
+
+def decodificar(datos, total):
+    """ Inverso de codificar: lista de `total` status (o None). """
+    datos = bytes(datos)
+    estados = []
+    for inicio in range(0, len(datos), BITS_POR_ESTADO):
+        bloque = int.from_bytes(datos[inicio:inicio + BITS_POR_ESTADO], 'little')
+        for desplazamiento in range(8):
+            estados.append(ESTADOS[(bloque >> (desplazamiento * BITS_POR_ESTADO)) & _MASCARA])
+    return estados[:total]
+
+
+def estado_en(datos, total, indice):
+    """ Status de una sola posición, sin decodificar el arreglo completo. """
+    if indice >= total:
+        return None
+    inicio = (indice // 8) * BITS_POR_ESTADO
+    bloque = int.from_bytes(datos[inicio:inicio + BITS_POR_ESTADO], 'little')
+    return ESTADOS[(bloque >> ((indice % 8) * BITS_POR_ESTADO)) & _MASCARA]
+
+
+def _empaquetar(estados, indices):
+    """ estados: {estudiante_id: status}; indices: {estudiante_id: indice}. """
+    total = max((indices[e] for e in estados), default=-1) + 1
+    lista = [None] * total
+    for estudiante_id, status in estados.items():
+        lista[indices[estudiante_id]] = status
+    return codificar(lista), total
+
+
+def indices_de_grupo(grupo_id):
+    return dict(
+        InscripcionEstudianteGrupo.objects.filter(grupo_id=grupo_id).values_list('estudiante_id', 'indice')
+    )
+
+
+def guardar(sesion, estados):
+    """ Guarda el pase de lista {estudiante_id: status} (ya validado) de una sesión nueva. """
+    datos, total = _empaquetar(estados, indices_de_grupo(sesion.grupo_id))
+    return AsistenciaEmpaquetada.objects.create(sesion=sesion, estados=datos, total=total)
+
+
+def reemplazar(sesion, estados, indices=None):
+    """ Sustituye el pase de lista empaquetado de la sesión (o lo crea) en un solo query. """
+    datos, total = _empaquetar(estados, indices if indices is not None else indices_de_grupo(sesion.grupo_id))
+    if not AsistenciaEmpaquetada.objects.filter(sesion=sesion).update(estados=datos, total=total):
+        AsistenciaEmpaquetada.objects.create(sesion=sesion, estados=datos, total=total)
+
+
+def asistencias_de_sesiones(sesion_ids):
+    """ {sesion_id: [(estudiante_id, status)]} de las sesiones empaquetadas, en dos queries. """
+    if not sesion_ids:
+        return {}
+    return {
+        e.sesion_id: e.estados_por_estudiante()
+        for e in AsistenciaEmpaquetada.objects.filter(sesion_id__in=list(sesion_ids))
+    }
+
+
+def cambios_empaquetados(sesiones, signo, estudiante_id=None):
+    """
+    Cambios (sesion_id, estudiante_id, status, signo) para core.stats a partir de las sesiones
+    empaquetadas de `sesiones` (queryset), opcionalmente solo de un estudiante.
+    Devuelve también {sesion_id: grupo_id}.
+    """
+    cambios = []
+    grupos = {}
+    for e in AsistenciaEmpaquetada.objects.filter(sesion__in=sesiones):
+        grupos[e.sesion_id] = e.grupo_sesion
+        for alumno, status in e.estados_por_estudiante():
+            if estudiante_id is None or alumno == estudiante_id:
+                cambios.append((e.sesion_id, alumno, status, signo))
+    return cambios, grupos
+
+
+def empaquetar(sesiones):
+    """
+    Convierte las filas de AsistenciaEstudiante de `sesiones` en pases de lista empaquetados.
+    Las estadísticas no cambian, así que las filas se borran sin señales. Devuelve cuántas sesiones se convirtieron.
+    """
+    convertidas = 0
+    with transaction.atomic():
+        pendientes = sesiones.filter(empaquetada__isnull=True, asistencias_detalle__isnull=False).distinct()
+        por_grupo = defaultdict(list)
+        docentes = {}
+        for sesion_id, grupo_id, docente_id in pendientes.values_list('id', 'grupo_id', 'docente_id'):
+            por_grupo[grupo_id].append(sesion_id)
+            docentes[sesion_id] = docente_id
+        for grupo_id, sesion_ids in por_grupo.items():
+            indices = indices_de_grupo(grupo_id)
+            estados = defaultdict(dict)
+            borradas = defaultdict(list)
+            filas = AsistenciaEstudiante.objects.filter(sesion_clase_id__in=sesion_ids).values_list(
+                'id', 'sesion_clase_id', 'estudiante_id', 'status',
+            )
+            for pk, sesion_id, estudiante_id, status in filas:
+                # Asistencias de estudiantes ya dados de baja del grupo no tienen posición: se conservan como filas
+                if estudiante_id in indices:
+                    estados[sesion_id][estudiante_id] = status
+                    borradas[docentes[sesion_id]].append(pk)
+            nuevas = []
+            for sesion_id in sesion_ids:
+                datos, total = _empaquetar(estados[sesion_id], indices)
+                nuevas.append(AsistenciaEmpaquetada(sesion_id=sesion_id, estados=datos, total=total))
+            AsistenciaEmpaquetada.objects.bulk_create(nuevas)
+            AsistenciaEstudiante.objects.filter(
+                sesion_clase_id__in=sesion_ids, estudiante_id__in=list(indices),
+            )._raw_delete(AsistenciaEstudiante.objects.db)
+            # Los clientes cambian las filas borradas por el pase de lista con ids estables
+            for docente_id, pks in borradas.items():
+                sync.registrar(AsistenciaEstudiante, pks, CambioSync.Operacion.ELIMINADO, [docente_id])
+                sync.registrar_pase(
+                    [s for s in sesion_ids if docentes[s] == docente_id], CambioSync.Operacion.CREADO, [docente_id],
+                )
+            convertidas += len(sesion_ids)
+    return convertidas
+
+
+def desempaquetar(sesiones):
+    """
+    Inverso de empaquetar: vuelve a una fila de AsistenciaEstudiante por estudiante, con el
+    mismo id que /api/sync/ ya entregó para la asistencia empaquetada.
+    """
+    convertidas = 0
+    with transaction.atomic():
+        empaquetadas = list(AsistenciaEmpaquetada.objects.filter(sesion__in=sesiones))
+        docentes = dict(SesionClase.objects.filter(pk__in=[e.sesion_id for e in empaquetadas]).values_list('id', 'docente_id'))
+        por_docente = defaultdict(list)
+        for e in empaquetadas:
+            filas = e.asistencias()
+            for fila in filas:
+                fila.docente_id = docentes[e.sesion_id]
+            AsistenciaEstudiante.objects.bulk_create(filas, batch_size=500)
+            por_docente[docentes[e.sesion_id]].append(e.sesion_id)
+            convertidas += 1
+        AsistenciaEmpaquetada.objects.filter(sesion_id__in=[e.sesion_id for e in empaquetadas]).delete()
+        for docente_id, sesion_ids in por_docente.items():
+            sync.registrar_pase(sesion_ids, CambioSync.Operacion.ACTUALIZADO, [docente_id])
+    return convertidas
@@ -0,0 +1,97 @@
+import logging
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import (
+    Materia, Grupo, InscripcionEstudianteGrupo, HorarioClase, SesionClase, SesionArchivada, AsistenciaEstudiante,
+    AsistenciaEmpaquetada, EstadisticaSesion, EstadisticaInscripcion, EstadisticaGrupo, CambioSync, Tarea,
+)
+from . import sync
+
+# Borrado de materias y grupos desde la API (DELETE /api/materias/{id}/, /api/grupos/{id}/).
+# El borrado en cascada de Django carga en memoria cada objeto dependiente antes de borrarlo;
+# en una materia con años de historial eso son millones de asistencias. En su lugar:
+#   1. eliminar() marca la materia o el grupo (y los grupos de la materia) con `eliminacion`.
+#      Son dos UPDATE; VigentesManager los oculta de inmediato y las lecturas por docente de
+#      sesiones, horarios e inscripciones excluyen Grupo.eliminados(). Los clientes reciben el
+#      borrado por /api/sync/ como con un DELETE normal.
+#   2. La tarea `purgar_eliminados` (o `manage.py purgar_eliminados`) borra después las filas
+#      dependientes con DELETE por lotes de LOTE_PURGA filas, de las hojas a la raíz, sin
+#      señales y sin cargar objetos. Las estadísticas de lo borrado desaparecen con sus filas.
+
+logger = logging.getLogger(__name__)
+
+LOTE_PURGA = 1000
+# Lotes por ejecución de la tarea; si queda trabajo se vuelve a encolar
+LOTES_POR_TAREA = 50
+
+
+def eliminar(objeto):
+    """ Borrado lógico de una Materia o un Grupo; encola la purga en la misma transacción. """
+    from .tasks import encolar, purgar_eliminados
+    ahora = timezone.now()
+    with transaction.atomic():
+        if isinstance(objeto, Materia):
+            Materia.todos.filter(pk=objeto.pk).update(eliminacion=ahora)
+            Grupo.todos.filter(materia=objeto, eliminacion__isnull=True).update(eliminacion=ahora)
+        else:
+            Grupo.todos.filter(pk=objeto.pk).update(eliminacion=ahora)
+        sync.registrar_instancia(objeto, CambioSync.Operacion.ELIMINADO)
+        # Una purga pendiente ya incluirá este borrado
+        if not Tarea.objects.filter(nombre=purgar_eliminados.nombre_tarea, estado=Tarea.Estado.PENDIENTE).exists():
+            encolar(purgar_eliminados)
+
+
+def _dependientes(grupo_ids):
+    """ (modelo, queryset) de todo lo que cuelga de los grupos, de las hojas a la raíz. """
+    return [
+        (AsistenciaEstudiante, AsistenciaEstudiante.objects.filter(sesion_clase__grupo_id__in=grupo_ids)),
+        (AsistenciaEmpaquetada, AsistenciaEmpaquetada._base_manager.filter(sesion__grupo_id__in=grupo_ids)),
+        (EstadisticaSesion, EstadisticaSesion.objects.filter(sesion__grupo_id__in=grupo_ids)),
+        (SesionClase, SesionClase.objects.filter(grupo_id__in=grupo_ids)),
+        (SesionArchivada, SesionArchivada.objects.filter(grupo_id__in=grupo_ids)),
+        (EstadisticaInscripcion, EstadisticaInscripcion.objects.filter(inscripcion__grupo_id__in=grupo_ids)),
+        (InscripcionEstudianteGrupo, InscripcionEstudianteGrupo.objects.filter(grupo_id__in=grupo_ids)),
+        (HorarioClase, HorarioClase.objects.filter(grupo_id__in=grupo_ids)),
+        (EstadisticaGrupo, EstadisticaGrupo.objects.filter(grupo_id__in=grupo_ids)),
+        (Grupo, Grupo.todos.filter(pk__in=grupo_ids)),
+    ]
+
+
+def _borrar_lote(modelo, queryset, tamano):
+    """ Borra hasta `tamano` filas de `queryset` con un DELETE por pk. Devuelve cuántas borró. """
+    with transaction.atomic():
+        pks = list(queryset.values_list('pk', flat=True)[:tamano])
+        if pks:
+            modelo._base_manager.filter(pk__in=pks)._raw_delete(modelo._base_manager.db)
+    return len(pks)
+
+
+def purgar(max_lotes=None, tamano_lote=LOTE_PURGA, progreso=None):
+    """
+    Borra las materias y grupos eliminados con todo lo que cuelga de ellos, como mucho
+    `max_lotes` DELETE. `progreso(modelo, filas)` se llama tras cada lote.
+    Devuelve ({nombre_modelo: filas borradas}, True si no quedó nada pendiente).
+    """
+    borradas = {}
+    lotes = 0
+    grupo_ids = list(Grupo.eliminados().values_list('id', flat=True))
+    materias = Materia.todos.filter(eliminacion__isnull=False)
+    pendientes = _dependientes(grupo_ids) if grupo_ids else []
+    # Una materia se borra cuando ya no le queda ningún grupo
+    pendientes.append((Materia, materias.exclude(Exists(Grupo.todos.filter(materia=OuterRef('pk'))))))
+    for modelo, queryset in pendientes:
+        while max_lotes is None or lotes < max_lotes:
+            n = _borrar_lote(modelo, queryset, tamano_lote)
+            if n:
+                # Solo cuentan los DELETE: una tabla que ya quedó vacía no consume el cupo
+                lotes += 1
+                borradas[modelo.__name__] = borradas.get(modelo.__name__, 0) + n
+                if progreso:
+                    progreso(modelo, borradas[modelo.__name__])
+            if n < tamano_lote:
+                break
+    terminado = not Grupo.eliminados().exists() and not materias.exists()
+    if borradas:
+        logger.info('Purga de eliminados: %s%s', borradas, '' if terminado else ' (continúa)')
+    return borradas, terminado
@@ -0,0 +1,154 @@
+import random
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, Tags, register
+from django.db import DatabaseError, connections
+from django.utils.functional import LazyObject
+
+# Lecturas en réplicas (settings.DATABASE_REPLICAS, DATABASE_ROUTERS).
+# ReplicaMiddleware marca los GET/HEAD/OPTIONS que atienden las vistas de core; durante esos
+# requests ReplicaRouter manda las lecturas a una réplica sana elegida al azar. Todo lo demás
+# (escrituras, requests no seguros, comandos, el worker de tareas) usa 'default'.
+# Lectura de lo propio: tras un request de escritura de un docente, sus lecturas siguen en
+# 'default' durante REPLICA_VENTANA_ESCRITURA segundos; la marca vive en la caché de usuarios,
+# que debe ser compartida entre procesos (Redis): con réplicas y una caché local de cada
+# proceso, el check core.E001 impide arrancar. Una réplica que no acepta conexión se descarta
+# durante REPLICA_REINTENTO segundos en este proceso.
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+# Backends de caché cuyo contenido no ven los demás procesos
+CACHES_LOCALES = ('LocMemCache', 'DummyCache')
+
+_peticion = ContextVar('peticion_replica', default=None)
+_caidas = {}
+
+
+class _Lectura:
+    __slots__ = ('request', 'activa', 'alias')
+
+    def __init__(self, request):
+        self.request = request
+        self.activa = False
+        self.alias = None
+
+
+def clave_escritura(docente_id):
+    return f'escritura:{docente_id}'
+
+
+def marcar_escritura(docente_id):
+    caches[settings.USUARIOS_CACHE_ALIAS].set(clave_escritura(docente_id), True, settings.REPLICA_VENTANA_ESCRITURA)
+
+
+def escribio_hace_poco(docente_id):
+    return caches[settings.USUARIOS_CACHE_ALIAS].get(clave_escritura(docente_id)) is not None
+
+
+@register(Tags.caches)
+def verificar_cache_compartida(app_configs, **kwargs):
+    """ Con réplicas la marca de escritura tiene que verse desde cualquier proceso. """
+    if not settings.DATABASE_REPLICAS:
+        return []
+    backend = settings.CACHES[settings.USUARIOS_CACHE_ALIAS]['BACKEND']
+    if backend.rsplit('.', 1)[-1] not in CACHES_LOCALES:
+        return []
+    return [Error(
+        f"DATABASE_REPLICAS requiere una caché '{settings.USUARIOS_CACHE_ALIAS}' compartida entre procesos.",
+        hint='Define REDIS_URL; con caché local un docente puede leer de una réplica justo después de escribir.',
+        obj=backend,
+        id='core.E001',
+    )]
+
+
+def disponible(alias):
+    """ Verifica que la réplica acepte conexión; si no, la descarta por REPLICA_REINTENTO segundos. """
+    if _caidas.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _caidas[alias] = time.monotonic() + settings.REPLICA_REINTENTO
+        return False
+    _caidas.pop(alias, None)
+    return True
+
+
+def elegir_replica():
+    """ Alias de una réplica disponible al azar, o 'default' si no queda ninguna. """
+    candidatas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(candidatas)
+    return next((alias for alias in candidatas if disponible(alias)), 'default')
+
+
+def usuario_autenticado(request):
+    """
+    Usuario que DRF autenticó para `request`, o None si aún no autentica. El setter de
+    Request.user lo copia al HttpRequest; antes de eso request.user es el usuario perezoso de
+    AuthenticationMiddleware, que consulta la base al evaluarse: evaluarlo desde el router
+    entraría de nuevo al router con la evaluación a medias (RecursionError).
+    """
+    usuario = request.__dict__.get('user')
+    if usuario is None or isinstance(usuario, LazyObject) or not usuario.is_authenticated:
+        return None
+    return usuario
+
+
+def alias_de_lectura():
+    """ Base de datos para las lecturas del request en curso, o None fuera de una lectura de core. """
+    lectura = _peticion.get()
+    if lectura is None or not lectura.activa:
+        return None
+    if lectura.alias is None:
+        usuario = usuario_autenticado(lectura.request)
+        if usuario is None:
+            # Mientras se autentica (p. ej. el usuario del JWT) se lee del primario y no se decide aún
+            return 'default'
+        lectura.alias = 'default' if escribio_hace_poco(usuario.pk) else elegir_replica()
+    return lectura.alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return alias_de_lectura()
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sin esto Django escribiría en la base de la que se leyó la instancia
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        misma_fuente = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in misma_fuente and obj2._state.db in misma_fuente:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+class ReplicaMiddleware:
+    """ Habilita las réplicas para lecturas de las vistas de core y marca a quien escribe. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        seguro = request.method in METODOS_SEGUROS
+        token = _peticion.set(_Lectura(request) if seguro else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _peticion.reset(token)
+        usuario = usuario_autenticado(request)
+        if not seguro and usuario is not None:
+            marcar_escritura(usuario.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        lectura = _peticion.get()
+        if lectura is not None:
+            lectura.activa = view_func.__module__ == 'core.views'
@@ -0,0 +1,192 @@
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import SesionClase, InscripcionEstudianteGrupo, AsistenciaEstudiante, AsistenciaEmpaquetada, RiesgoEstudiante
+from .packing import BITS_POR_ESTADO, CODIGOS
+
+# Detección de estudiantes en riesgo (`manage.py calcular_riesgo`, GET /api/estudiantes/at_risk/).
+# Todas las asistencias (filas y pases de lista empaquetados) se cargan en arreglos columnares
+# de NumPy: un código de estado, el estudiante y el orden cronológico de la sesión por fila.
+# Se ordenan una vez por (docente, estudiante, fecha) y las métricas de cada par salen de
+# reducciones sobre ese orden (reduceat, bincount, maximum.accumulate), sin recorrer las
+# asistencias en Python. El resultado reemplaza las filas de RiesgoEstudiante.
+
+AUSENTE = CODIGOS[AsistenciaEstudiante.AttendanceStatus.AUSENTE.value]
+LOTE_LECTURA = 10000
+LOTE_ESCRITURA = 1000
+_DESPLAZAMIENTOS = np.arange(0, 8 * BITS_POR_ESTADO, BITS_POR_ESTADO, dtype=np.uint32)
+
+
+def _crudo(queryset):
+    """
+    Lotes de filas de un values_list() tal como los devuelve la base de datos: los UUID no se
+    convierten a uuid.UUID, lo que en millones de filas cuesta más que el resto del cálculo.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            lote = cursor.fetchmany(LOTE_LECTURA)
+            if not lote:
+                return
+            yield lote
+
+
+def decodificar(estados, total):
+    """ Versión vectorizada de packing.decodificar: arreglo de códigos (0 = sin registro). """
+    datos = np.frombuffer(bytes(estados), dtype=np.uint8).reshape(-1, BITS_POR_ESTADO).astype(np.uint32)
+    bloques = datos[:, 0] | (datos[:, 1] << 8) | (datos[:, 2] << 16)
+    return ((bloques[:, None] >> _DESPLAZAMIENTOS) & ((1 << BITS_POR_ESTADO) - 1)).ravel()[:total]
+
+
+def cargar(docente_ids=None):
+    """
+    Asistencias como arreglos alineados (sesion, estudiante, codigo). `sesion` es la posición de
+    la sesión en orden (docente, fecha); devuelve además el docente de cada posición y la lista
+    de ids de estudiante (índice -> id en la base de datos).
+    """
+    sesiones = SesionClase.objects.all()
+    asistencias = AsistenciaEstudiante.objects.all()
+    inscripciones = InscripcionEstudianteGrupo.objects.all()
+    if docente_ids is not None:
+        sesiones = sesiones.filter(docente_id__in=docente_ids)
+        asistencias = asistencias.filter(docente_id__in=docente_ids)
+        inscripciones = inscripciones.filter(grupo__docente_id__in=docente_ids)
+
+    orden = {}
+    docentes = []
+    for lote in _crudo(sesiones.order_by('docente_id', 'fecha', 'id').values_list('id', 'docente_id')):
+        for sesion_id, docente_id in lote:
+            orden[sesion_id] = len(docentes)
+            docentes.append(docente_id)
+
+    # Las sesiones creadas después de leer `orden` se omiten (posición -1): quedan para el siguiente cálculo
+    alumnos = {}
+    columnas = ([], [], [])
+    for lote in _crudo(asistencias.values_list('sesion_clase_id', 'estudiante_id', 'status')):
+        sesion_ids, estudiante_ids, estados = zip(*lote)
+        posiciones = np.fromiter((orden.get(s, -1) for s in sesion_ids), dtype=np.int64, count=len(lote))
+        conocidas = posiciones >= 0
+        columnas[0].append(posiciones[conocidas])
+        columnas[1].append(np.fromiter(
+            (alumnos.setdefault(e, len(alumnos)) for e in estudiante_ids), dtype=np.int64, count=len(lote),
+        )[conocidas])
+        columnas[2].append(np.fromiter((CODIGOS.get(s, 0) for s in estados), dtype=np.uint32, count=len(lote))[conocidas])
+
+    # Pases de lista empaquetados: posición en la lista del grupo -> índice de estudiante (-1 sin inscripción)
+    listas = {}
+    for lote in _crudo(inscripciones.values_list('grupo_id', 'indice', 'estudiante_id')):
+        for grupo_id, indice, estudiante_id in lote:
+            listas.setdefault(grupo_id, {})[indice] = alumnos.setdefault(estudiante_id, len(alumnos))
+    for grupo_id, lista in listas.items():
+        arreglo = np.full(max(lista) + 1, -1, dtype=np.int64)
+        arreglo[list(lista)] = list(lista.values())
+        listas[grupo_id] = arreglo
+    empaquetadas = AsistenciaEmpaquetada.objects.filter(sesion__in=sesiones).values_list(
+        'sesion_id', 'sesion__grupo_id', 'estados', 'total',
+    )
+    vacia = np.empty(0, dtype=np.int64)
+    for lote in _crudo(empaquetadas):
+        for sesion_id, grupo_id, estados, total in lote:
+            if sesion_id not in orden:
+                continue
+            codigos = decodificar(estados, total)
+            lista = listas.get(grupo_id, vacia)
+            codigos = codigos[:len(lista)]
+            estudiantes = lista[:len(codigos)]
+            validas = (codigos != 0) & (estudiantes >= 0)
+            columnas[0].append(np.full(np.count_nonzero(validas), orden[sesion_id], dtype=np.int64))
+            columnas[1].append(estudiantes[validas])
+            columnas[2].append(codigos[validas])
+
+    sesion, estudiante, codigo = (
+        np.concatenate(partes) if partes else np.empty(0, dtype=tipo)
+        for partes, tipo in zip(columnas, (np.int64, np.int64, np.uint32))
+    )
+    return sesion, estudiante, codigo, np.array(docentes, dtype=np.int64), list(alumnos)
+
+
+def metricas(sesion, estudiante, codigo, docente_por_sesion, ventana):
+    """
+    Métricas por par (docente, estudiante) a partir de los arreglos de cargar(). Devuelve un
+    dict de arreglos alineados; 'docente' y 'estudiante' son el id del docente y el índice del estudiante.
+    """
+    registradas = codigo != 0
+    sesion, estudiante, codigo = sesion[registradas], estudiante[registradas], codigo[registradas]
+    docente = docente_por_sesion[sesion]
+    n = len(codigo)
+    if not n:
+        vacio = np.empty(0, dtype=np.int64)
+        return dict(docente=vacio, estudiante=vacio, sesiones=vacio, ausencias=vacio, tasa_ausencias=vacio.astype(float),
+                    racha_actual=vacio, racha_maxima=vacio, tendencia=vacio.astype(float))
+
+    # Orden por (docente, estudiante, fecha); la posición de la sesión ya es cronológica
+    indice = np.lexsort((sesion, estudiante, docente))
+    docente, estudiante, ausente = docente[indice], estudiante[indice], codigo[indice] == AUSENTE
+    inicio = np.ones(n, dtype=bool)
+    inicio[1:] = (docente[1:] != docente[:-1]) | (estudiante[1:] != estudiante[:-1])
+    inicios = np.flatnonzero(inicio)
+    sesiones = np.diff(np.append(inicios, n))
+    finales = inicios + sesiones - 1
+    ausencias = np.add.reduceat(ausente.astype(np.int64), inicios)
+
+    # Largo de la racha de ausencias que termina en cada fila: distancia al último corte
+    # (una fila sin ausencia, o la fila anterior al inicio del par)
+    posicion = np.arange(n)
+    corte = np.where(ausente, -1, posicion)
+    corte[inicio & ausente] = posicion[inicio & ausente] - 1
+    racha = posicion - np.maximum.accumulate(corte)
+
+    # Tendencia: tasa de las últimas `ventana` sesiones menos la de las anteriores
+    par = np.cumsum(inicio) - 1
+    recientes = (finales[par] - posicion) < ventana
+    total_recientes = np.minimum(sesiones, ventana)
+    ausencias_recientes = np.bincount(par, weights=ausente & recientes, minlength=len(inicios))
+    total_anteriores = sesiones - total_recientes
+    tendencia = np.where(
+        total_anteriores > 0,
+        ausencias_recientes / total_recientes - (ausencias - ausencias_recientes) / np.maximum(total_anteriores, 1),
+        0.0,
+    )
+    return dict(
+        docente=docente[inicios], estudiante=estudiante[inicios], sesiones=sesiones, ausencias=ausencias,
+        tasa_ausencias=ausencias / sesiones, racha_actual=racha[finales],
+        racha_maxima=np.maximum.reduceat(racha, inicios), tendencia=tendencia,
+    )
+
+
+def en_riesgo(resultado):
+    """ Máscara de los pares que superan la tasa de ausencias o están en una racha de ausencias. """
+    return (
+        (resultado['tasa_ausencias'] > settings.RIESGO_TASA_AUSENCIAS)
+        | (resultado['racha_actual'] >= settings.RIESGO_RACHA_AUSENCIAS)
+    )
+
+
+def actualizar(docente_ids=None):
+    """ Recalcula y reemplaza los RiesgoEstudiante (de todos o de `docente_ids`). Devuelve cuántos quedaron. """
+    sesion, estudiante, codigo, docentes, alumnos = cargar(docente_ids)
+    resultado = metricas(sesion, estudiante, codigo, docentes, settings.RIESGO_VENTANA_TENDENCIA)
+    calculado = timezone.now()
+    nuevos = [
+        RiesgoEstudiante(
+            docente_id=int(resultado['docente'][i]),
+            estudiante_id=alumnos[resultado['estudiante'][i]],
+            sesiones=int(resultado['sesiones'][i]),
+            ausencias=int(resultado['ausencias'][i]),
+            tasa_ausencias=float(resultado['tasa_ausencias'][i]),
+            racha_actual=int(resultado['racha_actual'][i]),
+            racha_maxima=int(resultado['racha_maxima'][i]),
+            tendencia=float(resultado['tendencia'][i]),
+            calculado=calculado,
+        )
+        for i in np.flatnonzero(en_riesgo(resultado))
+    ]
+    anteriores = RiesgoEstudiante.objects.all()
+    if docente_ids is not None:
+        anteriores = anteriores.filter(docente_id__in=docente_ids)
+    with transaction.atomic():
+        anteriores.delete()
+        RiesgoEstudiante.objects.bulk_create(nuevos, batch_size=LOTE_ESCRITURA)
+    return len(nuevos)
@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+from django.db import transaction
+from .models import Estudiante, InscripcionEstudianteGrupo, CambioSync
+from . import sync
+
+# Importación masiva de estudiantes a un grupo desde CSV, JSON Lines o un arreglo JSON.
+# Las filas se procesan por lotes: por cada lote se resuelven las matrículas existentes con un
+# query, se crean los estudiantes faltantes y las inscripciones con INSERT masivos, y se
+# reporta el resultado de cada fila. Todo el archivo se importa en una sola transacción.
+
+LOTE_IMPORTACION = 500
+
+CREADO = 'creado'
+REUTILIZADO = 'reutilizado'
+INVALIDO = 'invalido'
+
+_max_nombre = Estudiante._meta.get_field('nombre_completo').max_length
+_max_matricula = Estudiante._meta.get_field('matricula').max_length
+
+
+class FormatoInvalido(ValueError):
+    pass
+
+
+def _normalizar(fila):
+    if not isinstance(fila, dict):
+        return None, None
+    nombre = fila.get('nombre') or fila.get('nombre_completo') or ''
+    matricula = fila.get('matricula') or fila.get('studentId') or ''
+    return str(nombre).strip(), str(matricula).strip()
+
+
+def leer_filas(archivo=None, datos=None):
+    """
+    Itera las filas de un archivo subido (.csv, .jsonl/.ndjson o .json) o de datos ya parseados.
+    CSV y JSON Lines se leen línea a línea sin cargar el archivo completo en memoria.
+    """
+    try:
+        yield from _leer_filas(archivo, datos)
+    except (UnicodeDecodeError, csv.Error):
+        raise FormatoInvalido('El archivo no es un texto UTF-8 / CSV válido.')
+
+
+def _leer_filas(archivo, datos):
+    if archivo is None:
+        if isinstance(datos, dict):
+            datos = datos.get('estudiantes')
+        if not isinstance(datos, list):
+            raise FormatoInvalido('Se esperaba una lista de estudiantes o un archivo.')
+        yield from datos
+        return
+    nombre = (archivo.name or '').lower()
+    texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+    if nombre.endswith('.csv') or archivo.content_type in ('text/csv', 'application/vnd.ms-excel'):
+        yield from csv.DictReader(texto)
+    elif nombre.endswith(('.jsonl', '.ndjson')):
+        for linea in texto:
+            if linea.strip():
+                try:
+                    yield json.loads(linea)
+                except ValueError:
+                    yield None
+    elif nombre.endswith('.json') or archivo.content_type == 'application/json':
+        try:
+            datos = json.load(texto)
+        except ValueError:
+            raise FormatoInvalido('El archivo JSON no es válido.')
+        yield from _leer_filas(None, datos)
+    else:
+        raise FormatoInvalido('Formato no soportado; usa .csv, .jsonl o .json.')
+
+
+def importar_estudiantes(grupo, filas, docente_id, tamano_lote=None):
+    """ Importa las filas al grupo y devuelve el reporte por fila y los totales. """
+    tamano_lote = tamano_lote or LOTE_IMPORTACION
+    reporte = []
+    vistas = set()
+    lote = []
+    with transaction.atomic():
+        for numero, fila in enumerate(filas, start=1):
+            nombre, matricula = _normalizar(fila)
+            error = None
+            if not matricula:
+                error = 'Matrícula requerida.'
+            elif not nombre:
+                error = 'Nombre requerido.'
+            elif len(matricula) > _max_matricula or len(nombre) > _max_nombre:
+                error = 'Nombre o matrícula demasiado largos.'
+            elif matricula in vistas:
+                error = 'Matrícula repetida en el archivo.'
+            if error:
+                reporte.append({'fila': numero, 'matricula': matricula, 'resultado': INVALIDO, 'error': error})
+                continue
+            vistas.add(matricula)
+            lote.append((numero, nombre, matricula))
+            if len(lote) >= tamano_lote:
+                reporte.extend(_importar_lote(grupo, lote, docente_id))
+                lote = []
+        if lote:
+            reporte.extend(_importar_lote(grupo, lote, docente_id))
+    reporte.sort(key=lambda r: r['fila'])
+    totales = {CREADO: 0, REUTILIZADO: 0, INVALIDO: 0}
+    for r in reporte:
+        totales[r['resultado']] += 1
+    return {
+        'creados': totales[CREADO],
+        'reutilizados': totales[REUTILIZADO],
+        'invalidos': totales[INVALIDO],
+        'inscritos': sum(1 for r in reporte if r.get('inscrito')),
+        'filas': reporte,
+    }
+
+
+def _importar_lote(grupo, lote, docente_id):
+    matriculas = [m for _, _, m in lote]
+    existentes = dict(Estudiante.objects.filter(matricula__in=matriculas).values_list('matricula', 'id'))
+    nuevos = [Estudiante(nombre_completo=n, matricula=m) for _, n, m in lote if m not in existentes]
+    creados = set()
+    if nuevos:
+        # ignore_conflicts cubre matrículas creadas en paralelo; los ids reales se releen
+        Estudiante.objects.bulk_create(nuevos, ignore_conflicts=True)
+        ids_propuestos = {e.matricula: e.id for e in nuevos}
+        for matricula, pk in Estudiante.objects.filter(matricula__in=list(ids_propuestos)).values_list('matricula', 'id'):
+            existentes[matricula] = pk
+            if ids_propuestos[matricula] == pk:
+                creados.add(matricula)
+
+    ids = [existentes[m] for m in matriculas]
+    ya_inscritos = set(
+        InscripcionEstudianteGrupo.objects.filter(grupo=grupo, estudiante_id__in=ids).values_list('estudiante_id', flat=True)
+    )
+    inscripciones = [InscripcionEstudianteGrupo(estudiante_id=pk, grupo=grupo) for pk in ids if pk not in ya_inscritos]
+    InscripcionEstudianteGrupo.objects.bulk_create(inscripciones, ignore_conflicts=True)
+
+    # bulk_create no emite señales: se registran los cambios para /api/sync/
+    sync.registrar(InscripcionEstudianteGrupo, [i.pk for i in inscripciones], CambioSync.Operacion.CREADO, [docente_id])
+    sync.registrar(Estudiante, [i.estudiante_id for i in inscripciones], CambioSync.Operacion.ACTUALIZADO, [docente_id])
+
+    return [
+        {
+            'fila': numero,
+            'matricula': matricula,
+            'id': existentes[matricula],
+            'resultado': CREADO if matricula in creados else REUTILIZADO,
+            'inscrito': existentes[matricula] not in ya_inscritos,
+        }
+        for numero, _, matricula in lote
+    ]
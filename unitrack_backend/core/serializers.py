@@ -1,26 +1,66 @@
 from rest_framework import serializers
-from .models import Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante
+from .models import Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, HorarioClase, SesionArchivada
+from .expansion import Expansion
 
-class EstudianteSerializer(serializers.ModelSerializer):
+class ExpandableFieldsMixin:
+    """ Aplica ?fields= y ?expand= del request a este serializador y a los anidados. """
+    # Campos que son relaciones anidadas y que se omiten si no se piden en ?expand=
+    expandable_fields = ()
+
+    def ruta_anidada(self):
+        partes = []
+        nodo = self
+        while nodo.parent is not None:
+            if nodo.field_name:
+                partes.append(nodo.field_name)
+            nodo = nodo.parent
+        return '.'.join(reversed(partes))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expansion = self.context.get('expansion')
+        if expansion is None:
+            expansion = Expansion.desde_request(self.context.get('request'))
+        ruta = self.ruta_anidada()
+        prefijo = f'{ruta}.' if ruta else ''
+        visibles = set(expansion.campos(ruta, fields))
+        for nombre in list(fields):
+            if nombre not in visibles or (nombre in self.expandable_fields and not expansion.incluye(prefijo + nombre)):
+                del fields[nombre]
+        return fields
+
+class EstudianteSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     nombre = serializers.CharField(source='nombre_completo')
     studentId = serializers.CharField(source='matricula')
     class Meta:
         model = Estudiante
         fields = ['id', 'nombre', 'studentId']
 
-class AsistenciaEstudianteSerializer(serializers.ModelSerializer):
-    studentId = serializers.UUIDField(source='estudiante.id')
+class AsistenciaEstudianteSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    studentId = serializers.UUIDField(source='estudiante_id')
     class Meta:
         model = AsistenciaEstudiante
         fields = ['studentId', 'status']
 
-class SesionClaseSerializer(serializers.ModelSerializer):
-    asistencias = AsistenciaEstudianteSerializer(source='asistencias_detalle', many=True, read_only=True)
+class SesionClaseSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('asistencias',)
+    asistencias = AsistenciaEstudianteSerializer(source='registro_asistencias', many=True, read_only=True)
     class Meta:
         model = SesionClase
         fields = ['id', 'fecha', 'nombre', 'asistencias', 'grupo']
 
-class GrupoSerializer(serializers.ModelSerializer):
+class SesionArchivadaSerializer(serializers.ModelSerializer):
+    """ Misma forma que SesionClaseSerializer, más la fecha en que se archivó. """
+    asistencias = serializers.SerializerMethodField()
+    class Meta:
+        model = SesionArchivada
+        fields = ['id', 'fecha', 'nombre', 'asistencias', 'grupo', 'archivada']
+
+    def get_asistencias(self, obj):
+        return [{'studentId': estudiante_id, 'status': status} for estudiante_id, status in obj.estados_por_estudiante()]
+
+class GrupoSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('estudiantes', 'sesiones')
     estudiantes = serializers.SerializerMethodField()
     sesiones = SesionClaseSerializer(many=True, read_only=True)
     class Meta:
@@ -28,16 +68,66 @@ class GrupoSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'materia', 'estudiantes', 'sesiones']
 
     def get_estudiantes(self, obj):
-        # Devuelve la lista completa de estudiantes usando el serializador
-        return [EstudianteSerializer(insc.estudiante).data for insc in obj.inscripciones.all()]
+        # Devuelve la lista completa de estudiantes usando el serializador, ligado al campo
+        # para que ?fields= lo vea en su ruta (p. ej. 'estudiantes.id' o 'grupos.estudiantes.id')
+        serializador = EstudianteSerializer(
+            [insc.estudiante for insc in obj.inscripciones.all()], many=True, context=self.context,
+        )
+        serializador.bind(field_name='estudiantes', parent=self)
+        return serializador.data
 
-class MateriaSerializer(serializers.ModelSerializer):
+class MateriaSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('grupos',)
     grupos = GrupoSerializer(many=True, read_only=True)
     class Meta:
         model = Materia
         fields = ['id', 'nombre', 'codigo', 'grupos']
 
+class HorarioClaseSerializer(serializers.ModelSerializer):
+    diaSemana = serializers.ChoiceField(source='dia_semana', choices=HorarioClase.DiaSemana.choices)
+    horaInicio = serializers.TimeField(source='hora_inicio')
+    horaFin = serializers.TimeField(source='hora_fin')
+    class Meta:
+        model = HorarioClase
+        fields = ['id', 'grupo', 'diaSemana', 'horaInicio', 'horaFin']
+
+    def validate_grupo(self, grupo):
+        request = self.context.get('request')
+        if request is not None and grupo.docente_id != request.user.pk:
+            raise serializers.ValidationError('El grupo no pertenece al docente.')
+        return grupo
+
+    def validate(self, attrs):
+        inicio = attrs.get('hora_inicio', getattr(self.instance, 'hora_inicio', None))
+        fin = attrs.get('hora_fin', getattr(self.instance, 'hora_fin', None))
+        if inicio is not None and fin is not None and fin <= inicio:
+            raise serializers.ValidationError('La hora de fin debe ser posterior a la de inicio.')
+        return attrs
+
 class InscripcionEstudianteSerializer(serializers.ModelSerializer):
     class Meta:
         model = InscripcionEstudianteGrupo
-        fields = ['id', 'estudiante', 'grupo']
\ No newline at end of file
+        fields = ['id', 'estudiante', 'grupo']
+
+# Representaciones planas (sin anidar) usadas por la sincronización incremental
+class MateriaPlanaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Materia
+        fields = ['id', 'nombre', 'codigo']
+
+class GrupoPlanoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Grupo
+        fields = ['id', 'nombre', 'materia']
+
+class SesionClasePlanaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SesionClase
+        fields = ['id', 'fecha', 'nombre', 'grupo']
+
+class AsistenciaPlanaSerializer(serializers.ModelSerializer):
+    sesion = serializers.UUIDField(source='sesion_clase_id')
+    studentId = serializers.UUIDField(source='estudiante_id')
+    class Meta:
+        model = AsistenciaEstudiante
+        fields = ['id', 'sesion', 'studentId', 'status']
@@ -0,0 +1,127 @@
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, post_migrate
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from .models import (
+    Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada,
+    HorarioClase, CambioSync,
+)
+from .stats import registrar_cambios, es_origen, descontar_asistencias
+from . import authentication, busqueda, packing, sync
+
+# Mantenimiento incremental de las estadísticas de asistencia.
+# Los borrados en cascada se descuentan en bloque desde el objeto que originó el borrado,
+# en lugar de fila por fila.
+
+
+@receiver(post_save, sender=AsistenciaEstudiante)
+def asistencia_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    actual = (instance.sesion_clase_id, instance.estudiante_id, instance.status)
+    original = getattr(instance, '_original', None)
+    if not created and original == actual:
+        return
+    sync.registrar_instancia(instance, CambioSync.Operacion.CREADO if created else CambioSync.Operacion.ACTUALIZADO)
+    cambios = [actual + (1,)]
+    if not created and original:
+        cambios.append(original + (-1,))
+    registrar_cambios(cambios)
+    instance._original = actual
+
+
+@receiver(post_delete, sender=AsistenciaEstudiante)
+def asistencia_borrada(sender, instance, origin=None, **kwargs):
+    # Solo borrados directos de asistencias; los de cascada ya se descontaron en pre_delete
+    if origin is not None and not es_origen(origin, AsistenciaEstudiante):
+        return
+    registrar_cambios([(instance.sesion_clase_id, instance.estudiante_id, instance.status, -1)])
+
+
+@receiver(pre_delete, sender=SesionClase)
+def sesion_por_borrar(sender, instance, origin=None, **kwargs):
+    # Al borrar un grupo o materia sus estadísticas desaparecen con él; no hay nada que descontar
+    if es_origen(origin, SesionClase):
+        descontar_asistencias(AsistenciaEstudiante.objects.filter(sesion_clase=instance))
+        registrar_cambios(*packing.cambios_empaquetados(SesionClase.objects.filter(pk=instance.pk), -1))
+
+
+@receiver(pre_delete, sender=Estudiante)
+def estudiante_por_borrar(sender, instance, origin=None, **kwargs):
+    if es_origen(origin, Estudiante):
+        descontar_asistencias(AsistenciaEstudiante.objects.filter(estudiante=instance))
+        sesiones = SesionClase.objects.filter(grupo__inscripciones__estudiante=instance)
+        registrar_cambios(*packing.cambios_empaquetados(sesiones, -1, estudiante_id=instance.pk))
+
+
+@receiver(pre_delete, sender=InscripcionEstudianteGrupo)
+def inscripcion_por_borrar(sender, instance, origin=None, **kwargs):
+    # En filas la asistencia se conserva al dar de baja; empaquetada pierde su posición en la lista
+    if es_origen(origin, InscripcionEstudianteGrupo):
+        sesiones = SesionClase.objects.filter(grupo_id=instance.grupo_id)
+        cambios, grupos = packing.cambios_empaquetados(sesiones, -1, estudiante_id=instance.estudiante_id)
+        registrar_cambios(cambios, grupos)
+        if cambios:
+            ids = [AsistenciaEmpaquetada.id_asistencia(sesion_id, e) for sesion_id, e, _, _ in cambios]
+            sync.registrar(AsistenciaEstudiante, ids, CambioSync.Operacion.ELIMINADO, sync.docentes_de(InscripcionEstudianteGrupo, instance.pk))
+
+
+# Registro de cambios para la sincronización incremental
+
+@receiver(post_save, sender=Materia)
+@receiver(post_save, sender=Grupo)
+@receiver(post_save, sender=Estudiante)
+@receiver(post_save, sender=SesionClase)
+@receiver(post_save, sender=HorarioClase)
+def objeto_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    sync.registrar_instancia(instance, CambioSync.Operacion.CREADO if created else CambioSync.Operacion.ACTUALIZADO)
+
+
+@receiver(post_save, sender=InscripcionEstudianteGrupo)
+def inscripcion_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    docentes = sync.docentes_de(InscripcionEstudianteGrupo, instance.pk)
+    sync.registrar(InscripcionEstudianteGrupo, [instance.pk], CambioSync.Operacion.CREADO if created else CambioSync.Operacion.ACTUALIZADO, docentes)
+    # El estudiante pasa a ser visible para el docente del grupo
+    sync.registrar(Estudiante, [instance.estudiante_id], CambioSync.Operacion.ACTUALIZADO, docentes)
+
+
+@receiver(pre_delete, sender=Materia)
+@receiver(pre_delete, sender=Grupo)
+@receiver(pre_delete, sender=Estudiante)
+@receiver(pre_delete, sender=InscripcionEstudianteGrupo)
+@receiver(pre_delete, sender=SesionClase)
+@receiver(pre_delete, sender=AsistenciaEstudiante)
+@receiver(pre_delete, sender=HorarioClase)
+def objeto_por_borrar(sender, instance, origin=None, **kwargs):
+    # Solo el objeto que origina el borrado; sus dependientes los elimina el cliente
+    if origin is None or es_origen(origin, sender):
+        sync.registrar_instancia(instance, CambioSync.Operacion.ELIMINADO)
+
+
+# Usuarios en caché de core.authentication
+
+@receiver(pre_save, sender=User)
+def usuario_por_guardar(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Si cambia el email, la entrada vieja (clave del claim de tokens ya emitidos) también se borra
+    if raw or instance.pk is None or (update_fields is not None and 'email' not in update_fields):
+        return
+    instance._email_original = User.objects.filter(pk=instance.pk).values_list('email', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def usuario_guardado(sender, instance, **kwargs):
+    authentication.invalidar(instance.email, getattr(instance, '_email_original', None))
+
+
+# Índices de búsqueda: una migración que recrea la tabla en SQLite se lleva sus triggers
+
+@receiver(post_migrate)
+def reparar_busqueda(sender, using='default', **kwargs):
+    if sender.label == 'core':
+        busqueda.instalar(connections[using], solo_reparar=True)
+
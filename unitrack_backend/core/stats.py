@@ -0,0 +1,203 @@
+from collections import Counter, defaultdict
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, QuerySet
+from .models import (
+    SesionClase, InscripcionEstudianteGrupo, AsistenciaEstudiante,
+    ContadoresAsistencia, EstadisticaSesion, EstadisticaInscripcion, EstadisticaGrupo,
+)
+
+# Estadísticas de asistencia mantenidas incrementalmente.
+# Cada cambio en AsistenciaEstudiante se traduce en deltas (+1/-1 por status) que se aplican
+# a los contadores de la sesión, de la inscripción (grupo, estudiante) y del grupo.
+# Los cambios hechos con QuerySet.update() u otras vías que no pasan por aquí generan
+# desviaciones; el comando `reconstruir_estadisticas` las detecta y repara.
+
+CAMPOS_POR_STATUS = ContadoresAsistencia.CAMPOS_POR_STATUS
+
+# Filas reparadas por sentencia al reconstruir
+LOTE_RECONSTRUCCION = 500
+
+
+def registrar_cambios(cambios, grupos_por_sesion=None):
+    """
+    Aplica una lista de cambios (sesion_id, estudiante_id, status, signo) a los contadores.
+    `grupos_por_sesion` ({sesion_id: grupo_id}) evita el query de resolución de grupos.
+    El número de queries no depende de la cantidad de cambios.
+    """
+    cambios = [c for c in cambios if c[2] in CAMPOS_POR_STATUS and c[3]]
+    if not cambios:
+        return
+    grupos_por_sesion = dict(grupos_por_sesion or {})
+    faltantes = {c[0] for c in cambios} - set(grupos_por_sesion)
+    if faltantes:
+        grupos_por_sesion.update(SesionClase.objects.filter(pk__in=faltantes).values_list('id', 'grupo_id'))
+
+    por_sesion = defaultdict(Counter)
+    por_grupo = defaultdict(Counter)
+    por_alumno = defaultdict(Counter)
+    for sesion_id, estudiante_id, status, signo in cambios:
+        grupo_id = grupos_por_sesion.get(sesion_id)
+        if grupo_id is None:
+            continue
+        por_sesion[sesion_id][status] += signo
+        por_grupo[grupo_id][status] += signo
+        por_alumno[(grupo_id, estudiante_id)][status] += signo
+
+    # Las inscripciones se resuelven por (grupo, estudiante) en un query por grupo afectado
+    alumnos_por_grupo = defaultdict(set)
+    for grupo_id, estudiante_id in por_alumno:
+        alumnos_por_grupo[grupo_id].add(estudiante_id)
+    por_inscripcion = {}
+    for grupo_id, estudiantes in alumnos_por_grupo.items():
+        inscripciones = InscripcionEstudianteGrupo.objects.filter(
+            grupo_id=grupo_id, estudiante_id__in=estudiantes,
+        ).values_list('id', 'estudiante_id')
+        for inscripcion_id, estudiante_id in inscripciones:
+            por_inscripcion[inscripcion_id] = por_alumno[(grupo_id, estudiante_id)]
+
+    with transaction.atomic():
+        _aplicar(EstadisticaSesion, 'sesion_id', por_sesion)
+        _aplicar(EstadisticaGrupo, 'grupo_id', por_grupo)
+        _aplicar(EstadisticaInscripcion, 'inscripcion_id', por_inscripcion)
+
+
+def _aplicar(modelo, campo_pk, deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+    # Asegurar que existan las filas de contadores
+    modelo.objects.bulk_create([modelo(**{campo_pk: pk}) for pk in deltas], ignore_conflicts=True)
+    # Un UPDATE por cada combinación distinta de deltas (normalmente una o dos)
+    por_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        por_delta[tuple(sorted((s, n) for s, n in delta.items() if n))].append(pk)
+    for delta, pks in por_delta.items():
+        modelo.objects.filter(pk__in=pks).update(**{
+            CAMPOS_POR_STATUS[status]: F(CAMPOS_POR_STATUS[status]) + n for status, n in delta
+        })
+
+
+def cambios_de_asistencias(asistencias, signo):
+    return [(a.sesion_clase_id, a.estudiante_id, a.status, signo) for a in asistencias]
+
+
+def es_origen(origin, modelo):
+    """ Indica si un borrado (post_delete/pre_delete) se inició sobre `modelo`. """
+    if isinstance(origin, QuerySet):
+        return origin.model is modelo
+    return isinstance(origin, modelo)
+
+
+def descontar_asistencias(queryset):
+    """ Descuenta de las estadísticas todas las asistencias de `queryset` en bloque. """
+    filas = queryset.values_list('sesion_clase_id', 'estudiante_id', 'status', 'sesion_clase__grupo_id')
+    grupos_por_sesion = {}
+    cambios = []
+    for sesion_id, estudiante_id, status, grupo_id in filas:
+        grupos_por_sesion[sesion_id] = grupo_id
+        cambios.append((sesion_id, estudiante_id, status, -1))
+    registrar_cambios(cambios, grupos_por_sesion)
+
+
+def resumen_contadores(estadistica):
+    """ Contadores de un objeto de estadísticas (o ceros si no existe) con total y porcentaje. """
+    contadores = estadistica.contadores() if estadistica else dict.fromkeys(CAMPOS_POR_STATUS, 0)
+    total = sum(contadores.values())
+    asistieron = contadores[AsistenciaEstudiante.AttendanceStatus.PRESENTE] + contadores[AsistenciaEstudiante.AttendanceStatus.TARDE]
+    contadores['total'] = total
+    contadores['porcentajeAsistencia'] = round(asistieron * 100 / total) if total else 0
+    return contadores
+
+
+def calcular_estadisticas(grupo_ids=None, apps=global_apps):
+    """
+    Calcula desde cero los contadores esperados a partir de las asistencias.
+    Devuelve tres dicts {pk: {campo: n}} para sesiones, inscripciones y grupos.
+    Recibe `apps` para poder usarse también desde migraciones.
+    """
+    Sesion = apps.get_model('core', 'SesionClase')
+    Inscripcion = apps.get_model('core', 'InscripcionEstudianteGrupo')
+    Asistencia = apps.get_model('core', 'AsistenciaEstudiante')
+
+    sesiones = Sesion.objects.all()
+    inscripciones = Inscripcion.objects.all()
+    asistencias = Asistencia.objects.all()
+    if grupo_ids is not None:
+        sesiones = sesiones.filter(grupo_id__in=grupo_ids)
+        inscripciones = inscripciones.filter(grupo_id__in=grupo_ids)
+        asistencias = asistencias.filter(sesion_clase__grupo_id__in=grupo_ids)
+
+    ceros = dict.fromkeys(CAMPOS_POR_STATUS.values(), 0)
+    esperadas_sesion = {pk: dict(ceros) for pk in sesiones.values_list('id', flat=True)}
+    esperadas_grupo = {pk: dict(ceros) for pk in sesiones.values_list('grupo_id', flat=True).distinct()}
+    inscripcion_por_alumno = {}
+    esperadas_inscripcion = {}
+    for pk, grupo_id, estudiante_id in inscripciones.values_list('id', 'grupo_id', 'estudiante_id'):
+        inscripcion_por_alumno[(grupo_id, estudiante_id)] = pk
+        esperadas_inscripcion[pk] = dict(ceros)
+        esperadas_grupo.setdefault(grupo_id, dict(ceros))
+
+    filas = asistencias.values('sesion_clase_id', 'sesion_clase__grupo_id', 'estudiante_id', 'status').annotate(n=Count('id'))
+    for fila in filas:
+        campo = CAMPOS_POR_STATUS.get(fila['status'])
+        if campo is None:
+            continue
+        grupo_id = fila['sesion_clase__grupo_id']
+        esperadas_sesion[fila['sesion_clase_id']][campo] += fila['n']
+        esperadas_grupo[grupo_id][campo] += fila['n']
+        inscripcion_id = inscripcion_por_alumno.get((grupo_id, fila['estudiante_id']))
+        if inscripcion_id is not None:
+            esperadas_inscripcion[inscripcion_id][campo] += fila['n']
+
+    # Pases de lista empaquetados (no existen en migraciones anteriores a su modelo)
+    try:
+        Empaquetada = apps.get_model('core', 'AsistenciaEmpaquetada')
+    except LookupError:
+        return esperadas_sesion, esperadas_inscripcion, esperadas_grupo
+    from .packing import decodificar
+    inscripcion_por_indice = dict(
+        ((grupo_id, indice), pk) for pk, grupo_id, indice in inscripciones.values_list('id', 'grupo_id', 'indice')
+    )
+    empaquetadas = Empaquetada.objects.filter(sesion__in=sesiones).values_list('sesion_id', 'sesion__grupo_id', 'estados', 'total')
+    for sesion_id, grupo_id, estados, total in empaquetadas.iterator():
+        for indice, status in enumerate(decodificar(estados, total)):
+            campo = CAMPOS_POR_STATUS.get(status)
+            inscripcion_id = inscripcion_por_indice.get((grupo_id, indice))
+            # Una posición sin inscripción ya no se lee (ver AsistenciaEmpaquetada.estados_por_estudiante)
+            if campo is None or inscripcion_id is None:
+                continue
+            esperadas_sesion[sesion_id][campo] += 1
+            esperadas_grupo[grupo_id][campo] += 1
+            esperadas_inscripcion[inscripcion_id][campo] += 1
+    return esperadas_sesion, esperadas_inscripcion, esperadas_grupo
+
+
+def reconstruir_estadisticas(grupo_ids=None, verificar=False, apps=global_apps):
+    """
+    Compara los contadores almacenados con los calculados desde las asistencias.
+    Devuelve {nombre_modelo: [pks con diferencias]}; si `verificar` es False, además los repara.
+    """
+    esperadas = calcular_estadisticas(grupo_ids, apps=apps)
+    niveles = [
+        (apps.get_model('core', 'EstadisticaSesion'), 'sesion_id', 'sesion__grupo_id__in', esperadas[0]),
+        (apps.get_model('core', 'EstadisticaInscripcion'), 'inscripcion_id', 'inscripcion__grupo_id__in', esperadas[1]),
+        (apps.get_model('core', 'EstadisticaGrupo'), 'grupo_id', 'grupo_id__in', esperadas[2]),
+    ]
+    campos = list(CAMPOS_POR_STATUS.values())
+    diferencias = {}
+    with transaction.atomic():
+        for modelo, campo_pk, filtro_grupo, esperado in niveles:
+            almacenadas = modelo.objects.all()
+            if grupo_ids is not None:
+                almacenadas = almacenadas.filter(**{filtro_grupo: grupo_ids})
+            almacenado = {fila.pop(campo_pk): fila for fila in almacenadas.values(campo_pk, *campos).iterator()}
+            distintos = [pk for pk, valores in esperado.items() if almacenado.get(pk) != valores]
+            diferencias[modelo.__name__] = distintos
+            if verificar:
+                continue
+            for inicio in range(0, len(distintos), LOTE_RECONSTRUCCION):
+                lote = distintos[inicio:inicio + LOTE_RECONSTRUCCION]
+                modelo.objects.filter(pk__in=lote).delete()
+                modelo.objects.bulk_create([modelo(**{campo_pk: pk}, **esperado[pk]) for pk in lote])
+    return diferencias
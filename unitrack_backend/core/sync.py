@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from .models import (
+    Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada,
+    HorarioClase, CambioSync,
+)
+from .serializers import (
+    MateriaPlanaSerializer, GrupoPlanoSerializer, EstudianteSerializer, InscripcionEstudianteSerializer,
+    SesionClasePlanaSerializer, AsistenciaPlanaSerializer, HorarioClaseSerializer,
+)
+
+# Registro de cambios por docente para GET /api/sync/?since=<cursor>.
+# Un borrado se registra solo para el objeto que lo originó: el cliente elimina también
+# sus dependientes (por ejemplo, los grupos y sesiones de una materia borrada). Un cambio de
+# docente sí registra cada dependiente, como borrado para el anterior y alta para el nuevo.
+
+# Nombre en el registro y serializador plano de cada modelo sincronizado, en orden de dependencia
+MODELOS_SYNC = OrderedDict([
+    (Materia, ('materias', MateriaPlanaSerializer)),
+    (Grupo, ('grupos', GrupoPlanoSerializer)),
+    (Estudiante, ('estudiantes', EstudianteSerializer)),
+    (InscripcionEstudianteGrupo, ('inscripciones', InscripcionEstudianteSerializer)),
+    (SesionClase, ('sesiones', SesionClasePlanaSerializer)),
+    (AsistenciaEstudiante, ('asistencias', AsistenciaPlanaSerializer)),
+    (HorarioClase, ('horarios', HorarioClaseSerializer)),
+])
+
+# Pase de lista empaquetado de una sesión (core.packing): no tiene filas que registrar una por
+# una, así que se registra la sesión y la respuesta incluye en 'asistencias' todo su pase de
+# lista actual, con ids estables (AsistenciaEmpaquetada.id_asistencia). Los estudiantes que
+# salen del pase se registran como asistencias eliminadas con ese mismo id.
+PASE_DE_LISTA = 'pases_de_lista'
+
+# Camino desde cada modelo hasta su(s) docente(s)
+RUTA_DOCENTE = {
+    Materia: 'docente_id',
+    Grupo: 'docente_id',
+    Estudiante: 'inscripcionestudiantegrupo__grupo__docente_id',
+    InscripcionEstudianteGrupo: 'grupo__docente_id',
+    SesionClase: 'docente_id',
+    AsistenciaEstudiante: 'docente_id',
+    HorarioClase: 'docente_id',
+}
+
+# Máximo de entradas del registro procesadas por respuesta
+LIMITE_CAMBIOS = 1000
+
+
+def docentes_de(modelo, pk):
+    return set(modelo.objects.filter(pk=pk).values_list(RUTA_DOCENTE[modelo], flat=True)) - {None}
+
+
+def registrar(modelo, pks, operacion, docentes):
+    """ Registra la operación sobre `pks` para cada docente, en un solo INSERT. """
+    nombre = MODELOS_SYNC[modelo][0]
+    CambioSync.objects.bulk_create([
+        CambioSync(docente_id=docente_id, modelo=nombre, objeto_id=pk, operacion=operacion)
+        for docente_id in docentes
+        for pk in pks
+    ])
+
+
+def registrar_pase(sesion_ids, operacion, docentes):
+    """ Registra un cambio en el pase de lista empaquetado de las sesiones (ver PASE_DE_LISTA). """
+    CambioSync.objects.bulk_create([
+        CambioSync(docente_id=docente_id, modelo=PASE_DE_LISTA, objeto_id=pk, operacion=operacion)
+        for docente_id in docentes
+        for pk in sesion_ids
+    ])
+
+
+def registrar_pase_eliminado(sesion_id, estudiante_ids, docentes):
+    """ Los estudiantes salieron del pase de lista empaquetado de la sesión. """
+    ids = [AsistenciaEmpaquetada.id_asistencia(sesion_id, e) for e in estudiante_ids]
+    registrar(AsistenciaEstudiante, ids, CambioSync.Operacion.ELIMINADO, docentes)
+
+
+def _asistencias_de_pases(sesion_ids):
+    """ Todas las asistencias actuales (filas y empaquetadas) de las sesiones, en tres queries. """
+    asistencias = list(AsistenciaEstudiante.objects.filter(sesion_clase_id__in=sesion_ids))
+    for empaquetada in AsistenciaEmpaquetada.objects.filter(sesion_id__in=sesion_ids):
+        asistencias += empaquetada.asistencias()
+    return asistencias
+
+
+def registrar_traspaso(instance, anterior, dependientes):
+    """
+    `instance` (Materia o Grupo) pasó del docente `anterior` al actual junto con `dependientes`
+    ({modelo: pks}). El anterior recibe el borrado de todo y el nuevo el alta, así avanzan los
+    cursores (y con ellos ETag y caché) de los dos. Los estudiantes inscritos solo se dan de
+    alta al nuevo: el anterior puede seguir viéndolos en otros grupos.
+    """
+    nuevo = instance.docente_id
+    objetos = [(type(instance), [instance.pk])] + [(modelo, pks) for modelo, pks in dependientes.items() if pks]
+    estudiantes = set(InscripcionEstudianteGrupo.objects.filter(
+        pk__in=dependientes.get(InscripcionEstudianteGrupo, []),
+    ).values_list('estudiante_id', flat=True))
+    cambios = [
+        CambioSync(docente_id=docente_id, modelo=MODELOS_SYNC[modelo][0], objeto_id=pk, operacion=operacion)
+        for docente_id, operacion in ((anterior, CambioSync.Operacion.ELIMINADO), (nuevo, CambioSync.Operacion.CREADO))
+        for modelo, pks in objetos
+        for pk in pks
+    ]
+    cambios += [
+        CambioSync(docente_id=nuevo, modelo=MODELOS_SYNC[Estudiante][0], objeto_id=pk, operacion=CambioSync.Operacion.CREADO)
+        for pk in estudiantes
+    ]
+    cambios += [
+        CambioSync(docente_id=nuevo, modelo=PASE_DE_LISTA, objeto_id=pk, operacion=CambioSync.Operacion.CREADO)
+        for pk in AsistenciaEmpaquetada.objects.filter(
+            sesion_id__in=dependientes.get(SesionClase, []),
+        ).values_list('sesion_id', flat=True)
+    ]
+    CambioSync.objects.bulk_create(cambios, batch_size=LIMITE_CAMBIOS)
+
+
+def registrar_instancia(instance, operacion):
+    modelo = type(instance)
+    if modelo in (Materia, Grupo, SesionClase, AsistenciaEstudiante, HorarioClase):
+        docentes = [instance.docente_id]
+    else:
+        docentes = docentes_de(modelo, instance.pk)
+    registrar(modelo, [instance.pk], operacion, docentes)
+
+
+def cursor_actual(docente):
+    ultimo = CambioSync.objects.filter(docente=docente).order_by('-id').values_list('id', flat=True).first()
+    return ultimo or 0
+
+
+def cambios_desde(docente, since, limite=LIMITE_CAMBIOS):
+    """
+    Cambios del docente posteriores al cursor `since`, agrupados por modelo.
+    El trabajo es proporcional al número de entradas nuevas del registro, no al historial.
+    """
+    entradas = list(
+        CambioSync.objects.filter(docente=docente, id__gt=since)
+        .order_by('id')
+        .values_list('id', 'modelo', 'objeto_id', 'operacion')[:limite + 1]
+    )
+    hay_mas = len(entradas) > limite
+    entradas = entradas[:limite]
+
+    # Colapsar varias operaciones sobre el mismo objeto: gana la última
+    estado = {}
+    for _, nombre, objeto_id, operacion in entradas:
+        creado, _ = estado.get((nombre, objeto_id), (False, None))
+        estado[(nombre, objeto_id)] = (creado or operacion == CambioSync.Operacion.CREADO, operacion)
+
+    pases = {
+        objeto_id: creado for (nombre, objeto_id), (creado, _) in estado.items() if nombre == PASE_DE_LISTA
+    }
+    resultado = {}
+    for modelo, (nombre, serializer_class) in MODELOS_SYNC.items():
+        vivos = {}
+        eliminados = []
+        for (n, objeto_id), (creado, operacion) in estado.items():
+            if n != nombre:
+                continue
+            if operacion == CambioSync.Operacion.ELIMINADO:
+                eliminados.append(objeto_id)
+            else:
+                vivos[objeto_id] = creado
+        creados, actualizados = [], []
+        if vivos:
+            for obj in modelo.objects.filter(pk__in=list(vivos)):
+                (creados if vivos.pop(obj.pk) else actualizados).append(obj)
+            # Lo que ya no existe se borró en cascada desde un padre
+            eliminados.extend(vivos)
+        if modelo is AsistenciaEstudiante and pases:
+            incluidas = {a.pk for a in creados + actualizados}
+            for asistencia in _asistencias_de_pases(list(pases)):
+                if asistencia.pk not in incluidas:
+                    incluidas.add(asistencia.pk)
+                    (creados if pases[asistencia.sesion_clase_id] else actualizados).append(asistencia)
+            eliminados = [pk for pk in eliminados if pk not in incluidas]
+        resultado[nombre] = {
+            'creados': serializer_class(creados, many=True).data,
+            'actualizados': serializer_class(actualizados, many=True).data,
+            'eliminados': eliminados,
+        }
+    return {
+        'cursor': entradas[-1][0] if entradas else since,
+        'hayMas': hay_mas,
+        'cambios': resultado,
+    }
@@ -0,0 +1,167 @@
+import random
+from datetime import time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from .models import (
+    Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, HorarioClase, CambioSync,
+)
+from .stats import reconstruir_estadisticas
+from . import sync
+
+# Datos sintéticos para pruebas de carga y benchmarks (comando `generar_datos_sinteticos`).
+# Las filas se insertan con bulk_create por lotes; como bulk_create no emite señales, al final
+# se registran los cambios de sync y se reconstruyen las estadísticas de los grupos creados.
+
+LOTE_GENERACION = 1000
+PASSWORD_SINTETICO = 'unitrack-bench'
+
+NOMBRES = [
+    'Ana', 'Luis', 'María', 'José', 'Sofía', 'Diego', 'Valeria', 'Carlos', 'Fernanda', 'Jorge',
+    'Daniela', 'Miguel', 'Camila', 'Andrés', 'Regina', 'Emilio', 'Ximena', 'Ricardo', 'Paola', 'Iñaki',
+]
+APELLIDOS = [
+    'García', 'Hernández', 'López', 'Martínez', 'González', 'Pérez', 'Rodríguez', 'Sánchez', 'Ramírez', 'Cruz',
+    'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres', 'Díaz', 'Ruiz', 'Núñez',
+]
+MATERIAS = [
+    ('Cálculo Diferencial', 'MAT'), ('Álgebra Lineal', 'MAT'), ('Programación I', 'INF'), ('Bases de Datos', 'INF'),
+    ('Física Clásica', 'FIS'), ('Química General', 'QUI'), ('Historia de México', 'HIS'), ('Estadística', 'MAT'),
+    ('Redes de Computadoras', 'INF'), ('Ética Profesional', 'HUM'),
+]
+# Distribución aproximada de estados de asistencia
+PESOS_STATUS = [
+    (AsistenciaEstudiante.AttendanceStatus.PRESENTE, 80),
+    (AsistenciaEstudiante.AttendanceStatus.AUSENTE, 10),
+    (AsistenciaEstudiante.AttendanceStatus.TARDE, 6),
+    (AsistenciaEstudiante.AttendanceStatus.JUSTIFICADO, 4),
+]
+
+
+def _insertar(modelo, objetos):
+    for inicio in range(0, len(objetos), LOTE_GENERACION):
+        modelo.objects.bulk_create(objetos[inicio:inicio + LOTE_GENERACION])
+    return objetos
+
+
+def generar_datos(docentes=1, materias=3, grupos=2, estudiantes=30, sesiones=20, semilla=None, prefijo='sintetico'):
+    """
+    Crea `docentes` usuarios, cada uno con `materias` materias de `grupos` grupos, y en cada grupo
+    `estudiantes` alumnos inscritos, dos clases semanales en su horario y `sesiones` sesiones
+    semanales con asistencia de todos.
+    Con `semilla` el contenido es reproducible; los identificadores siempre son nuevos.
+    Devuelve los docentes creados y el número de filas por modelo.
+    """
+    rng = random.Random(semilla)
+    lote = get_random_string(6, 'abcdefghijklmnopqrstuvwxyz0123456789')
+    estados = [s for s, _ in PESOS_STATUS]
+    pesos = [p for _, p in PESOS_STATUS]
+    inicio = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(weeks=sesiones)
+    password = make_password(PASSWORD_SINTETICO)
+
+    with transaction.atomic():
+        _insertar(User, [
+            User(username=f'{prefijo}-{lote}-{d}', email=f'{prefijo}-{lote}-{d}@unitrack.test', password=password)
+            for d in range(docentes)
+        ])
+        # bulk_create no devuelve pk en todos los backends para AutoField; se releen
+        usuarios = list(User.objects.filter(username__startswith=f'{prefijo}-{lote}-').order_by('id'))
+
+        lista_materias = []
+        for usuario in usuarios:
+            for m in range(materias):
+                nombre, clave = rng.choice(MATERIAS)
+                lista_materias.append(Materia(docente=usuario, nombre=nombre, codigo=f'{clave}{100 + m}'))
+        _insertar(Materia, lista_materias)
+        lista_grupos = _insertar(Grupo, [
+            Grupo(materia=materia, docente_id=materia.docente_id, nombre=f'Grupo {chr(65 + g % 26)}{g // 26 or ""}',
+                  sesiones_creadas=sesiones)
+            for materia in lista_materias
+            for g in range(grupos)
+        ])
+
+        alumnos_por_grupo = {}
+        lista_estudiantes = []
+        for grupo in lista_grupos:
+            alumnos = [
+                Estudiante(
+                    nombre_completo=f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}',
+                    matricula=f'{lote}{len(lista_estudiantes) + e:07d}',
+                )
+                for e in range(estudiantes)
+            ]
+            alumnos_por_grupo[grupo.pk] = alumnos
+            lista_estudiantes.extend(alumnos)
+        _insertar(Estudiante, lista_estudiantes)
+        lista_inscripciones = _insertar(InscripcionEstudianteGrupo, [
+            InscripcionEstudianteGrupo(grupo=grupo, estudiante=alumno)
+            for grupo in lista_grupos
+            for alumno in alumnos_por_grupo[grupo.pk]
+        ])
+
+        lista_horarios = []
+        for grupo in lista_grupos:
+            hora = rng.randint(7, 19)
+            for dia in rng.sample(range(5), 2):
+                lista_horarios.append(HorarioClase(
+                    grupo=grupo, docente_id=grupo.docente_id, dia_semana=dia,
+                    hora_inicio=time(hora), hora_fin=time(hora + 1, 30),
+                ))
+        _insertar(HorarioClase, lista_horarios)
+
+        lista_sesiones = _insertar(SesionClase, [
+            SesionClase(
+                grupo=grupo, docente_id=grupo.docente_id, nombre=f'Sesión {s + 1}',
+                fecha=inicio + timedelta(weeks=s, hours=rng.randint(7, 19)),
+            )
+            for grupo in lista_grupos
+            for s in range(sesiones)
+        ])
+
+        # Las asistencias se generan e insertan por lotes para no tenerlas todas en memoria
+        total_asistencias = 0
+        asistencias = []
+        for sesion in lista_sesiones:
+            alumnos = alumnos_por_grupo[sesion.grupo_id]
+            for alumno, status in zip(alumnos, rng.choices(estados, pesos, k=len(alumnos))):
+                asistencias.append(AsistenciaEstudiante(
+                    sesion_clase_id=sesion.pk, estudiante_id=alumno.pk, docente_id=sesion.docente_id, status=status,
+                ))
+            if len(asistencias) >= LOTE_GENERACION:
+                _registrar_sync(AsistenciaEstudiante, _insertar(AsistenciaEstudiante, asistencias))
+                total_asistencias += len(asistencias)
+                asistencias = []
+        _registrar_sync(AsistenciaEstudiante, _insertar(AsistenciaEstudiante, asistencias))
+        total_asistencias += len(asistencias)
+
+        for modelo, objetos in (
+            (Materia, lista_materias), (Grupo, lista_grupos), (InscripcionEstudianteGrupo, lista_inscripciones),
+            (SesionClase, lista_sesiones), (HorarioClase, lista_horarios),
+        ):
+            _registrar_sync(modelo, objetos)
+        _registrar_sync(Estudiante, lista_inscripciones, campo='estudiante_id')
+
+        reconstruir_estadisticas([g.pk for g in lista_grupos])
+
+    return usuarios, {
+        'docentes': len(usuarios),
+        'materias': len(lista_materias),
+        'grupos': len(lista_grupos),
+        'estudiantes': len(lista_estudiantes),
+        'sesiones': len(lista_sesiones),
+        'horarios': len(lista_horarios),
+        'asistencias': total_asistencias,
+    }
+
+
+def _registrar_sync(modelo, objetos, campo='pk'):
+    # Agrupa por docente: un INSERT del registro por docente y lote
+    por_docente = {}
+    for objeto in objetos:
+        docente_id = objeto.docente_id if hasattr(objeto, 'docente_id') else objeto.grupo.docente_id
+        por_docente.setdefault(docente_id, []).append(getattr(objeto, campo))
+    for docente_id, pks in por_docente.items():
+        for inicio in range(0, len(pks), LOTE_GENERACION):
+            sync.registrar(modelo, pks[inicio:inicio + LOTE_GENERACION], CambioSync.Operacion.CREADO, [docente_id])
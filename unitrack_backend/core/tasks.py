@@ -0,0 +1,165 @@
+import logging
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+from urllib.parse import urljoin
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from .models import Tarea
+from .stats import reconstruir_estadisticas
+from .purga import purgar, LOTES_POR_TAREA
+
+# Cola de trabajos en segundo plano guardada en la base de datos (modelo Tarea).
+# Las funciones se registran con @tarea y se encolan con encolar(); el comando
+# `ejecutar_tareas` las toma y ejecuta. Encolar dentro de una transacción es atómico con
+# ella: si se revierte, la tarea tampoco existe. Un worker reclama cada tarea con un UPDATE
+# condicional sobre (estado, intentos), así que varios workers pueden correr a la vez sin
+# ejecutar dos veces la misma. Los fallos se reintentan con espera exponencial.
+
+logger = logging.getLogger(__name__)
+
+REGISTRO = {}
+LOTE_TAREAS = 20
+
+
+def tarea(nombre=None, max_intentos=5, transaccional=True):
+    """
+    Registra la función como tarea; sus argumentos deben ser serializables a JSON.
+    Con transaccional=False no se envuelve en una transacción y la función confirma su propio
+    trabajo por partes; un reintento debe poder retomarlo donde quedó.
+    """
+    def decorador(funcion):
+        funcion.nombre_tarea = nombre or funcion.__name__
+        funcion.max_intentos = max_intentos
+        funcion.transaccional = transaccional
+        REGISTRO[funcion.nombre_tarea] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(funcion, retraso=0, **argumentos):
+    """ Encola la tarea (función registrada o su nombre) para ejecutarse en `retraso` segundos. """
+    nombre = funcion if isinstance(funcion, str) else funcion.nombre_tarea
+    if nombre not in REGISTRO:
+        raise ValueError(f'Tarea no registrada: {nombre}')
+    return Tarea.objects.create(
+        nombre=nombre, argumentos=argumentos, max_intentos=REGISTRO[nombre].max_intentos,
+        ejecutar_despues=timezone.now() + timedelta(seconds=retraso),
+    )
+
+
+def espera_reintento(intentos):
+    """ Segundos antes del siguiente intento: base * 2^(intentos - 1), con tope. """
+    return min(settings.TAREAS_ESPERA_BASE * 2 ** (intentos - 1), settings.TAREAS_ESPERA_MAXIMA)
+
+
+def reclamar(limite=LOTE_TAREAS):
+    """ Toma hasta `limite` tareas listas (o abandonadas por un worker caído) para este worker. """
+    ahora = timezone.now()
+    disponibles = Tarea.objects.filter(
+        Q(estado=Tarea.Estado.PENDIENTE, ejecutar_despues__lte=ahora)
+        | Q(estado=Tarea.Estado.EN_CURSO, bloqueada_hasta__lt=ahora)
+    ).order_by('ejecutar_despues', 'id').values_list('id', 'estado', 'intentos')[:limite]
+    reclamadas = []
+    for pk, estado, intentos in disponibles:
+        # Si otro worker la tomó primero el filtro ya no coincide y se salta
+        if Tarea.objects.filter(pk=pk, estado=estado, intentos=intentos).update(
+            estado=Tarea.Estado.EN_CURSO, intentos=intentos + 1,
+            bloqueada_hasta=ahora + timedelta(seconds=settings.TAREAS_BLOQUEO),
+        ):
+            reclamadas.append(pk)
+    return list(Tarea.objects.filter(pk__in=reclamadas).order_by('ejecutar_despues', 'id'))
+
+
+def ejecutar(tarea):
+    """ Ejecuta una tarea reclamada. Devuelve True si terminó bien. """
+    funcion = REGISTRO.get(tarea.nombre)
+    try:
+        if funcion is None:
+            raise LookupError(f'Tarea no registrada: {tarea.nombre}')
+        with transaction.atomic() if funcion.transaccional else nullcontext():
+            funcion(**tarea.argumentos)
+    except Exception as error:
+        pendientes = Tarea.objects.filter(pk=tarea.pk)
+        if tarea.intentos >= tarea.max_intentos:
+            logger.error('Tarea %s (%s) fallida tras %s intentos: %s', tarea.pk, tarea.nombre, tarea.intentos, error)
+            pendientes.update(estado=Tarea.Estado.FALLIDA, bloqueada_hasta=None, ultimo_error=traceback.format_exc())
+        else:
+            espera = espera_reintento(tarea.intentos)
+            logger.warning('Tarea %s (%s) falló, reintento en %ss: %s', tarea.pk, tarea.nombre, espera, error)
+            pendientes.update(
+                estado=Tarea.Estado.PENDIENTE, bloqueada_hasta=None, ultimo_error=traceback.format_exc(),
+                ejecutar_despues=timezone.now() + timedelta(seconds=espera),
+            )
+        return False
+    Tarea.objects.filter(pk=tarea.pk).delete()
+    return True
+
+
+def ejecutar_pendientes(limite=None):
+    """ Ejecuta las tareas listas hasta vaciar la cola (o `limite`). Devuelve (exitosas, fallidas). """
+    exitosas = fallidas = 0
+    while limite is None or exitosas + fallidas < limite:
+        lote = reclamar(LOTE_TAREAS if limite is None else min(LOTE_TAREAS, limite - exitosas - fallidas))
+        if not lote:
+            break
+        for t in lote:
+            if ejecutar(t):
+                exitosas += 1
+            else:
+                fallidas += 1
+    return exitosas, fallidas
+
+
+# Tareas del proyecto
+
+@tarea()
+def enviar_correo(asunto, mensaje, destinatarios, remitente=None):
+    send_mail(asunto, mensaje, remitente or settings.DEFAULT_FROM_EMAIL, destinatarios, fail_silently=False)
+
+
+@tarea()
+def enviar_recuperacion(usuario_id, base_url):
+    # El token se genera aquí y no en la vista: los argumentos de la tarea se guardan en la base
+    # (y se conservan en las tareas fallidas), así que no deben llevar un enlace válido
+    usuario = User.objects.filter(pk=usuario_id).first()
+    if usuario is None:
+        return
+    token = default_token_generator.make_token(usuario)
+    reset_url = urljoin(base_url, reverse('password_reset_confirm', args=[usuario.pk, token]))
+    send_mail(
+        'Recuperar contraseña', f'Usa este enlace para restablecer tu contraseña: {reset_url}',
+        settings.DEFAULT_FROM_EMAIL, [usuario.email], fail_silently=False,
+    )
+
+
+@tarea()
+def reconstruir_estadisticas_grupos(grupos=None):
+    reconstruir_estadisticas(grupos)
+
+
+@tarea()
+def calcular_riesgo(docentes=None):
+    # NumPy solo se importa en el worker que ejecuta el cálculo
+    from .riesgo import actualizar
+    actualizar(docentes)
+
+
+@tarea(transaccional=False)
+def purgar_eliminados(borradas=None):
+    # Cada lote confirma su DELETE: una sola transacción retendría los bloqueos de todos los
+    # lotes. Trabajo acotado por ejecución; el avance acumulado viaja en los argumentos de la siguiente
+    lote, terminado = purgar(max_lotes=LOTES_POR_TAREA)
+    borradas = dict(borradas or {})
+    for modelo, n in lote.items():
+        borradas[modelo] = borradas.get(modelo, 0) + n
+    if terminado:
+        logger.info('Purga de eliminados terminada: %s', borradas)
+    else:
+        encolar(purgar_eliminados, borradas=borradas)
@@ -1,3 +1,1540 @@
-from django.test import TestCase
+import csv
+import json
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import (
+    Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante, AsistenciaEmpaquetada,
+    EstadisticaGrupo, HorarioClase, Tarea, RiesgoEstudiante, SesionArchivada, CambioSync,
+)
+from .stats import reconstruir_estadisticas
+from .sync import cursor_actual
+from . import authentication, benchmark, busqueda, cache, fastpath, horarios, metrics, packing, purga, replicas, riesgo, tasks
 
 # Create your tests here.
+
+_contador_matricula = 0
+
+
+def crear_arbol(docente, materias=1, grupos=1, estudiantes=1, sesiones=1):
+    """ Crea un árbol de datos de prueba para el docente con el tamaño indicado. """
+    global _contador_matricula
+    for m in range(materias):
+        materia = Materia.objects.create(docente=docente, nombre=f'Materia {m}', codigo=f'M{m}')
+        for g in range(grupos):
+            grupo = Grupo.objects.create(materia=materia, nombre=f'Grupo {g}')
+            alumnos = []
+            for _ in range(estudiantes):
+                _contador_matricula += 1
+                alumno = Estudiante.objects.create(
+                    nombre_completo=f'Alumno {_contador_matricula}',
+                    matricula=f'A{_contador_matricula:06d}',
+                )
+                InscripcionEstudianteGrupo.objects.create(estudiante=alumno, grupo=grupo)
+                alumnos.append(alumno)
+            for _ in range(sesiones):
+                sesion = SesionClase.objects.create(grupo=grupo, fecha=timezone.now())
+                AsistenciaEstudiante.objects.bulk_create([
+                    AsistenciaEstudiante(
+                        sesion_clase=sesion, estudiante=alumno,
+                        status=AsistenciaEstudiante.AttendanceStatus.PRESENTE,
+                    )
+                    for alumno in alumnos
+                ])
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.backend().clear()
+        cache.reiniciar_estadisticas()
+        self.docente = User.objects.create_user('docente', 'docente@unitrack.com', 'secreto123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.docente)
+
+
+class TreeLoaderQueryCountTests(ApiTestCase):
+    # Los conteos incluyen el query de versión del docente (ETag)
+    def assertQueriesConstantes(self, url, queries):
+        crear_arbol(self.docente, materias=1, grupos=1, estudiantes=1, sesiones=1)
+        with self.assertNumQueries(queries):
+            pequeno = self.client.get(url)
+        crear_arbol(self.docente, materias=2, grupos=3, estudiantes=5, sesiones=4)
+        with self.assertNumQueries(queries):
+            grande = self.client.get(url)
+        self.assertEqual(pequeno.status_code, 200)
+        self.assertGreater(len(grande.content), len(pequeno.content))
+        return grande.json()
+
+    def test_materias_query_count_fijo(self):
+        data = self.assertQueriesConstantes('/api/materias/', 7)
+        self.assertEqual(len(data), 3)
+        grupo = next(g for m in data for g in m['grupos'] if len(g['estudiantes']) == 5)
+        self.assertEqual(len(grupo['sesiones']), 4)
+        self.assertEqual(len(grupo['sesiones'][0]['asistencias']), 5)
+        ids = {e['id'] for e in grupo['estudiantes']}
+        self.assertTrue(all(a['studentId'] in ids for a in grupo['sesiones'][0]['asistencias']))
+
+    def test_grupos_query_count_fijo(self):
+        self.assertQueriesConstantes('/api/grupos/', 6)
+
+    def test_sesiones_query_count_fijo(self):
+        self.assertQueriesConstantes('/api/sesiones/', 4)
+
+    def test_arbol_limitado_al_docente(self):
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        crear_arbol(otro, materias=2)
+        crear_arbol(self.docente, materias=1)
+        data = self.client.get('/api/materias/').json()
+        self.assertEqual([m['nombre'] for m in data], ['Materia 0'])
+
+
+class SesionClaseCreateTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=60, sesiones=0)
+        self.grupo = Grupo.objects.get()
+        self.alumnos = list(Estudiante.objects.values_list('id', flat=True))
+
+    def payload(self, alumnos, status='Presente'):
+        return {
+            'grupo': str(self.grupo.id),
+            'fecha': timezone.now().isoformat(),
+            'asistencias': [{'studentId': str(a), 'status': status} for a in alumnos],
+        }
+
+    def test_query_count_independiente_del_tamano(self):
+        with CaptureQueriesContext(connection) as pocos:
+            res = self.client.post('/api/sesiones/', self.payload(self.alumnos[:5]), format='json')
+        self.assertEqual(res.status_code, 201)
+        with CaptureQueriesContext(connection) as muchos:
+            res = self.client.post('/api/sesiones/', self.payload(self.alumnos), format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(len(res.json()['asistencias']), 60)
+        self.assertEqual(len(pocos), len(muchos))
+
+    def test_estudiante_no_inscrito_no_registra_nada(self):
+        externo = Estudiante.objects.create(nombre_completo='Externo', matricula='X1')
+        res = self.client.post('/api/sesiones/', self.payload(self.alumnos + [externo.id]), format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('60', res.json()['asistencias'])
+        self.assertFalse(SesionClase.objects.exists())
+        self.assertFalse(AsistenciaEstudiante.objects.exists())
+
+    def test_estado_invalido(self):
+        res = self.client.post('/api/sesiones/', self.payload(self.alumnos, status='Dormido'), format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(SesionClase.objects.exists())
+
+
+class SesionClaseUpdateTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=60, sesiones=1)
+        reconstruir_estadisticas()  # crear_arbol usa bulk_create, sin señales
+        self.sesion = SesionClase.objects.get()
+        self.url = f'/api/sesiones/{self.sesion.pk}/'
+        self.alumnos = list(self.sesion.grupo.inscripciones.order_by('indice').values_list('estudiante_id', flat=True))
+
+    def estados(self):
+        return {a.estudiante_id: a.status for a in SesionClase.objects.get().registro_asistencias}
+
+    def corregir(self, alumnos, status='Ausente'):
+        return self.client.patch(self.url, {'asistencias': [{'studentId': str(a), 'status': status} for a in alumnos]}, format='json')
+
+    def test_patch_solo_cambia_los_enviados(self):
+        res = self.corregir(self.alumnos[:2])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(sum(a['status'] == 'Ausente' for a in res.json()['asistencias']), 2)
+        estados = self.estados()
+        self.assertEqual(len(estados), 60)
+        self.assertEqual([estados[a] for a in self.alumnos[:3]], ['Ausente', 'Ausente', 'Presente'])
+        self.assertEqual(reconstruir_estadisticas(verificar=True)['EstadisticaInscripcion'], [])
+        self.assertEqual(EstadisticaGrupo.objects.get().ausentes, 2)
+
+    def test_query_count_independiente_del_numero_de_cambios(self):
+        with CaptureQueriesContext(connection) as dos:
+            self.corregir(self.alumnos[:2])
+        with CaptureQueriesContext(connection) as resto:
+            self.corregir(self.alumnos[2:])
+        self.assertEqual(len(dos), len(resto))
+        with CaptureQueriesContext(connection) as ninguno:
+            self.corregir(self.alumnos)
+        self.assertLess(len(ninguno), len(dos))  # sin diferencias no se escribe nada
+
+    def test_put_reemplaza_y_null_quita(self):
+        sesion = self.client.get(self.url).json()
+        sesion['nombre'] = 'Corregida'
+        sesion['asistencias'] = [{'studentId': str(a), 'status': 'Justificado'} for a in self.alumnos[:10]]
+        res = self.client.put(self.url, sesion, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['nombre'], 'Corregida')
+        self.assertEqual(set(self.estados().values()), {'Justificado'})
+        self.assertEqual(len(self.estados()), 10)
+        self.corregir(self.alumnos[:1], status=None)
+        self.assertNotIn(self.alumnos[0], self.estados())
+        cambios = CambioSync.objects.filter(modelo='asistencias').values_list('operacion', flat=True)
+        self.assertEqual(list(cambios).count(CambioSync.Operacion.ELIMINADO), 51)
+        self.assertEqual(reconstruir_estadisticas(verificar=True), {'EstadisticaSesion': [], 'EstadisticaInscripcion': [], 'EstadisticaGrupo': []})
+
+    def test_sin_asistencias_no_se_tocan(self):
+        res = self.client.patch(self.url, {'nombre': 'Otra'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(self.estados()), 60)
+
+    def test_sesion_empaquetada(self):
+        packing.empaquetar(SesionClase.objects.all())
+        self.corregir(self.alumnos[:2])
+        self.assertFalse(AsistenciaEstudiante.objects.exists())
+        self.assertEqual([self.estados()[a] for a in self.alumnos[:3]], ['Ausente', 'Ausente', 'Presente'])
+        sesion = self.client.get(self.url).json()
+        sesion['asistencias'] = [{'studentId': str(self.alumnos[5]), 'status': 'Tarde'}]
+        self.assertEqual(self.client.put(self.url, sesion, format='json').status_code, 200)
+        self.assertEqual(self.estados(), {self.alumnos[5]: 'Tarde'})
+        self.assertEqual(reconstruir_estadisticas(verificar=True)['EstadisticaGrupo'], [])
+
+    def test_error_no_escribe_nada(self):
+        externo = Estudiante.objects.create(nombre_completo='Externo', matricula='X1')
+        res = self.client.patch(self.url, {'nombre': 'Nueva', 'asistencias': [
+            {'studentId': str(self.alumnos[0]), 'status': 'Ausente'}, {'studentId': str(externo.pk), 'status': 'Ausente'},
+        ]}, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(SesionClase.objects.get().nombre, self.sesion.nombre)
+        self.assertEqual(set(self.estados().values()), {'Presente'})
+
+
+class EstadisticasAsistenciaTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=4, sesiones=0)
+        self.grupo = Grupo.objects.get()
+        self.alumnos = list(Estudiante.objects.order_by('matricula'))
+        res = self.client.post('/api/sesiones/', {
+            'grupo': str(self.grupo.id),
+            'fecha': timezone.now().isoformat(),
+            'asistencias': [
+                {'studentId': str(a.id), 'status': status}
+                for a, status in zip(self.alumnos, ['Presente', 'Presente', 'Tarde', 'Ausente'])
+            ],
+        }, format='json')
+        self.sesion = SesionClase.objects.get(pk=res.json()['id'])
+
+    def assertSinDesviaciones(self):
+        diferencias = reconstruir_estadisticas(verificar=True)
+        self.assertEqual(diferencias, {'EstadisticaSesion': [], 'EstadisticaInscripcion': [], 'EstadisticaGrupo': []})
+
+    def test_contadores_tras_alta_masiva(self):
+        self.assertEqual(self.grupo.estadistica.contadores(), {'Presente': 2, 'Ausente': 1, 'Justificado': 0, 'Tarde': 1})
+        self.assertSinDesviaciones()
+
+    def test_contadores_tras_cambio_y_borrado(self):
+        asistencia = AsistenciaEstudiante.objects.get(estudiante=self.alumnos[3])
+        asistencia.status = AsistenciaEstudiante.AttendanceStatus.JUSTIFICADO
+        asistencia.save()
+        AsistenciaEstudiante.objects.get(estudiante=self.alumnos[0]).delete()
+        self.grupo.estadistica.refresh_from_db()
+        self.assertEqual(self.grupo.estadistica.contadores(), {'Presente': 1, 'Ausente': 0, 'Justificado': 1, 'Tarde': 1})
+        self.assertSinDesviaciones()
+
+    def test_borrar_sesion_descuenta_del_grupo(self):
+        self.sesion.delete()
+        self.assertEqual(EstadisticaGrupo.objects.get().contadores(), {'Presente': 0, 'Ausente': 0, 'Justificado': 0, 'Tarde': 0})
+        self.assertSinDesviaciones()
+
+    def test_summary_sin_leer_asistencias(self):
+        with self.assertNumQueries(4):
+            res = self.client.get(f'/api/grupos/{self.grupo.id}/summary/')
+        data = res.json()
+        self.assertEqual(data['totales']['porcentajeAsistencia'], 75)
+        self.assertEqual(data['sesiones'][0]['total'], 4)
+        ausente = next(e for e in data['estudiantes'] if e['studentId'] == self.alumnos[3].matricula)
+        self.assertEqual(ausente['Ausente'], 1)
+
+    def test_comando_repara_desviaciones(self):
+        AsistenciaEstudiante.objects.update(status=AsistenciaEstudiante.AttendanceStatus.AUSENTE)
+        salida = StringIO()
+        call_command('reconstruir_estadisticas', '--verificar', stdout=salida)
+        self.assertIn('EstadisticaGrupo: 1 con diferencias', salida.getvalue())
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+        self.assertEqual(EstadisticaGrupo.objects.get().contadores()['Ausente'], 4)
+        self.assertSinDesviaciones()
+
+
+class SyncTests(ApiTestCase):
+    def sync(self, since):
+        res = self.client.get('/api/sync/', {'since': since})
+        self.assertEqual(res.status_code, 200)
+        return res.json()
+
+    def test_solo_cambios_posteriores_al_cursor(self):
+        crear_arbol(self.docente, grupos=2, estudiantes=3, sesiones=2)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        grupo = Grupo.objects.first()
+        materia = self.client.post('/api/materias/', {'nombre': 'Física', 'codigo': 'F1'}, format='json').json()
+        self.client.patch(f'/api/grupos/{grupo.id}/', {'nombre': 'Renombrado'}, format='json')
+        data = self.sync(cursor)
+        self.assertGreater(data['cursor'], cursor)
+        self.assertEqual([m['id'] for m in data['cambios']['materias']['creados']], [materia['id']])
+        self.assertEqual(data['cambios']['grupos']['actualizados'][0]['nombre'], 'Renombrado')
+        self.assertEqual(data['cambios']['asistencias']['creados'], [])
+        self.assertEqual(self.sync(data['cursor'])['cambios']['materias']['creados'], [])
+
+    def test_borrado_y_aislamiento_entre_docentes(self):
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        crear_arbol(self.docente)
+        crear_arbol(otro)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        Materia.objects.get(docente=otro).delete()
+        materia = Materia.objects.get(docente=self.docente)
+        self.client.delete(f'/api/materias/{materia.id}/')
+        cambios = self.sync(cursor)['cambios']
+        self.assertEqual(cambios['materias']['eliminados'], [str(materia.id)])
+        self.assertEqual(cambios['grupos']['eliminados'], [])
+
+    def test_asistencias_de_nueva_sesion(self):
+        crear_arbol(self.docente, estudiantes=3, sesiones=0)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        grupo = Grupo.objects.get()
+        self.client.post('/api/sesiones/', {
+            'grupo': str(grupo.id),
+            'fecha': timezone.now().isoformat(),
+            'asistencias': [{'studentId': str(e.id), 'status': 'Presente'} for e in Estudiante.objects.all()],
+        }, format='json')
+        cambios = self.sync(cursor)['cambios']
+        self.assertEqual(len(cambios['sesiones']['creados']), 1)
+        self.assertEqual(len(cambios['asistencias']['creados']), 3)
+
+    def test_costo_independiente_del_historial(self):
+        crear_arbol(self.docente, grupos=3, estudiantes=10, sesiones=5)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        Materia.objects.create(docente=self.docente, nombre='Nueva', codigo='N1')
+        with self.assertNumQueries(2):
+            data = self.sync(cursor)
+        self.assertEqual(len(data['cambios']['materias']['creados']), 1)
+
+
+class ConditionalGetTests(ApiTestCase):
+    def test_304_sin_ejecutar_queryset(self):
+        crear_arbol(self.docente, grupos=2, estudiantes=3, sesiones=2)
+        res = self.client.get('/api/materias/')
+        etag = res['ETag']
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/materias/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_escritura_cambia_el_etag(self):
+        crear_arbol(self.docente)
+        grupo = Grupo.objects.get()
+        etag = self.client.get(f'/api/grupos/{grupo.id}/')['ETag']
+        self.client.patch(f'/api/grupos/{grupo.id}/', {'nombre': 'Otro'}, format='json')
+        res = self.client.get(f'/api/grupos/{grupo.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.json()['nombre'], 'Otro')
+
+    def test_etag_distinto_por_docente_y_url(self):
+        crear_arbol(self.docente)
+        etag = self.client.get('/api/materias/')['ETag']
+        self.assertNotEqual(self.client.get('/api/sesiones/')['ETag'], etag)
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        self.client.force_authenticate(otro)
+        self.assertEqual(self.client.get('/api/materias/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ArbolCacheTests(ApiTestCase):
+    def test_hit_tras_primera_carga(self):
+        crear_arbol(self.docente, grupos=2, estudiantes=3, sesiones=2)
+        primera = self.client.get('/api/materias/')
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):
+            segunda = self.client.get('/api/materias/')
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(segunda.content, primera.content)
+
+    def test_invalida_solo_al_docente_afectado(self):
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        crear_arbol(self.docente)
+        crear_arbol(otro)
+        cliente_otro = APIClient()
+        cliente_otro.force_authenticate(otro)
+        self.client.get('/api/materias/')
+        cliente_otro.get('/api/materias/')
+        Materia.objects.create(docente=self.docente, nombre='Nueva', codigo='N1')
+        res = self.client.get('/api/materias/')
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.json()), 2)
+        self.assertEqual(cliente_otro.get('/api/materias/')['X-Cache'], 'HIT')
+        self.assertEqual(cache.estadisticas()['hits'], 1)
+
+
+class ExpansionTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, grupos=2, estudiantes=3, sesiones=2)
+
+    def test_solo_campos_pedidos_sin_precargar_relaciones(self):
+        # versión + materias
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/materias/', {'fields': 'id,nombre,codigo'}).json()
+        self.assertEqual(set(data[0]), {'id', 'nombre', 'codigo'})
+
+    def test_expand_limita_la_profundidad(self):
+        # versión + materias + grupos + sesiones
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/materias/', {'expand': 'grupos.sesiones'}).json()
+        grupo = data[0]['grupos'][0]
+        self.assertNotIn('estudiantes', grupo)
+        self.assertEqual(set(grupo['sesiones'][0]), {'id', 'fecha', 'nombre', 'grupo'})
+
+    def test_campos_anidados(self):
+        data = self.client.get('/api/materias/', {'fields': 'nombre,grupos.nombre'}).json()
+        self.assertEqual(set(data[0]), {'nombre', 'grupos'})
+        self.assertEqual(sorted(data[0]['grupos'], key=lambda g: g['nombre']), [{'nombre': 'Grupo 0'}, {'nombre': 'Grupo 1'}])
+
+    def test_campos_anidados_de_estudiantes_y_asistencias(self):
+        grupo = self.client.get('/api/grupos/', {'fields': 'id,estudiantes.id'}).json()[0]
+        self.assertEqual(set(grupo), {'id', 'estudiantes'})
+        self.assertEqual({tuple(e) for e in grupo['estudiantes']}, {('id',)})
+        materia = self.client.get('/api/materias/', {'fields': 'grupos.estudiantes.nombre'}).json()[0]
+        self.assertEqual({tuple(e) for g in materia['grupos'] for e in g['estudiantes']}, {('nombre',)})
+        sesion = self.client.get('/api/sesiones/', {'fields': 'id,asistencias.status'}).json()[0]
+        self.assertEqual(set(sesion), {'id', 'asistencias'})
+        self.assertEqual([set(a) for a in sesion['asistencias']], [{'status'}] * 3)
+
+    def test_sin_parametros_arbol_completo(self):
+        grupo = self.client.get('/api/grupos/').json()[0]
+        self.assertEqual(set(grupo), {'id', 'nombre', 'materia', 'estudiantes', 'sesiones'})
+        self.assertEqual(len(grupo['sesiones'][0]['asistencias']), 3)
+
+
+class RosterImportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=2, sesiones=0)
+        self.grupo = Grupo.objects.get()
+        self.url = f'/api/grupos/{self.grupo.id}/roster/'
+
+    def test_csv_por_lotes_con_reporte(self):
+        existente = Estudiante.objects.create(nombre_completo='Ya Existe', matricula='E100')
+        lineas = ['nombre,matricula', 'Ya Existe,E100', ',SINNOMBRE'] + [f'Alumno {i},N{i}' for i in range(30)] + ['Repetido,N1']
+        archivo = SimpleUploadedFile('lista.csv', '\n'.join(lineas).encode(), content_type='text/csv')
+        with mock.patch('core.roster.LOTE_IMPORTACION', 7):
+            res = self.client.post(self.url, {'archivo': archivo}, format='multipart')
+        data = res.json()
+        self.assertEqual((data['creados'], data['reutilizados'], data['invalidos'], data['inscritos']), (30, 1, 2, 31))
+        self.assertEqual(data['filas'][0], {'fila': 1, 'matricula': 'E100', 'id': str(existente.id), 'resultado': 'reutilizado', 'inscrito': True})
+        self.assertEqual(data['filas'][1]['error'], 'Nombre requerido.')
+        self.assertEqual(self.grupo.inscripciones.count(), 33)
+
+    def test_json_reimportado_no_duplica(self):
+        estudiantes = [{'nombre': f'Alumno {i}', 'studentId': f'J{i}'} for i in range(5)]
+        self.client.post(self.url, estudiantes, format='json')
+        with CaptureQueriesContext(connection) as pocos:
+            res = self.client.post(self.url, {'estudiantes': estudiantes}, format='json')
+        self.assertEqual((res.json()['reutilizados'], res.json()['inscritos']), (5, 0))
+        self.assertEqual(Estudiante.objects.filter(matricula__startswith='J').count(), 5)
+        muchos = [{'nombre': f'Alumno {i}', 'studentId': f'K{i}'} for i in range(200)]
+        self.client.post(self.url, muchos, format='json')
+        with CaptureQueriesContext(connection) as varios:
+            self.client.post(self.url, muchos, format='json')
+        self.assertEqual(len(pocos), len(varios))
+
+    def test_formato_no_soportado(self):
+        archivo = SimpleUploadedFile('lista.txt', b'hola', content_type='text/plain')
+        res = self.client.post(self.url, {'archivo': archivo}, format='multipart')
+        self.assertEqual(res.status_code, 400)
+
+
+class ExportacionTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, grupos=2, estudiantes=5, sesiones=3)
+        self.grupo = Grupo.objects.order_by('nombre').first()
+        asistencia = AsistenciaEstudiante.objects.filter(sesion_clase__grupo=self.grupo).first()
+        asistencia.status = AsistenciaEstudiante.AttendanceStatus.AUSENTE
+        asistencia.save()
+        self.asistencia = asistencia
+
+    def descargar(self, url, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200)
+        return b''.join(res.streaming_content)
+
+    def test_csv_de_grupo_por_lotes(self):
+        with mock.patch('core.exports.CHUNK_EXPORTACION', 2):
+            contenido = self.descargar(f'/api/grupos/{self.grupo.id}/export/').decode('utf-8-sig')
+        filas = list(csv.reader(StringIO(contenido)))
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(len(filas[0]), 5)
+        fila = next(f for f in filas if f[0] == self.asistencia.estudiante.matricula)
+        self.assertEqual(fila.count('Ausente'), 1)
+        self.assertEqual(fila.count('Presente'), 2)
+
+    def test_xlsx_de_materia_una_hoja_por_grupo(self):
+        materia = self.grupo.materia
+        contenido = self.descargar(f'/api/materias/{materia.id}/export/', formato='xlsx')
+        with zipfile.ZipFile(BytesIO(contenido)) as libro:
+            self.assertIsNone(libro.testzip())
+            self.assertIn('name="Grupo 1"', libro.read('xl/workbook.xml').decode())
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row '), 6)
+        self.assertIn('Ausente', hoja)
+
+    def test_formato_invalido(self):
+        res = self.client.get(f'/api/grupos/{self.grupo.id}/export/', {'formato': 'pdf'})
+        self.assertEqual(res.status_code, 400)
+
+
+class NumeracionSesionesTests(ApiTestCase):
+    def test_numeracion_sin_count(self):
+        crear_arbol(self.docente, sesiones=2)
+        grupo = Grupo.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            sesion = SesionClase.objects.create(grupo=grupo, fecha=timezone.now())
+        self.assertEqual(sesion.nombre, 'Sesión 3')
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries))
+
+    def test_borrar_no_repite_numeros(self):
+        crear_arbol(self.docente, sesiones=2)
+        grupo = Grupo.objects.get()
+        SesionClase.objects.filter(nombre='Sesión 1').delete()
+        self.assertEqual(SesionClase.objects.create(grupo=grupo, fecha=timezone.now()).nombre, 'Sesión 3')
+
+    def test_guardar_grupo_desactualizado_no_pisa_el_contador(self):
+        crear_arbol(self.docente, sesiones=2)
+        desactualizado = Grupo.objects.get()
+        SesionClase.objects.create(grupo=desactualizado, fecha=timezone.now())
+        desactualizado.nombre = 'Renombrado'
+        desactualizado.save()
+        res = self.client.patch(f'/api/grupos/{desactualizado.id}/', {'nombre': 'Otra vez'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(SesionClase.objects.create(grupo=desactualizado, fecha=timezone.now()).nombre, 'Sesión 4')
+        self.assertEqual(Grupo.objects.get().nombre, 'Otra vez')
+
+
+class LecturaRapidaTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, materias=2, grupos=2, estudiantes=3, sesiones=2)
+        grupo = Grupo.objects.filter(materia__docente=self.docente).first()
+        alumno = Estudiante.objects.create(nombre_completo='Íñigo Núñez "Peña"', matricula='Ñ-001')
+        InscripcionEstudianteGrupo.objects.create(estudiante=alumno, grupo=grupo)
+        Materia.objects.create(docente=self.docente, nombre='Sin grupos', codigo='VACIA')
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        crear_arbol(otro, materias=1, grupos=1, estudiantes=1, sesiones=1)
+
+    def obtener(self, url, rapida):
+        cache.backend().clear()
+        with self.settings(LECTURA_RAPIDA=rapida):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_salida_identica_byte_a_byte(self):
+        for url in ('/api/materias/', '/api/sesiones/'):
+            with self.subTest(url=url):
+                normal = self.obtener(url, False)
+                rapida = self.obtener(url, True)
+                self.assertEqual(rapida['Content-Type'], normal['Content-Type'])
+                self.assertEqual(rapida.content, normal.content)
+
+    def test_separadores_de_linea_escapados_como_drf(self):
+        Materia.objects.create(docente=self.docente, nombre='Línea\u2028nueva', codigo='L\u2029S')
+        normal = self.obtener('/api/materias/', False)
+        self.assertIn(b'\\u2028', normal.content)
+        self.assertEqual(self.obtener('/api/materias/', True).content, normal.content)
+        with mock.patch.object(fastpath, 'orjson', None):
+            self.assertEqual(self.obtener('/api/materias/', True).content, normal.content)
+
+    def test_indent_usa_drf(self):
+        for rapida in (False, True):
+            cache.backend().clear()
+            with self.settings(LECTURA_RAPIDA=rapida):
+                response = self.client.get('/api/sesiones/', HTTP_ACCEPT='application/json; indent=2')
+            self.assertTrue(response.content.startswith(b'[\n  {'), rapida)
+
+    def test_sin_orjson_se_usa_json(self):
+        normal = self.obtener('/api/materias/', False)
+        with mock.patch.object(fastpath, 'orjson', None):
+            rapida = self.obtener('/api/materias/', True)
+        self.assertEqual(rapida.content, normal.content)
+
+    def test_queries_constantes(self):
+        # versión del docente + materias, grupos, inscripciones, sesiones, asistencias y empaquetadas
+        with self.assertNumQueries(7):
+            self.obtener('/api/materias/', True)
+        crear_arbol(self.docente, materias=2, grupos=3, estudiantes=4, sesiones=3)
+        with self.assertNumQueries(7):
+            self.obtener('/api/materias/', True)
+        with self.assertNumQueries(4):
+            self.obtener('/api/sesiones/', True)
+
+    def test_fields_y_expand_usan_el_serializador(self):
+        normal = self.obtener('/api/materias/?expand=grupos&fields=id,grupos.id', False)
+        rapida = self.obtener('/api/materias/?expand=grupos&fields=id,grupos.id', True)
+        self.assertEqual(rapida.content, normal.content)
+        self.assertEqual(set(rapida.json()[0]), {'id', 'grupos'})
+
+    def test_cache_guarda_la_respuesta_rapida(self):
+        with self.settings(LECTURA_RAPIDA=True):
+            primera = self.client.get('/api/materias/')
+            segunda = self.client.get('/api/materias/')
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(primera.content, segunda.content)
+
+
+class DocenteDenormalizadoTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, materias=1, grupos=1, estudiantes=2, sesiones=2)
+        self.otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        self.grupo = Grupo.objects.get(materia__docente=self.docente)
+
+    def test_filas_nuevas_copian_el_docente(self):
+        # crear_arbol usa save() para grupos y sesiones y bulk_create para asistencias
+        self.assertEqual(self.grupo.docente_id, self.docente.pk)
+        self.assertFalse(SesionClase.objects.exclude(docente=self.docente).exists())
+        self.assertEqual(AsistenciaEstudiante.objects.filter(docente=self.docente).count(), 4)
+
+    def test_mover_grupo_actualiza_sesiones_y_asistencias(self):
+        destino = Materia.objects.create(docente=self.otro, nombre='Destino', codigo='D1')
+        grupo = Grupo.objects.get(pk=self.grupo.pk)
+        grupo.materia = destino
+        grupo.save()
+        self.assertEqual(Grupo.objects.get(pk=grupo.pk).docente_id, self.otro.pk)
+        self.assertEqual(SesionClase.objects.filter(docente=self.otro).count(), 2)
+        self.assertEqual(AsistenciaEstudiante.objects.filter(docente=self.otro).count(), 4)
+        self.assertEqual(self.client.get('/api/sesiones/').json(), [])
+
+    def test_cambiar_docente_de_materia(self):
+        materia = Materia.objects.get(docente=self.docente)
+        materia.docente = self.otro
+        materia.save()
+        self.assertFalse(Grupo.objects.filter(docente=self.docente).exists())
+        self.assertFalse(AsistenciaEstudiante.objects.filter(docente=self.docente).exists())
+
+    def test_cambio_de_docente_avisa_al_anterior(self):
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        self.assertEqual(self.client.get('/api/materias/')['X-Cache'], 'MISS')
+        etag = self.client.get('/api/materias/')['ETag']
+        materia = Materia.objects.get(docente=self.docente)
+        materia.docente = self.otro
+        materia.save()
+        res = self.client.get('/api/materias/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(res.json(), [])
+        cambios = self.client.get('/api/sync/', {'since': cursor}).json()['cambios']
+        self.assertEqual(cambios['materias']['eliminados'], [str(materia.id)])
+        self.assertEqual(cambios['grupos']['eliminados'], [str(self.grupo.id)])
+        self.assertEqual(len(cambios['asistencias']['eliminados']), 4)
+        # El nuevo docente recibe el alta de todo el árbol
+        cliente_otro = APIClient()
+        cliente_otro.force_authenticate(self.otro)
+        cambios = cliente_otro.get('/api/sync/', {'since': 0}).json()['cambios']
+        self.assertEqual([m['id'] for m in cambios['materias']['creados']], [str(materia.id)])
+        self.assertEqual(len(cambios['sesiones']['creados']), 2)
+        self.assertEqual(len(cambios['estudiantes']['creados']), 2)
+
+    def test_acotar_por_docente_sin_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/sesiones/?expand=')
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('FROM "core_sesionclase"', sql)
+        self.assertNotIn('JOIN', sql)
+
+
+class DatosSinteticosTests(TestCase):
+    def test_generar_datos(self):
+        salida = StringIO()
+        call_command('generar_datos_sinteticos', docentes=2, materias=2, grupos=2, estudiantes=3, sesiones=4,
+                     semilla=1, stdout=salida)
+        self.assertIn('asistencias: 96', salida.getvalue())
+        self.assertEqual(Grupo.objects.count(), 8)
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 96)
+        self.assertEqual(EstadisticaGrupo.objects.count(), 8)
+        self.assertEqual(reconstruir_estadisticas(verificar=True)['EstadisticaGrupo'], [])
+        # Cada docente ve solo lo suyo y su cursor de sync avanzó
+        docente = Materia.objects.first().docente
+        self.assertEqual(Grupo.objects.filter(docente=docente).count(), 4)
+        self.assertGreater(cursor_actual(docente), 0)
+
+
+class BenchmarkTests(TestCase):
+    def test_mide_todas_las_rutas_y_revierte(self):
+        caches[settings.ARBOL_CACHE_ALIAS].set('arbol:real', 'respuesta')
+        caches[settings.USUARIOS_CACHE_ALIAS].set('usuario:real', 'usuario')
+        reporte = benchmark.ejecutar(
+            [('mini', {'docentes': 1, 'materias': 1, 'grupos': 1, 'estudiantes': 2, 'sesiones': 2})],
+            repeticiones=2, calentamiento=0, sin_cache=True,
+        )
+        # La corrida usa su propia caché: las entradas de la instalación siguen ahí
+        self.assertEqual(caches[settings.ARBOL_CACHE_ALIAS].get('arbol:real'), 'respuesta')
+        self.assertEqual(caches[settings.USUARIOS_CACHE_ALIAS].get('usuario:real'), 'usuario')
+        escala = reporte['escalas'][0]
+        self.assertEqual(escala['rutas_sin_medir'], [])
+        for ruta in escala['rutas']:
+            self.assertTrue(all(s < 400 for s in ruta['status']), ruta)
+            self.assertLessEqual(ruta['p50_ms'], ruta['p99_ms'])
+        self.assertFalse(Materia.objects.exists())
+        json.dumps(reporte)
+
+    def test_comparar_detecta_regresiones(self):
+        def reporte(p50, queries):
+            return {'escalas': [{'nombre': 'mini', 'rutas': [
+                {'ruta': 'materia-list', 'metodo': 'GET', 'p50_ms': p50, 'queries_max': queries},
+            ]}]}
+        self.assertEqual(benchmark.comparar(reporte(10, 6), reporte(11, 6)), [])
+        self.assertEqual(len(benchmark.comparar(reporte(10, 6), reporte(10, 7))), 1)
+        self.assertEqual(len(benchmark.comparar(reporte(10, 6), reporte(13, 6))), 1)
+
+
+class MetricasTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registro.reiniciar()
+        crear_arbol(self.docente, materias=1, grupos=1, estudiantes=2, sesiones=2)
+
+    def test_metricas_por_ruta(self):
+        self.client.get('/api/materias/')
+        self.client.get('/api/materias/')
+        grupo = Grupo.objects.get()
+        b''.join(self.client.get(f'/api/grupos/{grupo.pk}/export/').streaming_content)
+        texto = self.client.get('/metrics').content.decode()
+        self.assertIn('unitrack_http_requests_total{ruta="materia-list",metodo="GET",status="200"} 2', texto)
+        self.assertIn('unitrack_http_request_duration_seconds_count{ruta="materia-list",metodo="GET"} 2', texto)
+        self.assertIn('unitrack_http_request_duration_seconds_bucket{ruta="materia-list",metodo="GET",le="+Inf"} 2', texto)
+        self.assertIn('unitrack_http_cache_total{ruta="materia-list",metodo="GET",resultado="hit"} 1', texto)
+        self.assertIn('unitrack_http_cache_total{ruta="materia-list",metodo="GET",resultado="miss"} 1', texto)
+        # Las queries de la exportación se cuentan mientras se envía el stream
+        sql = {
+            linea.split('{')[1].split(',')[0]: int(linea.rsplit(' ', 1)[1])
+            for linea in texto.splitlines() if linea.startswith('unitrack_http_sql_queries_total{')
+        }
+        self.assertGreater(sql['ruta="materia-list"'], 0)
+        self.assertGreaterEqual(sql['ruta="grupo-export"'], 3)
+        self.assertIn('unitrack_http_response_bytes_total{ruta="grupo-export",metodo="GET"}', texto)
+
+    def test_solo_ips_permitidas(self):
+        with self.settings(METRICAS_IPS_PERMITIDAS=['10.0.0.1']):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 404)
+
+
+class AsistenciaEmpaquetadaTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=10, sesiones=2)
+        reconstruir_estadisticas()  # crear_arbol usa bulk_create, sin señales
+        self.grupo = Grupo.objects.get()
+        self.alumnos = list(self.grupo.inscripciones.order_by('indice').values_list('estudiante_id', flat=True))
+
+    def arbol(self):
+        cache.backend().clear()
+        data = self.client.get('/api/materias/').json()
+        for sesion in data[0]['grupos'][0]['sesiones']:
+            sesion['asistencias'].sort(key=lambda a: a['studentId'])
+        return data
+
+    def test_codificar_y_decodificar(self):
+        estados = ['Presente', None, 'Ausente', 'Tarde', 'Justificado', 'Presente', None, 'Tarde', 'Ausente']
+        datos = packing.codificar(estados)
+        self.assertEqual(len(datos), 6)  # 9 posiciones -> dos bloques de 3 bytes
+        self.assertEqual(packing.decodificar(datos, len(estados)), estados)
+        self.assertEqual([packing.estado_en(datos, 9, i) for i in range(10)], estados + [None])
+
+    def test_indices_estables_por_grupo(self):
+        self.assertEqual(sorted(self.grupo.inscripciones.values_list('indice', flat=True)), list(range(10)))
+        self.grupo.inscripciones.order_by('indice').first().delete()
+        alumno = Estudiante.objects.create(nombre_completo='Nuevo', matricula='NUEVO1')
+        self.assertEqual(InscripcionEstudianteGrupo.objects.create(estudiante=alumno, grupo=self.grupo).indice, 10)
+
+    def test_guardar_grupo_desactualizado_no_repite_indices(self):
+        desactualizado = Grupo.objects.get()
+        primero = Estudiante.objects.create(nombre_completo='Primero', matricula='NUEVO1')
+        InscripcionEstudianteGrupo.objects.create(estudiante=primero, grupo=self.grupo)
+        desactualizado.nombre = 'Renombrado'
+        desactualizado.save()
+        segundo = Estudiante.objects.create(nombre_completo='Segundo', matricula='NUEVO2')
+        self.assertEqual(InscripcionEstudianteGrupo.objects.create(estudiante=segundo, grupo=self.grupo).indice, 11)
+        self.assertEqual(sorted(self.grupo.inscripciones.values_list('indice', flat=True)), list(range(12)))
+
+    def test_crear_sesion_empaquetada_misma_respuesta(self):
+        payload = {
+            'grupo': str(self.grupo.id), 'fecha': timezone.now().isoformat(),
+            'asistencias': [{'studentId': str(a), 'status': 'Tarde' if n % 3 else 'Ausente'} for n, a in enumerate(self.alumnos[:7])],
+        }
+        normal = self.client.post('/api/sesiones/', payload, format='json').json()
+        with self.settings(ASISTENCIA_EMPAQUETADA=True):
+            res = self.client.post('/api/sesiones/', payload, format='json')
+        self.assertEqual(res.status_code, 201)
+        empaquetada = res.json()
+        self.assertEqual(empaquetada['asistencias'], normal['asistencias'])
+        self.assertFalse(AsistenciaEstudiante.objects.filter(sesion_clase_id=empaquetada['id']).exists())
+        self.assertEqual(AsistenciaEmpaquetada.objects.get().total, 7)
+        detalle = self.client.get(f"/api/sesiones/{empaquetada['id']}/").json()
+        self.assertEqual(sorted(detalle['asistencias'], key=lambda a: a['studentId']),
+                         sorted(normal['asistencias'], key=lambda a: a['studentId']))
+        self.assertEqual(reconstruir_estadisticas(verificar=True)['EstadisticaGrupo'], [])
+
+    def test_comando_empaquetar_y_revertir(self):
+        antes = self.arbol()
+        exportado = b''.join(self.client.get(f'/api/grupos/{self.grupo.id}/export/').streaming_content)
+        call_command('empaquetar_asistencias', stdout=StringIO())
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 0)
+        self.assertEqual(AsistenciaEmpaquetada.objects.count(), 2)
+        self.assertEqual(self.arbol(), antes)
+        self.assertEqual(b''.join(self.client.get(f'/api/grupos/{self.grupo.id}/export/').streaming_content), exportado)
+        with self.settings(LECTURA_RAPIDA=True):
+            self.assertEqual(self.arbol(), antes)
+        self.assertTrue(all(not v for v in reconstruir_estadisticas(verificar=True).values()))
+        call_command('empaquetar_asistencias', revertir=True, stdout=StringIO())
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 20)
+        self.assertFalse(AsistenciaEmpaquetada.objects.exists())
+        self.assertEqual(self.arbol(), antes)
+
+    def test_sync_entrega_el_pase_empaquetado(self):
+        def sync(cursor):
+            return self.client.get('/api/sync/', {'since': cursor}).json()
+
+        def ids(asistencias):
+            return {a['id'] for a in asistencias}
+
+        cursor = sync(0)['cursor']
+        with self.settings(ASISTENCIA_EMPAQUETADA=True):
+            sesion = self.client.post('/api/sesiones/', {
+                'grupo': str(self.grupo.id), 'fecha': timezone.now().isoformat(),
+                'asistencias': [{'studentId': str(a), 'status': 'Presente'} for a in self.alumnos[:3]],
+            }, format='json').json()
+        esperados = {str(AsistenciaEmpaquetada.id_asistencia(sesion['id'], a)) for a in self.alumnos[:3]}
+        data = sync(cursor)
+        self.assertEqual(ids(data['cambios']['asistencias']['creados']), esperados)
+        self.assertEqual({a['sesion'] for a in data['cambios']['asistencias']['creados']}, {sesion['id']})
+
+        self.client.patch(f"/api/sesiones/{sesion['id']}/", {'asistencias': [
+            {'studentId': str(self.alumnos[0]), 'status': None}, {'studentId': str(self.alumnos[1]), 'status': 'Tarde'},
+        ]}, format='json')
+        cambios = sync(data['cursor'])['cambios']['asistencias']
+        quitada = str(AsistenciaEmpaquetada.id_asistencia(sesion['id'], self.alumnos[0]))
+        self.assertEqual(cambios['eliminados'], [quitada])
+        self.assertEqual(ids(cambios['actualizados']), esperados - {quitada})
+        self.assertIn('Tarde', {a['status'] for a in cambios['actualizados']})
+
+        # Empaquetar cambia las filas por el pase; revertir conserva los ids ya entregados
+        data = sync(0)
+        filas = set(map(str, AsistenciaEstudiante.objects.values_list('id', flat=True)))
+        call_command('empaquetar_asistencias', stdout=StringIO())
+        cambios = sync(data['cursor'])['cambios']['asistencias']
+        self.assertEqual(set(cambios['eliminados']), filas)
+        self.assertEqual(len(cambios['creados']), 20)
+        empaquetados = ids(cambios['creados']) | esperados - {quitada}
+        call_command('empaquetar_asistencias', revertir=True, stdout=StringIO())
+        self.assertEqual(set(map(str, AsistenciaEstudiante.objects.values_list('id', flat=True))), empaquetados)
+
+    def test_borrados_descuentan_estadisticas(self):
+        call_command('empaquetar_asistencias', stdout=StringIO())
+        Estudiante.objects.get(pk=self.alumnos[3]).delete()
+        self.assertEqual(EstadisticaGrupo.objects.get(pk=self.grupo.pk).presentes, 18)
+        self.grupo.inscripciones.get(estudiante_id=self.alumnos[4]).delete()
+        self.assertEqual(EstadisticaGrupo.objects.get(pk=self.grupo.pk).presentes, 16)
+        SesionClase.objects.first().delete()
+        self.assertEqual(EstadisticaGrupo.objects.get(pk=self.grupo.pk).presentes, 8)
+        self.assertTrue(all(not v for v in reconstruir_estadisticas(verificar=True).values()))
+
+    def test_benchmark_de_almacenamiento(self):
+        medida = benchmark.medir_almacenamiento(
+            'mini', {'docentes': 1, 'materias': 1, 'grupos': 1, 'estudiantes': 16, 'sesiones': 4}, repeticiones=1,
+        )
+        self.assertEqual(medida['asistencias'], 64)
+        self.assertLess(medida['empaquetado']['bytes'], medida['filas']['bytes'])
+        self.assertEqual(AsistenciaEmpaquetada.objects.count(), 0)
+
+
+class UsuarioEnCacheTests(TestCase):
+    def setUp(self):
+        authentication.backend().clear()
+        self.docente = User.objects.create_user('docente', 'docente@unitrack.com', 'secreto123')
+        self.client = APIClient()
+        token = self.client.post('/api/auth/login/', {'email': 'docente@unitrack.com', 'password': 'secreto123'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.json()['access']}")
+
+    def queries_de_usuario(self, url='/api/sync/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries if '"auth_user"' in q['sql']]
+
+    def test_sin_query_de_usuario_en_acierto(self):
+        response, queries = self.queries_de_usuario()
+        self.assertEqual((response.status_code, len(queries)), (200, 1))
+        User.objects.bulk_create([User(username=f'u{n}', email=f'u{n}@unitrack.com') for n in range(50)])
+        response, queries = self.queries_de_usuario()
+        self.assertEqual((response.status_code, queries), (200, []))
+
+    def test_desactivar_invalida(self):
+        self.queries_de_usuario()
+        self.docente.is_active = False
+        self.docente.save()
+        response, _ = self.queries_de_usuario()
+        self.assertEqual(response.status_code, 401)
+
+    def test_reset_de_contrasena_invalida(self):
+        self.queries_de_usuario()
+        token = default_token_generator.make_token(self.docente)
+        res = APIClient().post(f'/api/auth/password_reset/confirm/{self.docente.pk}/{token}/', {'password': 'otra-clave-456'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        _, queries = self.queries_de_usuario()
+        self.assertEqual(len(queries), 1)
+
+    def test_cambio_de_email_invalida_el_anterior(self):
+        self.queries_de_usuario()
+        self.docente.email = 'nuevo@unitrack.com'
+        self.docente.save()
+        response, _ = self.queries_de_usuario()
+        self.assertEqual(response.status_code, 401)
+
+    def test_email_indexado(self):
+        indices = connection.introspection.get_constraints(connection.cursor(), User._meta.db_table)
+        self.assertTrue(any(c['index'] and c['columns'] == ['email'] for c in indices.values()))
+
+
+_llamadas_inestable = []
+
+
+@tasks.tarea(max_intentos=3)
+def tarea_inestable(fallar):
+    _llamadas_inestable.append(fallar)
+    if fallar:
+        raise RuntimeError('servidor no disponible')
+
+
+class TareasTests(TestCase):
+    def setUp(self):
+        _llamadas_inestable.clear()
+
+    def test_reset_de_contrasena_encola_el_correo(self):
+        User.objects.create_user('docente', 'docente@unitrack.com', 'secreto123')
+        res = APIClient().post('/api/auth/password_reset/', {'email': 'docente@unitrack.com'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        tarea = Tarea.objects.get()
+        self.assertEqual(tarea.nombre, 'enviar_recuperacion')
+        self.assertNotIn('confirm', json.dumps(tarea.argumentos))  # el token solo existe en el correo
+        salida = StringIO()
+        call_command('ejecutar_tareas', una_vez=True, stdout=salida)
+        self.assertIn('1 tareas completadas', salida.getvalue())
+        self.assertEqual(mail.outbox[0].to, ['docente@unitrack.com'])
+        self.assertIn('http://testserver/api/auth/password_reset/confirm/', mail.outbox[0].body)
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_reintentos_con_espera_exponencial(self):
+        tarea = tasks.encolar(tarea_inestable, fallar=True)
+        for intento, espera in ((1, 30), (2, 60)):
+            self.assertEqual(tasks.ejecutar_pendientes(), (0, 1))
+            tarea.refresh_from_db()
+            self.assertEqual((tarea.estado, tarea.intentos), (Tarea.Estado.PENDIENTE, intento))
+            self.assertAlmostEqual((tarea.ejecutar_despues - timezone.now()).total_seconds(), espera, delta=5)
+            self.assertIn('servidor no disponible', tarea.ultimo_error)
+            self.assertEqual(tasks.ejecutar_pendientes(), (0, 0))  # Aún no le toca
+            Tarea.objects.filter(pk=tarea.pk).update(ejecutar_despues=timezone.now())
+        self.assertEqual(tasks.ejecutar_pendientes(), (0, 1))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), (Tarea.Estado.FALLIDA, 3))
+        self.assertEqual(len(_llamadas_inestable), 3)
+
+    def test_una_tarea_la_toma_un_solo_worker(self):
+        tasks.encolar(tarea_inestable, fallar=False)
+        tasks.encolar('tarea_inestable', fallar=False, retraso=60)
+        primero, segundo = tasks.reclamar(), tasks.reclamar()
+        self.assertEqual((len(primero), segundo), (1, []))
+        # Un worker caído libera la tarea al vencer su bloqueo
+        Tarea.objects.filter(pk=primero[0].pk).update(bloqueada_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([t.pk for t in tasks.reclamar()], [primero[0].pk])
+
+    def test_tarea_no_registrada(self):
+        with self.assertRaises(ValueError):
+            tasks.encolar('no_existe')
+
+
+class HorarioTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, materias=1, grupos=2, estudiantes=1, sesiones=0)
+        self.grupo_a, self.grupo_b = Grupo.objects.order_by('nombre')
+        self.hoy = timezone.localdate().weekday()
+
+    def crear(self, grupo, dia, inicio, fin):
+        return self.client.post('/api/horarios/', {
+            'grupo': str(grupo.id), 'diaSemana': dia, 'horaInicio': inicio, 'horaFin': fin,
+        }, format='json')
+
+    def test_validaciones(self):
+        self.assertEqual(self.crear(self.grupo_a, self.hoy, '10:00', '11:30').status_code, 201)
+        self.assertEqual(self.crear(self.grupo_a, self.hoy, '11:30', '10:00').status_code, 400)
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        crear_arbol(otro, sesiones=0)
+        ajeno = Grupo.objects.get(docente=otro)
+        self.assertEqual(self.crear(ajeno, self.hoy, '10:00', '11:00').status_code, 400)
+        self.assertEqual(len(self.client.get('/api/horarios/').json()), 1)
+
+    def test_listado_con_etag(self):
+        self.crear(self.grupo_a, self.hoy, '10:00', '11:30')
+        etag = self.client.get('/api/horarios/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.crear(self.grupo_b, self.hoy, '12:00', '13:00')
+        res = self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((res.status_code, len(res.json())), (200, 2))
+
+    def test_clases_de_hoy_en_un_query_y_en_cache(self):
+        self.crear(self.grupo_b, self.hoy, '13:00', '14:30')
+        self.crear(self.grupo_a, self.hoy, '08:00', '09:30')
+        self.crear(self.grupo_a, (self.hoy + 1) % 7, '08:00', '09:30')
+        with self.assertNumQueries(2):  # Versión del docente y horario
+            res = self.client.get('/api/dashboard/today_classes/')
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json(), [
+            {'subjectId': str(self.grupo_a.materia_id), 'groupId': str(self.grupo_a.id), 'subjectName': 'Materia 0',
+             'groupName': 'Grupo 0', 'time': '8:00 AM - 9:30 AM'},
+            {'subjectId': str(self.grupo_b.materia_id), 'groupId': str(self.grupo_b.id), 'subjectName': 'Materia 0',
+             'groupName': 'Grupo 1', 'time': '1:00 PM - 2:30 PM'},
+        ])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/dashboard/today_classes/')['X-Cache'], 'HIT')
+        self.grupo_a.nombre = 'Grupo renombrado'
+        self.grupo_a.save()
+        res = self.client.get('/api/dashboard/today_classes/')
+        self.assertEqual((res['X-Cache'], res.json()[0]['groupName']), ('MISS', 'Grupo renombrado'))
+        HorarioClase.objects.filter(grupo=self.grupo_b).delete()
+        self.assertEqual(len(self.client.get('/api/dashboard/today_classes/').json()), 1)
+
+    def test_entrada_de_otro_proceso_no_sirve_tras_escribir(self):
+        self.crear(self.grupo_a, self.hoy, '08:00', '09:30')
+        self.client.get('/api/dashboard/today_classes/')
+        # Otro worker con caché local conserva la entrada anterior a la escritura
+        vieja = cache.backend().get(horarios.clave(self.docente.pk))
+        self.crear(self.grupo_b, self.hoy, '13:00', '14:30')
+        cache.backend().set(horarios.clave(self.docente.pk), vieja)
+        res = self.client.get('/api/dashboard/today_classes/')
+        self.assertEqual((res['X-Cache'], len(res.json())), ('MISS', 2))
+
+    def test_cache_de_otro_dia_no_sirve(self):
+        self.crear(self.grupo_a, self.hoy, '08:00', '09:30')
+        self.client.get('/api/dashboard/today_classes/')
+        manana = timezone.localdate() + timedelta(days=1)
+        with mock.patch('core.horarios.timezone.localdate', return_value=manana):
+            res = self.client.get('/api/dashboard/today_classes/')
+        self.assertEqual((res['X-Cache'], res.json()), ('MISS', []))
+
+
+class BusquedaTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=0, sesiones=0)
+        self.grupo = Grupo.objects.get()
+        for nombre, matricula in [
+            ('Mariana López Cruz', 'A2024001'), ('Ana García Pérez', 'A2024002'), ('Juan Pérez Ana', 'B2024003'),
+            ('Sofía Anaya Ruiz', 'A2025004'), ('Luis Torres Díaz', 'C2024005'),
+        ]:
+            alumno = Estudiante.objects.create(nombre_completo=nombre, matricula=matricula)
+            InscripcionEstudianteGrupo.objects.create(estudiante=alumno, grupo=self.grupo)
+        # Del mismo nombre pero de otro docente: nunca aparece
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        crear_arbol(otro, estudiantes=0, sesiones=0)
+        ajeno = Estudiante.objects.create(nombre_completo='Ana García Ajena', matricula='A2024999')
+        InscripcionEstudianteGrupo.objects.create(estudiante=ajeno, grupo=Grupo.objects.get(docente=otro))
+
+    def buscar(self, q, url='/api/estudiantes/', **params):
+        res = self.client.get(url, {'q': q, **params})
+        self.assertEqual(res.status_code, 200)
+        return res.json()
+
+    def matriculas(self, q, **params):
+        return [e['studentId'] for e in self.buscar(q, **params)['results']]
+
+    def test_prefijo_de_matricula_primero(self):
+        self.assertEqual(self.matriculas('A2024'), ['A2024001', 'A2024002'])
+        self.assertEqual(self.matriculas('A2024002'), ['A2024002'])
+
+    def test_nombre_sin_distinguir_mayusculas_y_por_terminos(self):
+        self.assertEqual(set(self.matriculas('ana')), {'A2024001', 'A2024002', 'B2024003', 'A2025004'})
+        self.assertEqual(set(self.matriculas('PÉREZ ana')), {'A2024002', 'B2024003'})
+        self.assertEqual(self.matriculas('garcía'), ['A2024002'])
+        self.assertEqual(self.matriculas('torres d'), ['C2024005'])  # término corto filtrado sobre el índice
+        self.assertEqual(self.matriculas('xyz'), [])
+
+    def test_paginado(self):
+        primera = self.buscar('ana', limit=3)
+        self.assertEqual(len(primera['results']), 3)
+        segunda = self.client.get(primera['next']).json()
+        self.assertEqual((len(segunda['results']), segunda['next']), (1, None))
+        vistos = [e['id'] for e in primera['results'] + segunda['results']]
+        self.assertEqual(len(set(vistos)), 4)
+
+    def test_indice_sigue_a_los_cambios(self):
+        alumno = Estudiante.objects.get(matricula='C2024005')
+        alumno.nombre_completo = 'Luis Ramírez Díaz'
+        alumno.save()
+        self.assertEqual(self.matriculas('ramírez'), ['C2024005'])
+        self.assertEqual(self.matriculas('torres'), [])
+        alumno.delete()
+        self.assertEqual(self.matriculas('ramírez'), [])
+
+    def test_triggers_restaurados_tras_migrar(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 solo en SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_estudiante_fts_ai')
+        Estudiante.objects.create(nombre_completo='Nueva Alumna', matricula='Z1')
+        busqueda.instalar(connection, solo_reparar=True)
+        alumna = Estudiante.objects.get(matricula='Z1')
+        InscripcionEstudianteGrupo.objects.create(estudiante=alumna, grupo=self.grupo)
+        self.assertEqual(self.matriculas('alumna'), ['Z1'])
+
+    def test_indice_ligado_a_la_pk_y_no_al_rowid(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 solo en SQLite')
+        # VACUUM puede renumerar el rowid implícito de una tabla con pk UUID sin disparar triggers
+        with connection.cursor() as cursor:
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER core_estudiante_fts_{sufijo}')
+            cursor.execute('UPDATE core_estudiante SET rowid = rowid + 1000')
+            for sql in busqueda._sql_sqlite(Estudiante, ['nombre_completo', 'matricula']):
+                cursor.execute(sql)
+        self.assertEqual(self.matriculas('torres'), ['C2024005'])
+        Estudiante.objects.get(matricula='C2024005').delete()
+        self.assertEqual(self.matriculas('torres'), [])
+        self.assertEqual(len(self.matriculas('ana')), 4)
+
+    def test_postgresql_filtra_con_ilike_para_usar_el_indice(self):
+        # El índice gin_trgm_ops está sobre la columna: UPPER(col::text) LIKE (icontains) no lo usa
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            sql = str(Estudiante.objects.filter(busqueda._coincide(['nombre_completo', 'matricula'], '50%_ana')).query)
+        self.assertIn('"core_estudiante"."nombre_completo" ILIKE %50\\%\\_ana%', sql)
+        self.assertNotIn('UPPER', sql)
+
+    def test_materias_por_nombre_o_codigo(self):
+        Materia.objects.create(docente=self.docente, nombre='Cálculo Diferencial', codigo='MAT101')
+        Materia.objects.create(docente=self.docente, nombre='Matemáticas Discretas', codigo='INF200')
+        data = self.buscar('mat1', url='/api/materias/')
+        self.assertEqual([m['codigo'] for m in data['results']], ['MAT101'])
+        codigos = [m['codigo'] for m in self.buscar('mat', url='/api/materias/')['results']]
+        self.assertEqual(codigos[0], 'MAT101')  # prefijo del código antes que el nombre
+        self.assertIn('INF200', codigos)
+        self.assertEqual([m['codigo'] for m in self.buscar('discretas', url='/api/materias/')['results']], ['INF200'])
+
+
+class RiesgoTests(ApiTestCase):
+    # P = Presente, A = Ausente, J = Justificado; una sesión por día alternando entre dos grupos
+    HISTORIAL = {
+        'Racha': 'PAPAAA',
+        'Constante': 'PPPPPP',
+        'Justificada': 'JJJPJJ',
+        'Irregular': 'APPPPP',
+    }
+    ESTADOS = {'P': 'Presente', 'A': 'Ausente', 'J': 'Justificado'}
+
+    def setUp(self):
+        super().setUp()
+        materia = Materia.objects.create(docente=self.docente, nombre='Materia', codigo='M1')
+        grupos = [Grupo.objects.create(materia=materia, nombre=f'Grupo {g}') for g in range(2)]
+        self.alumnos = {}
+        for nombre in self.HISTORIAL:
+            self.alumnos[nombre] = Estudiante.objects.create(nombre_completo=nombre, matricula=nombre.upper())
+            for grupo in grupos:
+                InscripcionEstudianteGrupo.objects.create(estudiante=self.alumnos[nombre], grupo=grupo)
+        inicio = timezone.now() - timedelta(days=30)
+        for dia in range(6):
+            sesion = SesionClase.objects.create(grupo=grupos[dia % 2], fecha=inicio + timedelta(days=dia))
+            AsistenciaEstudiante.objects.bulk_create([
+                AsistenciaEstudiante(sesion_clase=sesion, estudiante=alumno, status=self.ESTADOS[self.HISTORIAL[nombre][dia]])
+                for nombre, alumno in self.alumnos.items()
+            ])
+
+    def riesgos(self):
+        return {r.estudiante.nombre_completo: r for r in RiesgoEstudiante.objects.select_related('estudiante')}
+
+    def test_metricas(self):
+        self.assertEqual(riesgo.actualizar(), 1)
+        r = self.riesgos()['Racha']
+        self.assertEqual((r.sesiones, r.ausencias, r.racha_actual, r.racha_maxima), (6, 4, 3, 3))
+        self.assertAlmostEqual(r.tasa_ausencias, 4 / 6)
+        self.assertAlmostEqual(r.tendencia, 4 / 5 - 0)  # últimas 5 sesiones contra la primera
+        # 'Irregular' tiene 1 de 6 ausencias (17%): solo cuenta si supera la tasa configurada
+        with self.settings(RIESGO_TASA_AUSENCIAS=0.1):
+            riesgo.actualizar()
+        self.assertEqual(set(self.riesgos()), {'Racha', 'Irregular'})
+        self.assertEqual(self.riesgos()['Irregular'].racha_maxima, 1)
+
+    def test_empaquetadas_dan_el_mismo_resultado(self):
+        antes = riesgo.metricas(*riesgo.cargar()[:4], ventana=5)
+        packing.empaquetar(SesionClase.objects.filter(fecha__lt=timezone.now() - timedelta(days=27, hours=12)))
+        self.assertEqual(AsistenciaEmpaquetada.objects.count(), 3)
+        despues = riesgo.metricas(*riesgo.cargar()[:4], ventana=5)
+        for campo in antes:
+            if campo != 'estudiante':  # el índice de estudiante depende del orden de lectura
+                self.assertEqual(sorted(antes[campo].tolist()), sorted(despues[campo].tolist()), campo)
+
+    def test_sesiones_creadas_durante_la_carga_se_omiten(self):
+        grupo = Grupo.objects.first()
+        crudo = riesgo._crudo
+        llamadas = []
+
+        def crudo_con_sesion_nueva(queryset):
+            # Entre la lectura de sesiones y la de asistencias se confirma otro pase de lista
+            llamadas.append(queryset)
+            if len(llamadas) == 2:
+                for empaquetar in (False, True):
+                    sesion = SesionClase.objects.create(grupo=grupo, fecha=timezone.now())
+                    AsistenciaEstudiante.objects.bulk_create([
+                        AsistenciaEstudiante(sesion_clase=sesion, estudiante=alumno, status='Ausente')
+                        for alumno in self.alumnos.values()
+                    ])
+                    if empaquetar:
+                        packing.empaquetar(SesionClase.objects.filter(pk=sesion.pk))
+            return crudo(queryset)
+
+        with mock.patch.object(riesgo, '_crudo', crudo_con_sesion_nueva):
+            sesion, estudiante, codigo, docentes, _ = riesgo.cargar()
+        self.assertEqual(len(docentes), 6)
+        self.assertEqual(len(sesion), 24)
+        self.assertEqual(sesion.max(), 5)
+
+    def test_decodificar_como_packing(self):
+        estados = ['Presente', None, 'Ausente', 'Tarde', 'Justificado', 'Presente', None, 'Tarde', 'Ausente', 'Presente']
+        codigos = riesgo.decodificar(packing.codificar(estados), len(estados))
+        self.assertEqual([packing.ESTADOS[c] for c in codigos], estados)
+
+    def test_endpoint_solo_inscritos_del_docente(self):
+        with self.settings(RIESGO_TASA_AUSENCIAS=0.1):
+            riesgo.actualizar()
+        res = self.client.get('/api/estudiantes/at_risk/')
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        self.assertEqual([e['studentId'] for e in data], ['RACHA', 'IRREGULAR'])
+        self.assertEqual((data[0]['ausencias'], data[0]['rachaActual'], data[0]['tasaAusencias']), (4, 3, 0.6667))
+        InscripcionEstudianteGrupo.objects.filter(estudiante=self.alumnos['Irregular']).delete()
+        self.assertEqual([e['studentId'] for e in self.client.get('/api/estudiantes/at_risk/').json()], ['RACHA'])
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        self.client.force_authenticate(otro)
+        self.assertEqual(self.client.get('/api/estudiantes/at_risk/').json(), [])
+
+    def test_comando_por_docente_y_en_segundo_plano(self):
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        RiesgoEstudiante.objects.create(
+            docente=otro, estudiante=self.alumnos['Constante'], sesiones=1, ausencias=1, tasa_ausencias=1,
+            racha_actual=1, racha_maxima=1, tendencia=0, calculado=timezone.now(),
+        )
+        call_command('calcular_riesgo', docentes=[self.docente.pk], stdout=StringIO())
+        self.assertEqual(RiesgoEstudiante.objects.filter(docente=otro).count(), 1)  # otros docentes no se tocan
+        self.assertEqual(RiesgoEstudiante.objects.filter(docente=self.docente).count(), 1)
+        call_command('calcular_riesgo', en_segundo_plano=True, stdout=StringIO())
+        self.assertEqual(tasks.ejecutar_pendientes(), (1, 0))
+        self.assertEqual(RiesgoEstudiante.objects.count(), 1)
+
+
+class BatchTests(ApiTestCase):
+    def lote(self, operaciones):
+        return self.client.post('/api/batch/', {'operations': operaciones}, format='json')
+
+    def test_alta_de_periodo_en_una_peticion(self):
+        operaciones = [
+            {'method': 'POST', 'path': '/api/materias/', 'body': {'nombre': 'Cálculo', 'codigo': 'MAT101'}, 'ref': 'materia'},
+            {'method': 'POST', 'path': '/api/grupos/', 'body': {'nombre': 'A', 'materia': '$materia'}, 'ref': 'grupo'},
+            {'method': 'POST', 'path': '/api/estudiantes/', 'body': {'nombre': 'Ana', 'studentId': 'E1', 'grupo': '$grupo'}, 'ref': 'ana'},
+            {'method': 'POST', 'path': '/api/estudiantes/', 'body': {'nombre': 'Luis', 'studentId': 'E2', 'grupo': '$grupo'}, 'ref': 'luis'},
+            {'method': 'POST', 'path': '/api/sesiones/', 'body': {
+                'grupo': '$grupo', 'fecha': timezone.now().isoformat(),
+                'asistencias': [{'studentId': '$ana', 'status': 'Presente'}, {'studentId': '$luis', 'status': 'Ausente'}],
+            }, 'ref': 'sesion'},
+            {'method': 'PATCH', 'path': '/api/sesiones/$sesion/', 'body': {'asistencias': [{'studentId': '$luis', 'status': 'Tarde'}]}},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.lote(operaciones)
+        self.assertEqual(res.status_code, 200, res.content)
+        data = res.json()
+        self.assertEqual([r['status'] for r in data['results']], [201, 201, 201, 201, 201, 200])
+        self.assertEqual(set(data['refs']), {'materia', 'grupo', 'ana', 'luis', 'sesion'})
+        grupo = Grupo.objects.get(pk=data['refs']['grupo'])
+        self.assertEqual(grupo.materia.codigo, 'MAT101')
+        self.assertEqual(grupo.inscripciones.count(), 2)
+        self.assertEqual(
+            sorted(a['status'] for a in data['results'][-1]['body']['asistencias']), ['Presente', 'Tarde'],
+        )
+        # El usuario no se vuelve a resolver por operación
+        self.assertFalse(any('auth_user' in q['sql'] for q in queries))
+
+    def test_falla_una_y_se_revierte_todo(self):
+        res = self.lote([
+            {'method': 'POST', 'path': '/api/materias/', 'body': {'nombre': 'Cálculo', 'codigo': 'MAT101'}, 'ref': 'materia'},
+            {'method': 'POST', 'path': '/api/grupos/', 'body': {'materia': '$materia'}},
+        ])
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual((res.json()['index'], res.json()['status']), (1, 400))
+        self.assertIn('nombre', res.json()['body'])
+        self.assertFalse(Materia.objects.exists())
+        self.assertFalse(CambioSync.objects.exists())
+
+    def test_operaciones_invalidas(self):
+        materia = Materia.objects.create(docente=self.docente, nombre='Cálculo', codigo='MAT101')
+        casos = [
+            [{'method': 'POST', 'path': '/api/grupos/', 'body': {'nombre': 'A', 'materia': '$nada'}}],
+            [{'method': 'GET', 'path': '/api/materias/'}],
+            [{'method': 'POST', 'path': '/api/auth/logout/'}],
+            [{'method': 'POST', 'path': '/api/batch/', 'body': {'operations': []}}],
+            [{'method': 'DELETE', 'path': f'/api/materias/{materia.pk}/'}, 'x'],
+        ]
+        for operaciones in casos:
+            res = self.lote(operaciones)
+            self.assertEqual(res.status_code, 400, operaciones)
+        self.assertEqual(self.lote([]).status_code, 400)
+        self.assertTrue(Materia.objects.exists())
+
+    def test_objetos_de_otro_docente(self):
+        otro = User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123')
+        ajena = Materia.objects.create(docente=otro, nombre='Ajena', codigo='X1')
+        res = self.lote([{'method': 'DELETE', 'path': f'/api/materias/{ajena.pk}/'}])
+        self.assertEqual((res.status_code, res.json()['status']), (400, 404))
+        self.assertTrue(Materia.objects.filter(pk=ajena.pk).exists())
+
+
+class ReplicasTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        caches[settings.USUARIOS_CACHE_ALIAS].clear()  # marcas de escritura de otras pruebas
+        replicas._caidas.clear()
+
+    def lectura(self, metodo='get', usuario=None, modulo='core.views'):
+        """ Alias de lectura que ve una vista de `modulo` dentro de ReplicaMiddleware. """
+        visto = []
+
+        def vista(request):
+            request.user = usuario or AnonymousUser()  # como lo deja DRF tras autenticar
+            visto.append(replicas.alias_de_lectura())
+            return HttpResponse()
+        vista.__module__ = modulo
+        middleware = replicas.ReplicaMiddleware(lambda request: middleware.process_view(request, vista, (), {}) or vista(request))
+        middleware(getattr(RequestFactory(), metodo)('/api/materias/'))
+        return visto[0]
+
+    @override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'])
+    def test_lecturas_de_core_a_una_replica(self):
+        with mock.patch.object(replicas, 'disponible', return_value=True):
+            self.assertIn(self.lectura(usuario=self.docente), ('replica_a', 'replica_b'))
+            self.assertEqual(self.lectura(), 'default')  # aún sin autenticar
+            self.assertIsNone(self.lectura('post', usuario=self.docente))
+            self.assertIsNone(self.lectura(usuario=self.docente, modulo='django.contrib.admin.sites'))
+            replicas.marcar_escritura(self.docente.pk)
+            self.assertEqual(self.lectura(usuario=self.docente), 'default')
+        with mock.patch.object(replicas, 'disponible', return_value=False):
+            self.assertEqual(self.lectura(usuario=User.objects.create_user('b', 'b@unitrack.com', 'x')), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica_a'])
+    def test_cookie_de_sesion_con_jwt_de_usuario_sin_cache(self):
+        # El usuario perezoso de la sesión no se evalúa desde el router (recursión infinita)
+        cliente = APIClient()
+        cliente.login(username='docente', password='secreto123')
+        token = cliente.post('/api/auth/login/', {'email': 'docente@unitrack.com', 'password': 'secreto123'}, format='json')
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {token.json()['access']}")
+        authentication.backend().clear()
+        with mock.patch.object(replicas, 'elegir_replica', return_value='default') as elegir:
+            self.assertEqual(cliente.get('/api/materias/').status_code, 200)
+        elegir.assert_called_once_with()
+
+    @override_settings(DATABASE_REPLICAS=['replica_a'])
+    def test_escritura_fija_las_lecturas_al_primario(self):
+        self.assertFalse(replicas.escribio_hace_poco(self.docente.pk))
+        self.client.post('/api/materias/', {'nombre': 'Cálculo', 'codigo': 'MAT101'}, format='json')
+        self.assertTrue(replicas.escribio_hace_poco(self.docente.pk))
+
+    def test_replicas_exigen_cache_compartida(self):
+        self.assertEqual(replicas.verificar_cache_compartida(None), [])
+        with override_settings(DATABASE_REPLICAS=['replica_a']):
+            errores = replicas.verificar_cache_compartida(None)
+            self.assertEqual([e.id for e in errores], ['core.E001'])
+            redis = {**settings.CACHES, settings.USUARIOS_CACHE_ALIAS: {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379',
+            }}
+            with override_settings(CACHES=redis):
+                self.assertEqual(replicas.verificar_cache_compartida(None), [])
+
+    @override_settings(REPLICA_REINTENTO=30)
+    def test_replica_caida_se_omite_un_tiempo(self):
+        conexion = mock.Mock()
+        conexion.ensure_connection.side_effect = OperationalError('sin conexión')
+        with mock.patch.object(replicas, 'connections', {'replica_a': conexion}):
+            self.assertFalse(replicas.disponible('replica_a'))
+            self.assertFalse(replicas.disponible('replica_a'))
+            self.assertEqual(conexion.ensure_connection.call_count, 1)
+            conexion.ensure_connection.side_effect = None
+            with mock.patch.object(replicas.time, 'monotonic', return_value=time.monotonic() + 31):
+                self.assertTrue(replicas.disponible('replica_a'))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Sin DATABASE_REPLICA_URLS')
+class ReplicaIntegracionTests(TransactionTestCase):
+    # Con transacción por prueba la réplica (MIRROR de default) no vería los datos sin confirmar
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        caches[settings.USUARIOS_CACHE_ALIAS].clear()
+        cache.backend().clear()
+        self.docente = User.objects.create_user('docente', 'docente@unitrack.com', 'secreto123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.docente)
+
+    def test_get_del_arbol_lee_de_la_replica(self):
+        crear_arbol(self.docente)
+        alias = settings.DATABASE_REPLICAS[0]
+        with override_settings(DATABASE_REPLICAS=[alias]):
+            with CaptureQueriesContext(connections[alias]) as en_replica:
+                self.assertEqual(self.client.get('/api/materias/').status_code, 200)
+            self.assertGreater(len(en_replica), 0)
+            self.client.post('/api/materias/', {'nombre': 'Nueva', 'codigo': 'N1'}, format='json')
+            with CaptureQueriesContext(connections[alias]) as tras_escribir:
+                self.assertEqual(len(self.client.get('/api/materias/').json()), 2)
+            self.assertEqual(len(tras_escribir), 0)
+
+
+class ArchivoTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, estudiantes=4, sesiones=3)
+        reconstruir_estadisticas()  # crear_arbol usa bulk_create, sin señales
+        self.grupo = Grupo.objects.get()
+        sesiones = list(SesionClase.objects.order_by('id'))
+        for n, sesion in enumerate(sesiones[:2]):
+            SesionClase.objects.filter(pk=sesion.pk).update(fecha=timezone.now() - timedelta(days=400 + n))
+        AsistenciaEstudiante.objects.filter(sesion_clase=sesiones[0]).update(status=AsistenciaEstudiante.AttendanceStatus.AUSENTE)
+        packing.empaquetar(SesionClase.objects.filter(pk=sesiones[1].pk))
+        reconstruir_estadisticas()
+        self.antiguas = sesiones[:2]
+        self.hasta = (timezone.now() - timedelta(days=100)).strftime('%Y-%m-%d')
+
+    def exportar(self):
+        return b''.join(self.client.get(f'/api/grupos/{self.grupo.id}/export/').streaming_content)
+
+    def sesiones(self):
+        data = self.client.get('/api/sesiones/').json()
+        for sesion in data:
+            sesion['asistencias'].sort(key=lambda a: a['studentId'])
+        return sorted(data, key=lambda s: s['id'])
+
+    def test_archivar_y_revertir(self):
+        exportado, antes = self.exportar(), self.sesiones()
+        cursor = cursor_actual(self.docente)
+        call_command('archivar_sesiones', hasta=self.hasta, stdout=StringIO())
+        self.assertEqual(SesionClase.objects.count(), 1)
+        self.assertEqual(SesionArchivada.objects.count(), 2)
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 4)
+        self.assertFalse(AsistenciaEmpaquetada.objects.exists())
+        self.assertEqual(EstadisticaGrupo.objects.get(pk=self.grupo.pk).contadores()['Ausente'], 0)
+        self.assertTrue(all(not v for v in reconstruir_estadisticas(verificar=True).values()))
+        self.assertEqual(self.exportar(), exportado)
+        eliminadas = CambioSync.objects.filter(id__gt=cursor, modelo='sesiones', operacion=CambioSync.Operacion.ELIMINADO)
+        self.assertEqual({c.objeto_id for c in eliminadas}, {s.pk for s in self.antiguas})
+
+        call_command('archivar_sesiones', hasta=self.hasta, revertir=True, stdout=StringIO())
+        self.assertFalse(SesionArchivada.objects.exists())
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 12)
+        self.assertEqual(self.sesiones(), antes)
+        self.assertTrue(all(not v for v in reconstruir_estadisticas(verificar=True).values()))
+
+    def test_endpoint_de_solo_lectura(self):
+        call_command('archivar_sesiones', hasta=self.hasta, stdout=StringIO())
+        res = self.client.get('/api/archivo/sesiones/', {'grupo': str(self.grupo.id)})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([s['id'] for s in res.json()], [str(s.pk) for s in reversed(self.antiguas)])  # por fecha
+        detalle = self.client.get(f'/api/archivo/sesiones/{self.antiguas[0].pk}/').json()
+        self.assertEqual({a['status'] for a in detalle['asistencias']}, {'Ausente'})
+        self.assertEqual(len(detalle['asistencias']), 4)
+        self.assertEqual(self.client.post('/api/archivo/sesiones/', {}, format='json').status_code, 405)
+        self.assertEqual(self.client.get('/api/archivo/sesiones/', {'grupo': 'x'}).status_code, 400)
+        otro = APIClient()
+        otro.force_authenticate(User.objects.create_user('otro', 'otro@unitrack.com', 'secreto123'))
+        self.assertEqual(otro.get(f'/api/archivo/sesiones/{self.antiguas[0].pk}/').status_code, 404)
+
+
+class BorradoLogicoTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        crear_arbol(self.docente, materias=2, grupos=2, estudiantes=3, sesiones=2)
+        reconstruir_estadisticas()  # crear_arbol usa bulk_create, sin señales
+        self.materia = Materia.objects.order_by('nombre').first()
+        self.grupo = self.materia.grupos.order_by('nombre').first()
+        hoy = timezone.localdate().weekday()
+        self.client.post('/api/horarios/', {
+            'grupo': str(self.grupo.id), 'diaSemana': hoy, 'horaInicio': '10:00', 'horaFin': '11:00',
+        }, format='json')
+
+    def test_borrado_inmediato_y_purga_por_lotes(self):
+        cursor = cursor_actual(self.docente)
+        self.assertEqual(self.client.delete(f'/api/materias/{self.materia.id}/').status_code, 204)
+        self.assertFalse(Materia.objects.filter(pk=self.materia.pk).exists())
+        self.assertEqual(Grupo.todos.filter(materia=self.materia).count(), 2)
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 24)  # aún sin purgar
+        self.assertEqual(len(self.client.get('/api/materias/').json()), 1)
+        self.assertEqual(len(self.client.get('/api/grupos/').json()), 2)
+        self.assertEqual(len(self.client.get('/api/sesiones/').json()), 4)
+        with self.settings(LECTURA_RAPIDA=True):
+            self.assertEqual(len(self.client.get('/api/sesiones/').json()), 4)
+        self.assertEqual(self.client.get('/api/horarios/').json(), [])
+        self.assertEqual(self.client.get('/api/dashboard/today_classes/').json(), [])
+        self.assertEqual(len(self.client.get('/api/estudiantes/').json()), 6)
+        self.assertEqual(self.client.get(f'/api/grupos/{self.grupo.id}/').status_code, 404)
+        self.assertEqual(
+            list(CambioSync.objects.filter(id__gt=cursor, operacion=CambioSync.Operacion.ELIMINADO).values_list('modelo', 'objeto_id')),
+            [('materias', self.materia.pk)],
+        )
+
+        with mock.patch('core.tasks.LOTES_POR_TAREA', 3):
+            self.assertGreater(tasks.ejecutar_pendientes()[0], 1)  # la purga se vuelve a encolar
+        self.assertFalse(Tarea.objects.exists())
+        self.assertFalse(Materia.todos.filter(pk=self.materia.pk).exists())
+        self.assertFalse(Grupo.todos.filter(materia=self.materia).exists())
+        self.assertEqual(AsistenciaEstudiante.objects.count(), 12)
+        self.assertEqual(InscripcionEstudianteGrupo.objects.count(), 6)
+        self.assertFalse(HorarioClase.objects.exists())
+        self.assertTrue(all(not v for v in reconstruir_estadisticas(verificar=True).values()))
+
+    def test_borrar_grupo_y_purgar_con_comando(self):
+        self.assertEqual(self.client.delete(f'/api/grupos/{self.grupo.id}/').status_code, 204)
+        self.client.delete(f'/api/grupos/{self.materia.grupos.get().id}/')
+        self.assertEqual(Tarea.objects.count(), 1)
+        salida = StringIO()
+        call_command('purgar_eliminados', lote=2, stdout=salida)
+        self.assertIn('AsistenciaEstudiante: 12 filas borradas', salida.getvalue())
+        self.assertEqual(Materia.objects.count(), 2)
+        self.assertEqual(Grupo.todos.count(), 2)
+        self.assertEqual(SesionClase.objects.count(), 4)
+
+
+class PurgaPorLotesTests(TransactionTestCase):
+    # Sin la transacción por prueba de TestCase se ven los COMMIT reales de la tarea
+    def test_cada_lote_confirma_su_transaccion(self):
+        docente = User.objects.create_user('docente', 'docente@unitrack.com', 'secreto123')
+        crear_arbol(docente, grupos=2, estudiantes=3, sesiones=2)
+        purga.eliminar(Materia.objects.get())
+        conexion = connections['default']
+        with mock.patch.object(purga, '_borrar_lote', wraps=purga._borrar_lote) as lotes, \
+                mock.patch.object(conexion, 'commit', wraps=conexion.commit) as commits:
+            self.assertEqual(tasks.ejecutar_pendientes(), (1, 0))
+        self.assertFalse(Grupo.todos.exists())
+        self.assertGreater(lotes.call_count, 1)
+        self.assertGreaterEqual(commits.call_count, lotes.call_count)
@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from .views import MateriaViewSet, GrupoViewSet, EstudianteViewSet, SesionClaseViewSet, LogoutView, PasswordResetRequestView, PasswordResetConfirmView, EmailTokenObtainPairView
+from .views import MateriaViewSet, GrupoViewSet, EstudianteViewSet, SesionClaseViewSet, SesionArchivadaViewSet, HorarioClaseViewSet, TodayClassesView, BatchView, SyncView, CacheStatsView, LogoutView, PasswordResetRequestView, PasswordResetConfirmView, EmailTokenObtainPairView
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -8,10 +8,16 @@ router.register(r'materias', MateriaViewSet)
 router.register(r'grupos', GrupoViewSet)
 router.register(r'estudiantes', EstudianteViewSet)
 router.register(r'sesiones', SesionClaseViewSet)
+router.register(r'horarios', HorarioClaseViewSet)
+router.register(r'archivo/sesiones', SesionArchivadaViewSet)
 
 urlpatterns = router.urls
 
 urlpatterns += [
+    path('dashboard/today_classes/', TodayClassesView.as_view(), name='today_classes'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache_stats'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('auth/password_reset/', PasswordResetRequestView.as_view(), name='password_reset'),
     path('auth/password_reset/confirm/<int:uid>/<str:token>/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
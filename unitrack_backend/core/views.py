@@ -1,7 +1,19 @@
 # Create your views here.
+import uuid
 from rest_framework import viewsets, permissions
-from .models import Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, AsistenciaEstudiante
-from .serializers import MateriaSerializer, GrupoSerializer, EstudianteSerializer, SesionClaseSerializer
+from rest_framework.decorators import action
+from .models import Materia, Grupo, Estudiante, InscripcionEstudianteGrupo, SesionClase, HorarioClase, RiesgoEstudiante, SesionArchivada
+from .serializers import MateriaSerializer, GrupoSerializer, EstudianteSerializer, SesionClaseSerializer, SesionArchivadaSerializer, HorarioClaseSerializer
+from .loaders import materias_tree_queryset, grupos_tree_queryset, sesiones_tree_queryset
+from .expansion import Expansion
+from .attendance import validar_asistencias, crear_asistencias, actualizar_asistencias
+from .stats import resumen_contadores
+from .sync import cambios_desde, cursor_actual
+from .mixins import ConditionalGetMixin, CachedResponseMixin
+from .roster import leer_filas, importar_estudiantes, FormatoInvalido
+from .exports import matriz_grupo, FORMATOS
+from .tasks import encolar, enviar_recuperacion
+from . import batch, busqueda, cache, fastpath, horarios, purga
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
@@ -9,46 +21,173 @@ from django.contrib.auth import logout as django_logout
 from django.contrib.auth.models import User
 from django.contrib.auth.models import update_last_login as django_update_last_login
 from rest_framework_simplejwt.settings import api_settings as simple_jwt_api_settings
-from django.core.mail import send_mail
-from django.utils.crypto import get_random_string
 from django.contrib.auth.tokens import default_token_generator
-from django.urls import reverse
-from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import serializers
 
-class MateriaViewSet(viewsets.ModelViewSet):
+def respuesta_exportacion(request, nombre, hojas):
+    """ Matriz de asistencia en streaming; ?formato=csv (por defecto) o xlsx. """
+    formato = request.query_params.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return Response({'error': 'Formato no soportado; usa csv o xlsx.'}, status=status.HTTP_400_BAD_REQUEST)
+    generador, content_type = FORMATOS[formato]
+    response = StreamingHttpResponse(generador(hojas), content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, f'asistencia-{nombre}.{formato}')
+    return response
+
+class MateriaViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Materia.objects.all()
     serializer_class = MateriaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Materia.objects.filter(docente=self.request.user)
+        if self.action == 'export':
+            return Materia.objects.filter(docente=self.request.user)
+        # Árbol completo precargado en un número fijo de queries
+        return materias_tree_queryset(self.request.user, Expansion.desde_request(self.request))
 
     def perform_create(self, serializer):
         serializer.save(docente=self.request.user)
 
-class GrupoViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        # Borrado lógico inmediato; grupos, sesiones y asistencias se purgan en segundo plano
+        purga.eliminar(instance)
+
+    def list(self, request, *args, **kwargs):
+        if 'q' in request.query_params:
+            # Búsqueda por nombre o código, por relevancia y paginada
+            return Response(busqueda.resultados(
+                request, self.get_queryset(), lambda materias: self.get_serializer(materias, many=True).data,
+            ))
+        if fastpath.activa(request):
+            return fastpath.respuesta(fastpath.materias(request.user))
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        # Una hoja (o bloque CSV) por grupo de la materia
+        materia = self.get_object()
+        grupos = materia.grupos.order_by('nombre')
+        return respuesta_exportacion(request, materia.codigo or materia.nombre, [(g.nombre, matriz_grupo(g)) for g in grupos])
+
+class GrupoViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Grupo.objects.all()
     serializer_class = GrupoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    conditional_actions = ('list', 'retrieve', 'summary')
 
     def get_queryset(self):
         # Solo los grupos de materias del docente autenticado
-        return Grupo.objects.filter(materia__docente=self.request.user)
+        if self.action == 'summary':
+            return Grupo.objects.filter(docente=self.request.user).select_related('estadistica')
+        if self.action in ('roster', 'export'):
+            return Grupo.objects.filter(docente=self.request.user)
+        return grupos_tree_queryset(self.request.user, Expansion.desde_request(self.request))
+
+    def perform_destroy(self, instance):
+        purga.eliminar(instance)
+
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        # Estadísticas precalculadas: no se recorre ninguna fila de AsistenciaEstudiante
+        grupo = self.get_object()
+        sesiones = grupo.sesiones.select_related('estadistica').order_by('fecha')
+        inscripciones = grupo.inscripciones.select_related('estudiante', 'estadistica').order_by('estudiante__nombre_completo')
+        return Response({
+            'grupo': grupo.id,
+            'totalEstudiantes': len(inscripciones),
+            'totalSesiones': len(sesiones),
+            'totales': resumen_contadores(getattr(grupo, 'estadistica', None)),
+            'sesiones': [
+                {
+                    'id': sesion.id,
+                    'nombre': sesion.nombre,
+                    'fecha': sesion.fecha,
+                    **resumen_contadores(getattr(sesion, 'estadistica', None)),
+                }
+                for sesion in sesiones
+            ],
+            'estudiantes': [
+                {
+                    'id': insc.estudiante.id,
+                    'nombre': insc.estudiante.nombre_completo,
+                    'studentId': insc.estudiante.matricula,
+                    **resumen_contadores(getattr(insc, 'estadistica', None)),
+                }
+                for insc in inscripciones
+            ],
+        })
 
-class EstudianteViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'])
+    def roster(self, request, pk=None):
+        # Importación masiva: archivo .csv/.jsonl/.json en 'archivo' o lista JSON en el cuerpo
+        grupo = self.get_object()
+        try:
+            filas = leer_filas(archivo=request.FILES.get('archivo'), datos=request.data)
+            reporte = importar_estudiantes(grupo, filas, request.user.pk)
+        except FormatoInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(reporte, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        grupo = self.get_object()
+        return respuesta_exportacion(request, grupo.nombre, [(grupo.nombre, matriz_grupo(grupo))])
+
+class EstudianteViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Estudiante.objects.all()
     serializer_class = EstudianteSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # Todos los estudiantes relacionados a grupos de materias del docente
-        return Estudiante.objects.filter(
-            inscripcionestudiantegrupo__grupo__materia__docente=self.request.user
-        ).distinct()
+        # Todos los estudiantes inscritos en grupos del docente; el subquery evita el distinct()
+        inscritos = InscripcionEstudianteGrupo.objects.filter(grupo__docente=self.request.user, grupo__eliminacion__isnull=True)
+        return Estudiante.objects.filter(pk__in=inscritos.values('estudiante_id'))
+
+    def list(self, request, *args, **kwargs):
+        if 'q' in request.query_params:
+            # Búsqueda por matrícula (prefijo) o nombre, por relevancia y paginada
+            # Ámbito con EXISTS: se verifica solo sobre las coincidencias del índice
+            inscritos = InscripcionEstudianteGrupo.objects.filter(
+                grupo__docente=request.user, grupo__eliminacion__isnull=True, estudiante=OuterRef('pk'),
+            )
+            return Response(busqueda.resultados(
+                request, Estudiante.objects.filter(Exists(inscritos)),
+                lambda estudiantes: self.get_serializer(estudiantes, many=True).data,
+            ))
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def at_risk(self, request):
+        # Resultado del último `calcular_riesgo`; se omiten los que ya no están inscritos con el docente
+        inscritos = InscripcionEstudianteGrupo.objects.filter(
+            grupo__docente=request.user, grupo__eliminacion__isnull=True, estudiante=OuterRef('estudiante_id'),
+        )
+        riesgos = (
+            RiesgoEstudiante.objects.filter(docente=request.user).filter(Exists(inscritos))
+            .select_related('estudiante').order_by('-tasa_ausencias', '-racha_actual', 'estudiante__nombre_completo')
+        )
+        return Response([
+            {
+                'id': r.estudiante.id,
+                'nombre': r.estudiante.nombre_completo,
+                'studentId': r.estudiante.matricula,
+                'sesiones': r.sesiones,
+                'ausencias': r.ausencias,
+                'tasaAusencias': round(r.tasa_ausencias, 4),
+                'rachaActual': r.racha_actual,
+                'rachaMaxima': r.racha_maxima,
+                'tendencia': round(r.tendencia, 4),
+                'calculado': r.calculado,
+            }
+            for r in riesgos
+        ])
 
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
@@ -73,36 +212,127 @@ class EstudianteViewSet(viewsets.ModelViewSet):
         )
         return Response(self.get_serializer(estudiante).data, status=status.HTTP_201_CREATED)
 
-class SesionClaseViewSet(viewsets.ModelViewSet):
+class SesionClaseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = SesionClase.objects.all()
     serializer_class = SesionClaseSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Solo sesiones de grupos de materias del docente
-        return SesionClase.objects.filter(grupo__materia__docente=self.request.user)
+        if self.action in ('update', 'partial_update'):
+            # El pase de lista se compara aparte (core.attendance); no hace falta el árbol
+            return SesionClase.objects.filter(docente=self.request.user).exclude(grupo_id__in=Grupo.eliminados())
+        return sesiones_tree_queryset(self.request.user, Expansion.desde_request(self.request))
+
+    def list(self, request, *args, **kwargs):
+        if fastpath.activa(request):
+            return fastpath.respuesta(fastpath.sesiones(request.user))
+        return super().list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
         asistencias_data = data.pop('asistencias', [])
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        sesion = serializer.instance
-        # Crear asistencias
-        for asistencia in asistencias_data:
-            estudiante_id = asistencia.get('studentId')
-            status = asistencia.get('status')
-            if estudiante_id and status:
-                AsistenciaEstudiante.objects.create(
-                    sesion_clase=sesion,
-                    estudiante_id=estudiante_id,
-                    status=status
-                )
+        # Validar todas las asistencias antes de escribir nada (un solo query de inscripciones)
+        estados = validar_asistencias(serializer.validated_data['grupo'], asistencias_data)
+        # Sesión y asistencias se registran juntas o no se registra nada
+        with transaction.atomic():
+            self.perform_create(serializer)
+            crear_asistencias(serializer.instance, estados)
         headers = self.get_success_headers(serializer.data)
-        # Corregir: importar status desde rest_framework y no usar la variable local 'status'
-        from rest_framework import status as drf_status
-        return Response(self.get_serializer(sesion).data, status=drf_status.HTTP_201_CREATED, headers=headers)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def update(self, request, *args, **kwargs):
+        # PUT con 'asistencias' reemplaza el pase de lista completo; PATCH solo los estudiantes
+        # enviados (status null quita la asistencia). Sin 'asistencias' no se tocan.
+        partial = kwargs.pop('partial', False)
+        sesion = self.get_object()
+        data = request.data.copy()
+        asistencias_data = data.pop('asistencias', None)
+        serializer = self.get_serializer(sesion, data=data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        estados = None
+        if asistencias_data is not None:
+            grupo = serializer.validated_data.get('grupo', sesion.grupo_id)
+            estados = validar_asistencias(grupo, asistencias_data, permitir_borrado=True)
+        with transaction.atomic():
+            if serializer.validated_data:
+                self.perform_update(serializer)
+            if estados is not None:
+                actualizar_asistencias(serializer.instance, estados, completo=not partial)
+        sesion = sesiones_tree_queryset(request.user, Expansion.desde_request(request)).get(pk=sesion.pk)
+        return Response(self.get_serializer(sesion).data)
+
+class SesionArchivadaViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """ Sesiones de periodos cerrados (core.archivo), de solo lectura; ?grupo= filtra por grupo. """
+    queryset = SesionArchivada.objects.all()
+    serializer_class = SesionArchivadaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        sesiones = SesionArchivada.objects.filter(docente=self.request.user).exclude(grupo_id__in=Grupo.eliminados()).order_by('fecha', 'id')
+        grupo = self.request.query_params.get('grupo')
+        if grupo and self.action == 'list':
+            try:
+                sesiones = sesiones.filter(grupo_id=uuid.UUID(grupo))
+            except ValueError:
+                raise serializers.ValidationError({'grupo': 'Debe ser un UUID.'})
+        return sesiones
+
+class HorarioClaseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = HorarioClase.objects.all()
+    serializer_class = HorarioClaseSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            HorarioClase.objects.filter(docente=self.request.user).exclude(grupo_id__in=Grupo.eliminados())
+            .order_by('dia_semana', 'hora_inicio')
+        )
+
+class TodayClassesView(APIView):
+    """ Clases de hoy del docente según su horario semanal (TodayClass en types.ts). """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return horarios.respuesta(request.user)
+
+class SyncView(APIView):
+    """
+    Sincronización incremental. Sin `since` devuelve solo el cursor actual (pedirlo antes de la
+    descarga completa); con `since` devuelve los cambios posteriores y el nuevo cursor.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'cursor': cursor_actual(request.user)})
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({'error': 'El cursor since debe ser un entero.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(cambios_desde(request.user, since))
+
+class BatchView(APIView):
+    """
+    Varias escrituras sobre materias, grupos, estudiantes, sesiones y horarios en una petición y
+    una transacción (core.batch). Las operaciones posteriores pueden usar "$ref" con el id de
+    un objeto creado antes en el mismo lote.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        codigo, cuerpo = batch.ejecutar(request, request.data.get('operations') if isinstance(request.data, dict) else None)
+        return Response(cuerpo, status=codigo)
+
+class CacheStatsView(APIView):
+    """ Contadores de la caché de árboles de este proceso (solo staff). """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache.estadisticas())
 
 class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -122,17 +352,8 @@ class PasswordResetRequestView(APIView):
             user = User.objects.get(email=email)
         except User.DoesNotExist:
             return Response({'error': 'Usuario no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
-        token = default_token_generator.make_token(user)
-        reset_url = request.build_absolute_uri(
-            reverse('password_reset_confirm', args=[user.pk, token])
-        )
-        send_mail(
-            'Recuperar contraseña',
-            f'Usa este enlace para restablecer tu contraseña: {reset_url}',
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-            fail_silently=False,
-        )
+        # El envío (y el token) lo hace el worker de tareas; el request no espera al servidor de correo
+        encolar(enviar_recuperacion, usuario_id=user.pk, base_url=request.build_absolute_uri('/'))
         return Response({'detail': 'Correo de recuperación enviado.'}, status=status.HTTP_200_OK)
 
 class PasswordResetConfirmView(APIView):
@@ -45,12 +45,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -83,6 +85,97 @@ DATABASES = {
     'default': dj_database_url.config(default='sqlite:///db.sqlite3')
 }
 
+# Réplicas de lectura (core.replicas): URLs separadas por comas en DATABASE_REPLICA_URLS.
+# Los GET de las vistas de core leen de una réplica; las escrituras y las lecturas del docente
+# durante REPLICA_VENTANA_ESCRITURA segundos tras escribir van a 'default'. Una réplica que no
+# responde se omite durante REPLICA_REINTENTO segundos. Requiere REDIS_URL: la marca de
+# escritura vive en la caché de usuarios (check core.E001). En pruebas las réplicas apuntan a
+# la base de 'default' (MIRROR). Para probar en local basta con copias del archivo SQLite, por
+# ejemplo DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3 junto con REDIS_URL; con esas
+# variables `manage.py test core.tests.ReplicaIntegracionTests` verifica el enrutamiento real.
+
+DATABASE_REPLICAS = []
+for _n, _url in enumerate(u for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()):
+    DATABASES[f'replica_{_n}'] = {**dj_database_url.parse(_url.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_n}')
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_VENTANA_ESCRITURA = int(os.environ.get('REPLICA_VENTANA_ESCRITURA', 5))
+REPLICA_REINTENTO = int(os.environ.get('REPLICA_REINTENTO', 30))
+
+
+# Cache
+# Las respuestas renderizadas del árbol de cada docente se guardan en el alias 'arboles' y los
+# usuarios resueltos desde el JWT en 'usuarios' (core.authentication).
+# Con REDIS_URL se comparten entre procesos; si no, memoria local acotada por MAX_ENTRIES.
+
+ARBOL_CACHE_ALIAS = 'arboles'
+USUARIOS_CACHE_ALIAS = 'usuarios'
+USUARIOS_CACHE_TTL = int(os.environ.get('USUARIOS_CACHE_TTL', 5 * 60))
+ARBOL_CACHE_MAX_BYTES = int(os.environ.get('ARBOL_CACHE_MAX_BYTES', 2 * 1024 * 1024))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    ARBOL_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': 60 * 60,
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'unitrack-arboles',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('ARBOL_CACHE_MAX_ENTRIES', 500))},
+    },
+    USUARIOS_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': USUARIOS_CACHE_TTL,
+        'KEY_PREFIX': 'usuarios',
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'unitrack-usuarios',
+        'TIMEOUT': USUARIOS_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('USUARIOS_CACHE_MAX_ENTRIES', 1000))},
+    },
+}
+
+
+# Lectura rápida de los listados de materias y sesiones (core.fastpath): la respuesta se arma
+# desde values_list() y se codifica con orjson si está instalado. Desactivada por defecto.
+
+LECTURA_RAPIDA = os.environ.get('LECTURA_RAPIDA', '') == '1'
+
+# Pases de lista nuevos empaquetados (3 bits por estudiante, core.packing) en lugar de una fila
+# por estudiante. Las sesiones existentes se convierten con `manage.py empaquetar_asistencias`.
+
+ASISTENCIA_EMPAQUETADA = os.environ.get('ASISTENCIA_EMPAQUETADA', '') == '1'
+
+
+# Métricas por ruta en /metrics (formato Prometheus); solo se sirven a estas IPs
+
+METRICAS_ACTIVAS = os.environ.get('METRICAS_ACTIVAS', '1') == '1'
+METRICAS_IPS_PERMITIDAS = os.environ.get('METRICAS_IPS_PERMITIDAS', '127.0.0.1,::1').split(',')
+
+
+# Cola de tareas en segundo plano (core.tasks, `manage.py ejecutar_tareas`): espera entre
+# reintentos en segundos (exponencial, con tope) y tiempo tras el cual se retoma una tarea
+# cuyo worker dejó de responder
+
+TAREAS_ESPERA_BASE = int(os.environ.get('TAREAS_ESPERA_BASE', 30))
+TAREAS_ESPERA_MAXIMA = int(os.environ.get('TAREAS_ESPERA_MAXIMA', 60 * 60))
+TAREAS_BLOQUEO = int(os.environ.get('TAREAS_BLOQUEO', 10 * 60))
+
+
+# Estudiantes en riesgo (core.riesgo, `manage.py calcular_riesgo`): tasa de ausencias a partir
+# de la cual se marca, ausencias consecutivas hasta la última sesión, y número de sesiones
+# recientes que se comparan con las anteriores para la tendencia
+
+RIESGO_TASA_AUSENCIAS = float(os.environ.get('RIESGO_TASA_AUSENCIAS', 0.2))
+RIESGO_RACHA_AUSENCIAS = int(os.environ.get('RIESGO_RACHA_AUSENCIAS', 3))
+RIESGO_VENTANA_TENDENCIA = int(os.environ.get('RIESGO_VENTANA_TENDENCIA', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,7 +221,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from core.metrics import vista_metricas
 
 def health_check(request):
     return JsonResponse({"status": "ok"})
@@ -25,6 +26,7 @@ def health_check(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', health_check),  # Responde en la raíz con un JSON
+    path('metrics', vista_metricas, name='metricas'),  # Prometheus
     path('api/', include('core.urls')),
     path('api/auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),